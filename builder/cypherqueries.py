@@ -132,8 +132,9 @@ def build_queries(all_nodes: pd.DataFrame, all_edges: pd.DataFrame, include_cons
     """
     all_queries = list()
     
-    all_nodes.fillna('NA', inplace=True)
-    all_edges.fillna('NA', inplace=True)
+    # Fill missing values in copies, such that given dataframes are left unchanged
+    all_nodes = all_nodes.fillna('NA')
+    all_edges = all_edges.fillna('NA')
     
     all_queries.extend(build_queries_for_nodes(all_nodes, include_constraints))
     all_queries.extend(build_queries_for_edges(all_edges))
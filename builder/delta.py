@@ -0,0 +1,206 @@
+"""
+    This module updates a restructured knowledge graph with the changes between a new set of associations and the last saved
+    snapshot of the graph, instead of restructuring the whole graph again. Edges and nodes of the previous graph are compared by id,
+    only added and changed edges and the nodes connected to changed edges are passed through the restructuring rules, and the
+    resulting changes are stored as delta files of nodes and edges together with a changeset.
+"""
+
+import json
+import os
+import time
+
+import numpy as np
+import pandas as pd
+
+import util.constants as constants
+
+from util.common import register_info
+from builder.kg import AssocKnowledgeGraph, RestructuredKnowledgeGraph
+from builder.restructure import EDGE_COLUMNS, NODE_COLUMNS, SemanticCodes, concat_taxon_nodes, concat_unique, get_semantic_codes, get_taxon_edges, get_taxon_nodes, restructure_edges, transform_node_semantics
+
+SNAPSHOT_FILE = f'{constants.OUTPUT_FOLDER}/kg_snapshot.pkl'
+PREV_NODE_COLUMNS = NODE_COLUMNS + ['taxon_id', 'taxon_label']
+
+def save_snapshot(prev_kg: AssocKnowledgeGraph, new_kg: RestructuredKnowledgeGraph, file_path: str = SNAPSHOT_FILE):
+    """
+        Save the edges and nodes of a previous graph and of its restructured graph as snapshot, see `update_kg`.
+    """
+    prev_edges_df, prev_nodes_df = prev_kg.generate_dataframes()
+    edges_df, nodes_df = new_kg.generate_dataframes()
+    write_snapshot((prev_edges_df, prev_nodes_df), (edges_df, nodes_df), file_path)
+
+def write_snapshot(prev_dfs: tuple, new_dfs: tuple, file_path: str = SNAPSHOT_FILE):
+    """
+        Write snapshot of dataframes of previous graph and restructured graph.
+        :param prev_dfs: dataframe with all edges and dataframe with all nodes of previous graph
+        :param new_dfs: dataframe with all edges and dataframe with all nodes of restructured graph
+    """
+    snapshot = {
+        'prev_edges': prev_dfs[0].reindex(columns=EDGE_COLUMNS).astype(object),
+        'prev_nodes': prev_dfs[1].reindex(columns=PREV_NODE_COLUMNS).astype(object),
+        'edges': new_dfs[0].reindex(columns=EDGE_COLUMNS).astype(object),
+        'nodes': new_dfs[1].reindex(columns=NODE_COLUMNS).astype(object)
+    }
+    pd.to_pickle(snapshot, file_path)
+    register_info(f'Saved snapshot of knowledge graph into {file_path}')
+
+def load_snapshot(file_path: str = SNAPSHOT_FILE):
+    """
+        Load snapshot of graph saved by `write_snapshot`.
+        :return: dictionary with dataframes `prev_edges`, `prev_nodes`, `edges` and `nodes`
+    """
+    return pd.read_pickle(file_path)
+
+def values_equal(a, b):
+    """
+        Compare two arrays of values element-wise, in which missing values are equal to each other.
+    """
+    is_equal = a == b
+    is_unequal = ~is_equal
+    is_equal[is_unequal] = pd.isnull(a[is_unequal]) & pd.isnull(b[is_unequal])
+    return is_equal
+
+def diff_ids(old_df: pd.DataFrame, new_df: pd.DataFrame, columns: list):
+    """
+        Compare the rows of two dataframes with unique ids.
+        :param columns: names of columns that are compared
+        :return: arrays of ids that are only found in the new dataframe, only in the old dataframe and of ids of which the values differ
+    """
+    old_ids = old_df['id'].to_numpy(dtype=object)
+    new_ids = new_df['id'].to_numpy(dtype=object)
+
+    old_positions = pd.Index(old_ids).get_indexer(new_ids)
+    is_found = old_positions >= 0
+    is_removed = np.ones(len(old_ids), dtype=bool)
+    is_removed[old_positions[is_found]] = False
+
+    is_changed = np.zeros(is_found.sum(), dtype=bool)
+    for column in columns:
+        is_changed |= ~values_equal(old_df[column].to_numpy(dtype=object)[old_positions[is_found]], new_df[column].to_numpy(dtype=object)[is_found])
+
+    return new_ids[~is_found], old_ids[is_removed], new_ids[is_found][is_changed]
+
+def get_incident_ids(edges_df: pd.DataFrame, mask = slice(None)):
+    """
+        Get ids of all subjects and objects of the edges for which given mask is true.
+    """
+    return np.concatenate([edges_df['subject'].to_numpy(dtype=object)[mask], edges_df['object'].to_numpy(dtype=object)[mask]])
+
+def update_restructured_graph(snapshot: dict, prev_edges_df: pd.DataFrame, prev_nodes_df: pd.DataFrame):
+    """
+        Restructure the graph given by dataframes of its edges and nodes by updating the restructured graph of a snapshot with
+        the changes between both previous graphs. The result equals `builder.restructure.restructure_dataframes` of given dataframes.
+        :param snapshot: dictionary of dataframes of previous graph and restructured graph, see `load_snapshot`
+        :param prev_edges_df: dataframe with all edges of new previous graph in iteration order
+        :param prev_nodes_df: dataframe with all nodes of new previous graph including taxon id and label in iteration order
+        :return: dataframe with all restructured edges and dataframe with all restructured nodes
+    """
+    prev_edges_df = prev_edges_df.reindex(columns=EDGE_COLUMNS).astype(object)
+    prev_nodes_df = prev_nodes_df.reindex(columns=PREV_NODE_COLUMNS).astype(object)
+    old_prev_edges_df, old_prev_nodes_df = snapshot['prev_edges'], snapshot['prev_nodes']
+    old_edges_df, old_nodes_df = snapshot['edges'], snapshot['nodes']
+
+    added_edge_ids, removed_edge_ids, changed_edge_ids = diff_ids(old_prev_edges_df, prev_edges_df, EDGE_COLUMNS)
+    changed_node_ids = np.concatenate(diff_ids(old_prev_nodes_df, prev_nodes_df, PREV_NODE_COLUMNS))
+
+    # Edges are restructured again when they are added or changed or when one of their nodes changed
+    is_restructured = (prev_edges_df['id'].isin(np.concatenate([added_edge_ids, changed_edge_ids])) | prev_edges_df['subject'].isin(changed_node_ids)
+                       | prev_edges_df['object'].isin(changed_node_ids)).to_numpy()
+    restructured_edges_df = prev_edges_df[is_restructured]
+
+    incident_nodes_df = prev_nodes_df[prev_nodes_df['id'].isin(get_incident_ids(restructured_edges_df))]
+    semantic_codes, subject_codes, object_codes = get_semantic_codes(restructured_edges_df, incident_nodes_df)
+    new_edge_columns = restructure_edges(restructured_edges_df, subject_codes, object_codes, semantic_codes)
+
+    # Restructured edges of unchanged edges of the previous graph are kept, taxon edges are not part of the previous graph
+    is_taxon_edge = old_edges_df['relation_id'].isin([constants.FOUND_IN['id'], constants.IS_OF['id']]).to_numpy(copy=True)
+    is_taxon_edge[is_taxon_edge] = ~old_edges_df['id'][is_taxon_edge].isin(old_prev_edges_df['id']).to_numpy()
+    stale_edge_ids = np.concatenate([removed_edge_ids, restructured_edges_df['id'].to_numpy(dtype=object)])
+    is_kept_edge = ~is_taxon_edge & ~old_edges_df['id'].isin(stale_edge_ids).to_numpy()
+    kept_edge_columns = {column: old_edges_df[column].to_numpy(dtype=object)[is_kept_edge] for column in EDGE_COLUMNS}
+
+    edge_order = pd.Index(prev_edges_df['id']).get_indexer(np.concatenate([kept_edge_columns['id'], new_edge_columns['id']]))
+    edge_columns = {column: np.concatenate([kept_edge_columns[column], new_edge_columns[column]])[np.argsort(edge_order, kind='stable')] for column in EDGE_COLUMNS}
+
+    # Semantic groups depend on the relations of connected edges, nodes of which the id is a taxon are always transformed again
+    taxon_ids = pd.concat([old_prev_nodes_df['taxon_id'], prev_nodes_df['taxon_id']]).dropna().unique()
+    affected_node_ids = np.concatenate([changed_node_ids, taxon_ids, get_incident_ids(restructured_edges_df), get_incident_ids(old_prev_edges_df, old_prev_edges_df['id'].isin(np.concatenate([removed_edge_ids, changed_edge_ids])).to_numpy())])
+
+    prev_nodes_df = prev_nodes_df[prev_nodes_df['semantic'] != constants.ANAT]
+    node_columns = {column: prev_nodes_df[column].to_numpy(dtype=object, copy=True) for column in PREV_NODE_COLUMNS}
+    is_affected = prev_nodes_df['id'].isin(affected_node_ids).to_numpy()
+
+    old_semantics = old_nodes_df['semantic'].to_numpy(dtype=object)
+    node_columns['semantic'][~is_affected] = old_semantics[pd.Index(old_nodes_df['id']).get_indexer(node_columns['id'][~is_affected])]
+
+    affected_semantic_codes = SemanticCodes(node_columns['semantic'][is_affected])
+    node_columns['semantic'][is_affected] = transform_node_semantics(node_columns['id'][is_affected], affected_semantic_codes.codes, affected_semantic_codes, edge_columns)
+
+    has_taxon, taxon_node_columns = get_taxon_nodes(node_columns)
+    nodes_df = concat_taxon_nodes(node_columns, has_taxon, taxon_node_columns)
+
+    # Taxon edges are only generated for transformed nodes
+    is_kept_taxon_edge = is_taxon_edge & ~old_edges_df['subject'].isin(affected_node_ids).to_numpy()
+    affected_node_columns = {column: values[is_affected] for column, values in node_columns.items()}
+    taxon_edge_columns = get_taxon_edges(affected_node_columns, has_taxon[is_affected])
+
+    all_taxon_edge_columns = {column: np.concatenate([old_edges_df[column].to_numpy(dtype=object)[is_kept_taxon_edge], taxon_edge_columns[column]]) for column in EDGE_COLUMNS}
+    taxon_edge_order = pd.Index(node_columns['id']).get_indexer(all_taxon_edge_columns['subject'])
+    edges_df = concat_unique([edge_columns, all_taxon_edge_columns], EDGE_COLUMNS, np.concatenate([np.arange(len(edge_columns['id'])), len(edge_columns['id']) + taxon_edge_order]))
+
+    return edges_df, nodes_df
+
+def diff_dataframes(old_df: pd.DataFrame, new_df: pd.DataFrame):
+    """
+        Get the changes between two dataframes of edges or nodes with unique ids.
+        :return: dataframe with added and changed rows with their new values and removed rows with their old values, in which
+        column `change` is `added`, `changed` or `removed`
+    """
+    added_ids, removed_ids, changed_ids = diff_ids(old_df, new_df, list(new_df.columns))
+
+    delta_dfs = list()
+    for change, df, ids in [('added', new_df, added_ids), ('changed', new_df, changed_ids), ('removed', old_df, removed_ids)]:
+        delta_df = df[df['id'].isin(ids)].copy()
+        delta_df['change'] = change
+        delta_dfs.append(delta_df)
+
+    return pd.concat(delta_dfs, ignore_index=True)
+
+def get_changeset(delta_edges_df: pd.DataFrame, delta_nodes_df: pd.DataFrame):
+    """
+        Summarize delta files into a changeset with the ids of all added, changed and removed edges and nodes.
+    """
+    changeset = dict()
+    for name, delta_df in [('edges', delta_edges_df), ('nodes', delta_nodes_df)]:
+        changeset[name] = {change: delta_df.loc[delta_df['change'] == change, 'id'].tolist() for change in ['added', 'changed', 'removed']}
+    return changeset
+
+def update_kg(prev_kg: AssocKnowledgeGraph, filename_prefix: str = 'new_kg', snapshot_file: str = SNAPSHOT_FILE):
+    """
+        Update the restructured graph of the last saved snapshot with the changes of the given graph. Changed edges and nodes are
+        stored into delta files, the changeset into a json file and the snapshot is replaced by the updated graph.
+        :param prev_kg: graph of all current associations
+        :param filename_prefix: prefix of names of files in the output folder
+        :return: dataframe with all restructured edges, dataframe with all restructured nodes and changeset
+    """
+    snapshot = load_snapshot(snapshot_file)
+    prev_edges_df, prev_nodes_df = prev_kg.generate_dataframes()
+
+    start_time = time.perf_counter()
+    edges_df, nodes_df = update_restructured_graph(snapshot, prev_edges_df, prev_nodes_df)
+    delta_edges_df = diff_dataframes(snapshot['edges'], edges_df)
+    delta_nodes_df = diff_dataframes(snapshot['nodes'], nodes_df)
+    changeset = get_changeset(delta_edges_df, delta_nodes_df)
+    register_info(f'Updated restructured graph in {time.perf_counter() - start_time:.2f}s')
+
+    delta_edges_df.to_csv(os.path.join(constants.OUTPUT_FOLDER, f'{filename_prefix}_delta_edges.csv'), index=False)
+    delta_nodes_df.to_csv(os.path.join(constants.OUTPUT_FOLDER, f'{filename_prefix}_delta_nodes.csv'), index=False)
+    with open(os.path.join(constants.OUTPUT_FOLDER, f'{filename_prefix}_changeset.json'), 'w') as f:
+        json.dump(changeset, f, indent=4)
+
+    for name, changes in changeset.items():
+        register_info(f'Delta of {name}: ' + ', '.join(f'{len(ids)} {change}' for change, ids in changes.items()))
+
+    write_snapshot((prev_edges_df, prev_nodes_df), (edges_df, nodes_df), snapshot_file)
+
+    return edges_df, nodes_df, changeset
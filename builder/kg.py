@@ -1,17 +1,109 @@
+import sys
+
 from util.common import register_info
 
 import util.constants as constants
 import util.common as common
 
+from util.associationtable import AssociationTable, normalize_value
+from builder.storage import ValueIndex, NodeStore, EdgeStore
+
 import pandas as pd
 import numpy as np
 
 from tqdm import tqdm
 
-class Node:
+ASSOC_TUPLE_INDEX = {value: index for index, value in enumerate(constants.assoc_tuple_values)}
+
+def intern_value(value):
+    """
+        Intern given value when it is a string, such that equal identifiers and labels share one object. Missing float values
+        are replaced by the `np.nan` singleton.
+    """
+    if type(value) is str:
+        return sys.intern(value)
+    return normalize_value(value)
+
+class ImmutableRecord:
+    """
+        Base class of records with a fixed set of attributes that cannot be changed after initialization.
+    """
+    __slots__ = ()
+    
+    def set_values(self, **values):
+        """
+            Set attributes of record during initialization.
+        """
+        for name, value in values.items():
+            object.__setattr__(self, name, value)
+    
+    def __setattr__(self, name, value):
+        raise AttributeError(f'{type(self).__name__} is immutable')
+    
+    def __delattr__(self, name):
+        raise AttributeError(f'{type(self).__name__} is immutable')
+    
+    @classmethod
+    def get_fields(cls):
+        """
+            Get names of all attributes of records of this class.
+        """
+        return [name for record_class in reversed(cls.__mro__) for name in getattr(record_class, '__slots__', ())]
+    
+    @classmethod
+    def from_values(cls, **values):
+        """
+            Create record with given values of all attributes without initialization.
+        """
+        record = cls.__new__(cls)
+        record.set_values(**values)
+        return record
+    
+    def __getstate__(self):
+        return {name: getattr(self, name) for name in self.get_fields()}
+    
+    def __setstate__(self, state):
+        self.set_values(**state)
+    
+class Relation(ImmutableRecord):
+    """
+        Initialize relations using this class carrying the id, label and iri link of the relation. Relations are shared by all
+        edges through `intern_relation`. Values can also be accessed as keys, such as `relation['id']`.
+        :param id: id of relation
+        :param label: label of relation
+        :param iri: id in iri format of relation
+    """
+    __slots__ = ('id', 'label', 'iri')
+    
+    def __init__(self, id, label, iri):
+        self.set_values(id=id, label=label, iri=iri)
+    
+    def __getitem__(self, key):
+        return getattr(self, key)
+    
+    def __repr__(self):
+        return f'Relation({self.id!r}, {self.label!r}, {self.iri!r})'
+
+relation_table = dict()     # all relations shared by edges, keyed by id, label and iri
+
+def intern_relation(relation_id, relation_label, relation_iri):
+    """
+        Get relation with given id, label and iri from the table of relations shared by all edges, adding it when it does not exist yet.
+        :return: Relation instance
+    """
+    key = (intern_value(relation_id), intern_value(relation_label), intern_value(relation_iri))
+    
+    relation = relation_table.get(key)
+    if relation is None:
+        relation = relation_table.setdefault(key, Relation(*key))
+    return relation
+
+class Node(ImmutableRecord):
     """
         Initialize nodes using this class carrying information about the entity it represents.
     """
+    __slots__ = ('id', 'label', 'iri', 'semantic_groups')
+    
     def __eq__(self, other):
         return self.id == other.id
     
@@ -26,13 +118,17 @@ class AssocNode(Node):
         when applicable.
         :param assoc_tuple: tuple of information about association
     """
+    __slots__ = ('taxon_id', 'taxon_label')
+    
     def __init__(self, assoc_tuple: tuple, node_role: str):
-        self.id = assoc_tuple[constants.assoc_tuple_values.index(f'{node_role}_id')]
-        self.semantic_groups = assoc_tuple[constants.assoc_tuple_values.index(f'{node_role}_category')]
-        self.label = assoc_tuple[constants.assoc_tuple_values.index(f'{node_role}_label')]
-        self.iri = assoc_tuple[constants.assoc_tuple_values.index(f'{node_role}_iri')]
-        self.taxon_id = assoc_tuple[constants.assoc_tuple_values.index(f'{node_role}_taxon_id')]
-        self.taxon_label = assoc_tuple[constants.assoc_tuple_values.index(f'{node_role}_taxon_label')]
+        self.set_values(
+            id=intern_value(assoc_tuple[ASSOC_TUPLE_INDEX[f'{node_role}_id']]),
+            semantic_groups=intern_value(assoc_tuple[ASSOC_TUPLE_INDEX[f'{node_role}_category']]),
+            label=assoc_tuple[ASSOC_TUPLE_INDEX[f'{node_role}_label']],
+            iri=assoc_tuple[ASSOC_TUPLE_INDEX[f'{node_role}_iri']],
+            taxon_id=intern_value(assoc_tuple[ASSOC_TUPLE_INDEX[f'{node_role}_taxon_id']]),
+            taxon_label=intern_value(assoc_tuple[ASSOC_TUPLE_INDEX[f'{node_role}_taxon_label']])
+        )
     
     def to_dict(self):
         """
@@ -60,11 +156,10 @@ class NewNode(Node):
         :param iri: id in iri format of entity
         :param semantic: semantic group to which entity belongs
     """
+    __slots__ = ()
+    
     def __init__(self, id, label, iri, semantic):
-        self.id = id
-        self.label = label
-        self.iri = iri
-        self.semantic_groups = semantic
+        self.set_values(id=intern_value(id), label=label, iri=iri, semantic_groups=intern_value(semantic))
     
     def to_dict(self):
         """
@@ -81,32 +176,18 @@ class NewNode(Node):
         
         return node_dict
     
-class Edge:
+class Edge(ImmutableRecord):
     """
         Initialize edges using this class carryinh information about the association it represents.
     """
+    __slots__ = ('id', 'subject', 'object', 'relation')
+    
     def __eq__(self, other):
         return self.id == other.id
     
     def __hash__(self):
         return hash(self.id)
     
-class AssocEdge(Edge):
-    """
-        Initialize edges using this class, carrying information about the id of the association,
-        the ids of the subject and object and the id, label and iri link of the relation.
-        :param assoc_tuple: tuple of information about association
-    """
-    def __init__(self, assoc_tuple: tuple):
-        self.id = assoc_tuple[constants.assoc_tuple_values.index('id')]
-        self.subject = assoc_tuple[constants.assoc_tuple_values.index('subject_id')]
-        self.object = assoc_tuple[constants.assoc_tuple_values.index('object_id')]
-        self.relation = {
-            'id': assoc_tuple[constants.assoc_tuple_values.index('relation_id')],
-            'iri': assoc_tuple[constants.assoc_tuple_values.index('relation_iri')],
-            'label': str(assoc_tuple[constants.assoc_tuple_values.index('relation_label')]).replace('_', ' ')
-        }
-    
     def to_dict(self):
         """
             Convert Edge object to a dictionary of values relevant to the edge.
@@ -116,67 +197,83 @@ class AssocEdge(Edge):
             'id': self.id,
             'subject': self.subject,
             'object': self.object,
-            'relation_id': self.relation['id'],
-            'relation_label': self.relation['label'],
-            'relation_iri': self.relation['iri']
+            'relation_id': self.relation.id,
+            'relation_label': self.relation.label,
+            'relation_iri': self.relation.iri
         }
         
         return edge_dict
     
+class AssocEdge(Edge):
+    """
+        Initialize edges using this class, carrying information about the id of the association,
+        the ids of the subject and object and the id, label and iri link of the relation.
+        :param assoc_tuple: tuple of information about association
+    """
+    __slots__ = ()
+    
+    def __init__(self, assoc_tuple: tuple):
+        self.set_values(
+            id=assoc_tuple[ASSOC_TUPLE_INDEX['id']],
+            subject=intern_value(assoc_tuple[ASSOC_TUPLE_INDEX['subject_id']]),
+            object=intern_value(assoc_tuple[ASSOC_TUPLE_INDEX['object_id']]),
+            relation=intern_relation(
+                assoc_tuple[ASSOC_TUPLE_INDEX['relation_id']],
+                str(assoc_tuple[ASSOC_TUPLE_INDEX['relation_label']]).replace('_', ' '),
+                assoc_tuple[ASSOC_TUPLE_INDEX['relation_iri']]
+            )
+        )
+    
 class NewEdge(Edge):
+    __slots__ = ()
+    
     def __init__(self, id, subject, object, relation_id, relation_label, relation_iri):
-        self.id = id
-        self.subject = subject
-        self.object = object
-        self.relation = {
-            'id': relation_id,
-            'iri': relation_iri,
-            'label': relation_label
-        }
+        self.set_values(id=id, subject=intern_value(subject), object=intern_value(object),
+                        relation=intern_relation(relation_id, relation_label, relation_iri))
     
-    def to_dict(self):
-        """
-            Convert NewEdge object to a dictionary of values relevant to the edge.
-            :return: dictionary with edge information
-        """
-        edge_dict = {
-            'id': self.id,
-            'subject': self.subject,
-            'object': self.object,
-            'relation_id': self.relation['id'],
-            'relation_label': self.relation['label'],
-            'relation_iri': self.relation['iri']
-        }
-        
-        return edge_dict
+def save_dataframes(edges: pd.DataFrame, nodes: pd.DataFrame, filename_prefix):
+    """
+        Save dataframes of all edges and all nodes of a knowledge graph into csv files in the output folder.
+    """
+    edges_file_name = '{}_edges.csv'.format(filename_prefix)
+    edges.to_csv('output/{}'.format(edges_file_name), index=False)
+    
+    nodes_file_name = '{}_nodes.csv'.format(filename_prefix)
+    nodes.to_csv('output/{}'.format(nodes_file_name), index=False)
     
+    print(f'Knowledge graph content saved into files {edges_file_name} and {nodes_file_name} in the output folder.')
+
 class KnowledgeGraph:
     """
-        Initialize a knowledge graph that consists of a set of edges and a set of nodes.
+        Initialize a knowledge graph that consists of a set of edges and a set of nodes. Edges and nodes are stored as columns,
+        in which entity ids, semantic groups and relations are encoded as dense integer ids.
+        :param node_class: class of nodes in knowledge graph
+        :param edge_class: class of edges in knowledge graph
     """
-    def __init__(self):
-        self.all_edges = set()  # all unique edges in knowledge graph
-        self.all_nodes = set()  # all unique nodes in knowledge graph
+    def __init__(self, node_class = NewNode, edge_class = NewEdge):
+        self.entity_index = ValueIndex()    # ids of all entities, including subjects, objects and taxa
+        self.semantic_index = ValueIndex()
+        self.relation_index = ValueIndex()
+        
+        node_encoded_fields = {'id': self.entity_index, 'semantic_groups': self.semantic_index}
+        if 'taxon_id' in node_class.get_fields():
+            node_encoded_fields.update({'taxon_id': self.entity_index, 'taxon_label': ValueIndex()})
+        
+        # Edges are indexed by relation and nodes by semantic group, such that extracting them does not require a scan of the graph
+        self.all_edges = EdgeStore(edge_class, {'subject': self.entity_index, 'object': self.entity_index, 'relation': self.relation_index}, ['relation'])  # all unique edges in knowledge graph
+        self.all_nodes = NodeStore(node_class, node_encoded_fields, ['semantic_groups'])    # all unique nodes in knowledge graph
         
     def generate_dataframes(self):
         """
-            Generate dataframes that contain all edges and nodes.
+            Generate dataframes that contain all edges and nodes. Dataframes are kept, after adding edges or nodes only the rows of
+            the added edges and nodes are generated.
             :return: dataframe with all edges and dataframe with all nodes
         """
-        edges = pd.DataFrame.from_records([edge.to_dict() for edge in self.all_edges])
-        nodes = pd.DataFrame.from_records([node.to_dict() for node in self.all_nodes])
-        return edges, nodes
+        return self.all_edges.get_dataframe(), self.all_nodes.get_dataframe()
     
     def save_graph(self, filename_prefix):
         edges, nodes = self.generate_dataframes()
-        
-        edges_file_name = '{}_edges.csv'.format(filename_prefix)
-        edges.to_csv('output/{}'.format(edges_file_name), index=False)
-        
-        nodes_file_name = '{}_nodes.csv'.format(filename_prefix)
-        nodes.to_csv('output/{}'.format(nodes_file_name), index=False)
-        
-        print(f'Knowledge graph content saved into files {edges_file_name} and {nodes_file_name} in the output folder.')
+        save_dataframes(edges, nodes, filename_prefix)
         
     def analyze_graph(self):
         """
@@ -184,9 +281,7 @@ class KnowledgeGraph:
             are contained in the graph.
         """
         # Find all semantic groups
-        all_semantic_groups = set()
-        for node in self.all_nodes:
-            all_semantic_groups.add(node.semantic_groups)
+        all_semantic_groups = set(self.semantic_index.decode(list(self.all_nodes.indexes['semantic_groups'])))
         register_info(f'The graph contains {len(all_semantic_groups)} different semantic groups: {all_semantic_groups}')
         
         # Show total number of edges and nodes
@@ -200,9 +295,10 @@ class KnowledgeGraph:
         """
         found_relations = {}
         
-        for edge in self.all_edges:
-            relation_id = edge.relation['id']
-            relation_label = edge.relation['label']
+        # Only look at distinct relations of the edges
+        for relation in self.relation_index.decode(list(self.all_edges.indexes['relation'])):
+            relation_id = relation.id
+            relation_label = relation.label
             if (relation_label and substring_relation_label in relation_label):
                 found_relations[relation_id] = relation_label
         register_info(f'All {len(found_relations)} relations with substring "{substring_relation_label}":\n {found_relations}')
@@ -215,36 +311,53 @@ class KnowledgeGraph:
             :param extract_semantic_groups: list of semantic group names
             :return Dataframe containing extracted nodes
         """
-        extracted_nodes = set()
-        
-        for node in self.all_nodes:
-            if node.semantic_groups in extract_semantic_groups:
-                extracted_nodes.add(node)
+        positions = self.all_nodes.get_positions('semantic_groups', extract_semantic_groups)
+        extracted_nodes = self.all_nodes.generate_dataframe(positions)
         register_info(f'Extracted a total of {len(extracted_nodes)} nodes that belong to at least one of the semantic groups {extract_semantic_groups}')
 
-        return pd.DataFrame.from_records([node.to_dict() for node in extracted_nodes])
+        return extracted_nodes
+
+    def get_extracted_edges(self, extract_relation_ids: list):
+        """
+            Get all edges with one of the given relation(s).
+            :param extract_relation_ids: list of relation ids
+            :return Dataframe containing extracted edges
+        """
+        relations = [relation for relation in self.relation_index.values if relation.id in extract_relation_ids]
+        positions = self.all_edges.get_positions('relation', relations)
+        extracted_edges = self.all_edges.generate_dataframe(positions)
+        register_info(f'Extracted a total of {len(extracted_edges)} edges with one of the relations {extract_relation_ids}')
+        
+        return extracted_edges
 
 class AssocKnowledgeGraph(KnowledgeGraph):
     """
         Initialize a knowledge graph by giving a list of associations that is converted into
         a set of Edge objects and Node objects. 
-        :param all_associations: list of tuples complying with `constants.assoc_tuple_values`, by default an empty list
+        :param all_associations: list of tuples or association table complying with `constants.assoc_tuple_values`, by default an empty list
     """
-    def __init__(self, all_associations: list = []):
-        KnowledgeGraph.__init__(self)
+    def __init__(self, all_associations: list | AssociationTable = []):
+        KnowledgeGraph.__init__(self, AssocNode, AssocEdge)
         
         self.add_edges_and_nodes(all_associations)
         self.analyze_graph()
     
-    def add_edges_and_nodes(self, associations: list):
+    def add_edges_and_nodes(self, associations: list | AssociationTable):
         """
             Add new edges and nodes to the graph given a list of association dictionaries.
-            :param associations: list of association dictionaries
+            :param associations: list of association tuples or association table
         """
+        # Only the first edge and node with an id is kept, so records are only created for ids that are not in the graph yet
+        edge_ids = self.all_edges.positions
+        node_ids = self.all_nodes.positions
+        
         for association in associations:
-            self.all_edges.add(AssocEdge(association))
-            self.all_nodes.add(AssocNode(association, 'subject'))
-            self.all_nodes.add(AssocNode(association, 'object'))
+            if association[ASSOC_TUPLE_INDEX['id']] not in edge_ids:
+                self.all_edges.add(AssocEdge(association))
+            
+            for node_role in ['subject', 'object']:
+                if association[ASSOC_TUPLE_INDEX[f'{node_role}_id']] not in node_ids:
+                    self.all_nodes.add(AssocNode(association, node_role))
     
 class RestructuredKnowledgeGraph(KnowledgeGraph):
     """
@@ -253,7 +366,7 @@ class RestructuredKnowledgeGraph(KnowledgeGraph):
         :param prev_kg: KnowledgeGraph instance
     """
     def __init__(self, prev_kg: AssocKnowledgeGraph):
-        KnowledgeGraph.__init__(self)
+        KnowledgeGraph.__init__(self, NewNode, NewEdge)
             
         self.restructure_kg(prev_kg)
         
@@ -284,33 +397,31 @@ class RestructuredKnowledgeGraph(KnowledgeGraph):
         """
             Check whether the edge has an empty relation.
         """
-        if pd.isnull(prev_edge.relation['id']):
+        if pd.isnull(prev_edge.relation.id):
             return True
         else:
             return False
             
-    def remove_edge(self, prev_edge: AssocEdge, prev_nodes_df: pd.DataFrame):
+    def remove_edge(self, prev_edge: AssocEdge, node_semantics: dict):
         """
             Check whether the edge needs to removed due to one or both nodes needed to be removed as well.
+            :param node_semantics: dictionary with semantic group of each node id of previous graph
         """
-        subject_id = prev_edge.subject
-        subject_semantic = prev_nodes_df.loc[prev_nodes_df['id'] == subject_id, 'semantic'].iloc[0]
-        object_id = prev_edge.object
-        object_semantic = prev_nodes_df.loc[prev_nodes_df['id'] == object_id, 'semantic'].iloc[0]
+        subject_semantic = node_semantics[prev_edge.subject]
+        object_semantic = node_semantics[prev_edge.object]
         
         if subject_semantic == constants.ANAT or object_semantic == constants.ANAT:
             return True
         else: 
             return False
         
-    def deduce_edge(self, prev_edge: AssocEdge, prev_nodes_df: pd.DataFrame):
+    def deduce_edge(self, prev_edge: AssocEdge, node_semantics: dict):
         """
             Deduce from the object and subject semantic groups of the edge, the relation.
+            :param node_semantics: dictionary with semantic group of each node id of previous graph
         """
-        subject_id = prev_edge.subject
-        subject_semantic = prev_nodes_df.loc[prev_nodes_df['id'] == subject_id, 'semantic'].iloc[0]
-        object_id = prev_edge.object
-        object_semantic = prev_nodes_df.loc[prev_nodes_df['id'] == object_id, 'semantic'].iloc[0]
+        subject_semantic = node_semantics[prev_edge.subject]
+        object_semantic = node_semantics[prev_edge.object]
         
         if subject_semantic == constants.VAR and object_semantic in [constants.GENOTYPE, constants.MODEL]:
             new_relation = constants.IS_VARIANT_IN
@@ -325,14 +436,13 @@ class RestructuredKnowledgeGraph(KnowledgeGraph):
             print(f'Ignore edge with subject concept {subject_semantic} and object concept {object_semantic}')
             return None
     
-    def rename_edge(self, edge: NewEdge, prev_nodes_df: pd.DataFrame):
+    def rename_edge(self, edge: NewEdge, node_semantics: dict):
         """
             Replace the relation of an edge with another relation.
+            :param node_semantics: dictionary with semantic group of each node id of previous graph
         """
-        subject_id = edge.subject
-        subject_semantic = prev_nodes_df.loc[prev_nodes_df['id'] == subject_id, 'semantic'].iloc[0]
-        object_id = edge.object
-        object_semantic = prev_nodes_df.loc[prev_nodes_df['id'] == object_id, 'semantic'].iloc[0]
+        subject_semantic = node_semantics[edge.subject]
+        object_semantic = node_semantics[edge.object]
         
         if subject_semantic == constants.DISEASE and object_semantic == constants.PHENOTYPE:
             new_relation = constants.PHENOTYPE_ASSOCIATED
@@ -344,30 +454,42 @@ class RestructuredKnowledgeGraph(KnowledgeGraph):
         """
             Replace the relation of an edge with another relation due to grouping of relations.
         """
-        if prev_edge.relation['id'] in constants.REL_GROUPING:
-            new_relation = constants.REL_GROUPING[prev_edge.relation['id']]
+        if prev_edge.relation.id in constants.REL_GROUPING:
+            new_relation = constants.REL_GROUPING[prev_edge.relation.id]
             grouped_edge = NewEdge(prev_edge.id, prev_edge.subject, prev_edge.object, new_relation['id'], new_relation['label'], new_relation['iri'])
             return grouped_edge
         else:
-            edge = NewEdge(prev_edge.id, prev_edge.subject, prev_edge.object, prev_edge.relation['id'], prev_edge.relation['label'], prev_edge.relation['iri'])
+            edge = NewEdge(prev_edge.id, prev_edge.subject, prev_edge.object, prev_edge.relation.id, prev_edge.relation.label, prev_edge.relation.iri)
             return edge
     
-    def get_node_associations(self, node_id, edges_df: pd.DataFrame):
+    def get_node_relations_index(self, edges_df: pd.DataFrame):
         """
-            Get all relations that are found at least once in an edge connected to the given node.
+            Index for each node all relations that are found at least once in an edge connected to the node.
+            :param edges_df: dataframe with all edges
+            :return: dictionary with node ids as keys and sets of relation ids as values
         """
-        # Create heatmap for each semantic group, each column being a relation, count occurrence of each relation, ratio with total of entity of that semantic group
-        associated_rows_df = edges_df.loc[(edges_df['subject'] == node_id) | (edges_df['object'] == node_id)]
-        relations = associated_rows_df['relation_id'].unique().tolist()
+        if edges_df.empty:
+            return {}
         
-        return relations
+        subject_relations = edges_df[['subject', 'relation_id']].rename(columns={'subject': 'node_id'})
+        object_relations = edges_df[['object', 'relation_id']].rename(columns={'object': 'node_id'})
+        incident_relations = pd.concat([subject_relations, object_relations], ignore_index=True)
+        
+        return incident_relations.groupby('node_id')['relation_id'].agg(set).to_dict()
+        
+    def get_node_associations(self, node_id, node_relations_index: dict):
+        """
+            Get all relations that are found at least once in an edge connected to the given node.
+            :param node_relations_index: dictionary with relation ids of each node, see `get_node_relations_index`
+        """
+        return node_relations_index.get(node_id, set())
         
-    def transform_node_semantic(self, node: AssocNode, all_relations: list):
+    def transform_node_semantic(self, node: AssocNode, all_relations: set):
         """
             Change the semantic group of the node based on its previous semantic group or its associated relations.
         """
         if node.semantic_groups == constants.MODEL:
-            if any(i in ['RO:0002327', 'BFO:0000050', 'RO:0002434', 'RO:0002325', 'RO:HOM0000017'] for i in all_relations):
+            if any(i in constants.MODEL_GENE_RELATION_IDS for i in all_relations):
                 return constants.GENE
             elif constants.IS_VARIANT_IN['id'] in all_relations:
                 return constants.GENOTYPE
@@ -382,18 +504,19 @@ class RestructuredKnowledgeGraph(KnowledgeGraph):
         
         return node.semantic_groups
         
-    def add_concept_taxon(self, node: AssocNode):
+    def add_concept_taxon(self, node: AssocNode, semantic_group: str):
         """
             Add nodes as entities of semantic group TAXON.
+            :param semantic_group: transformed semantic group of given node
         """
-        if not pd.isnull(node.taxon_id) and node.semantic_groups in [constants.GENE, constants.BIOLART]:
+        if not pd.isnull(node.taxon_id) and semantic_group in [constants.GENE, constants.BIOLART]:
             gene_node = node
             taxon_node = NewNode(id=gene_node.taxon_id, label=gene_node.taxon_label, iri=np.nan, semantic=constants.TAXON)
             
-            if node.semantic_groups == constants.GENE:
+            if semantic_group == constants.GENE:
                 taxon_edge_id = common.generate_edge_id(constants.FOUND_IN['id'], gene_node.id, taxon_node.id)
                 taxon_edge = NewEdge(taxon_edge_id, gene_node.id, taxon_node.id, constants.FOUND_IN['id'], constants.FOUND_IN['label'], constants.FOUND_IN['iri'])
-            elif node.semantic_groups == constants.BIOLART:
+            elif semantic_group == constants.BIOLART:
                 taxon_edge_id = common.generate_edge_id(constants.IS_OF['id'], gene_node.id, taxon_node.id)
                 taxon_edge = NewEdge(taxon_edge_id, gene_node.id, taxon_node.id, constants.IS_OF['id'], constants.IS_OF['label'], constants.IS_OF['iri'])
             else:
@@ -406,33 +529,35 @@ class RestructuredKnowledgeGraph(KnowledgeGraph):
         """
             Restructure the knowledge graph by iterating over all edges and nodes of the given graph.
         """
-        _, prev_nodes_df = prev_kg.generate_dataframes()
+        # Index semantic group of each node once, such that each edge rule looks up its nodes in constant time
+        node_semantics = dict(zip(prev_kg.all_nodes.get_column('id'), prev_kg.all_nodes.get_column('semantic_groups')))
         
         print('Iterating over edges (grouping, deducing, renaming) ...')
         for prev_edge in tqdm(prev_kg.all_edges):
             if self.edge_is_empty(prev_edge):
-                new_edge = self.deduce_edge(prev_edge, prev_nodes_df)
+                new_edge = self.deduce_edge(prev_edge, node_semantics)
                 self.add_edge(new_edge)
-            elif not self.remove_edge(prev_edge, prev_nodes_df):
+            elif not self.remove_edge(prev_edge, node_semantics):
                 new_edge = self.group_edge(prev_edge)
-                new_edge = self.rename_edge(new_edge, prev_nodes_df)
+                new_edge = self.rename_edge(new_edge, node_semantics)
                 
                 self.add_edge(new_edge)
             
         edges_df, _ = self.generate_dataframes()
+        node_relations_index = self.get_node_relations_index(edges_df)
         
         print('Iterating over nodes (transforming, adding) ...')
         for node in tqdm(prev_kg.all_nodes):
             if not self.remove_node(node):
                 # Get all relations it is associated with
-                node_relations = self.get_node_associations(node.id, edges_df)
+                node_relations = self.get_node_associations(node.id, node_relations_index)
                 
-                node.semantic_groups = self.transform_node_semantic(node, node_relations)
+                semantic_group = self.transform_node_semantic(node, node_relations)
                 
                 # Add TAXON nodes
-                self.add_concept_taxon(node)
+                self.add_concept_taxon(node, semantic_group)
                 
-                new_node = NewNode(node.id, node.label, node.iri, node.semantic_groups)
+                new_node = NewNode(node.id, node.label, node.iri, semantic_group)
                 self.add_node(new_node)
 
     
\ No newline at end of file
@@ -0,0 +1,338 @@
+"""
+    This module restructures a knowledge graph given as dataframes of edges and nodes, applying the same rules as
+    `builder.kg.RestructuredKnowledgeGraph` over whole columns at once instead of over one edge or node at a time.
+    Semantic groups are compared as integer codes and relations are replaced through masks.
+"""
+
+import time
+
+import numpy as np
+import pandas as pd
+
+import util.constants as constants
+import util.common as common
+
+from util.common import register_info, register_error
+from builder.kg import RestructuredKnowledgeGraph
+from builder.storage import to_object_array
+
+EDGE_COLUMNS = ['id', 'subject', 'object', 'relation_id', 'relation_label', 'relation_iri']
+NODE_COLUMNS = ['id', 'label', 'iri', 'semantic']
+RELATION_KEYS = ['id', 'label', 'iri']
+
+# Semantic groups that are replaced by another semantic group regardless of the relations of the node
+SEMANTIC_RENAMING = {
+    constants.PATHWAY: constants.BIOLPRO,
+    constants.CHEMICAL: constants.DRUG
+}
+
+class SemanticCodes:
+    """
+        Initialize integer codes of the semantic groups of all given nodes, such that semantic groups of nodes and edges
+        can be compared at once.
+        :param semantic_groups: sequence with semantic group of each node
+    """
+    def __init__(self, semantic_groups):
+        self.codes, self.semantic_groups = pd.factorize(np.asarray(semantic_groups, dtype=object))
+
+    def isin(self, codes, semantic_groups: list):
+        """
+            Test for all given codes whether they represent one of the given semantic groups.
+            :param codes: array of codes, missing semantic groups are coded as `-1`
+            :return: boolean mask over given codes
+        """
+        dictionary_mask = np.fromiter((semantic_group in semantic_groups for semantic_group in self.semantic_groups), dtype=bool, count=len(self.semantic_groups))
+        return np.append(dictionary_mask, False)[codes]
+
+def assign_relation(relation_columns: dict, mask, relation: dict):
+    """
+        Replace the relation of all edges for which given mask is true.
+        :param relation_columns: dictionary with arrays of relation id, label and iri of all edges that are changed in place
+        :param mask: boolean mask over all edges
+        :param relation: dictionary with id, label and iri of new relation, see for example `constants.TREATS`
+    """
+    for key in RELATION_KEYS:
+        relation_columns[key][mask] = relation[key]
+
+def restructure_relations(prev_relations_df: pd.DataFrame, subject_codes, object_codes, semantic_codes: SemanticCodes):
+    """
+        Deduce the relation of each edge without relation and group and rename the relation of all other edges, see `deduce_edge`,
+        `remove_edge`, `group_edge` and `rename_edge` of `RestructuredKnowledgeGraph`.
+        :param prev_relations_df: dataframe with relation id, label and iri of edges of previous graph
+        :param subject_codes: array with semantic code of the subject of each edge
+        :param object_codes: array with semantic code of the object of each edge
+        :param semantic_codes: `SemanticCodes` of which the semantic groups are coded by given codes
+        :return: dictionary with arrays of relation id, label and iri of given edges and boolean mask over given edges that are kept
+    """
+    relation_columns = {key: prev_relations_df[f'relation_{key}'].to_numpy(dtype=object, copy=True) for key in RELATION_KEYS}
+
+    # Deduce relations of empty edges from the semantic groups of their nodes
+    is_empty = pd.isnull(relation_columns['id'])
+    is_variant_in = is_empty & semantic_codes.isin(subject_codes, [constants.VAR]) & semantic_codes.isin(object_codes, [constants.GENOTYPE, constants.MODEL])
+    treats = is_empty & semantic_codes.isin(subject_codes, [constants.CHEMICAL]) & semantic_codes.isin(object_codes, [constants.DISEASE])
+    expresses_gene = is_empty & semantic_codes.isin(subject_codes, [constants.GENOTYPE, constants.MODEL]) & semantic_codes.isin(object_codes, [constants.GENE])
+
+    is_ignored = is_empty & ~(is_variant_in | treats | expresses_gene)
+    ignored_df = pd.DataFrame({'subject': subject_codes[is_ignored], 'object': object_codes[is_ignored]})
+    for (subject_code, object_code), count in ignored_df.value_counts().items():
+        subject_concept = semantic_codes.semantic_groups[subject_code] if subject_code >= 0 else np.nan
+        object_concept = semantic_codes.semantic_groups[object_code] if object_code >= 0 else np.nan
+        print(f'Ignore {count} edges with subject concept {subject_concept} and object concept {object_concept}')
+
+    # Remove non-empty edges with anatomical entities
+    is_removed = ~is_empty & (semantic_codes.isin(subject_codes, [constants.ANAT]) | semantic_codes.isin(object_codes, [constants.ANAT]))
+
+    # Group relations of remaining edges
+    grouping_positions = pd.Index(list(constants.REL_GROUPING)).get_indexer(relation_columns['id'])
+    is_grouped = ~is_empty & ~is_removed & (grouping_positions >= 0)
+    for key in RELATION_KEYS:
+        grouped_relations = np.array([relation[key] for relation in constants.REL_GROUPING.values()], dtype=object)
+        relation_columns[key][is_grouped] = grouped_relations[grouping_positions[is_grouped]]
+
+    assign_relation(relation_columns, is_variant_in, constants.IS_VARIANT_IN)
+    assign_relation(relation_columns, treats, constants.TREATS)
+    assign_relation(relation_columns, expresses_gene, constants.EXPRESSES_GENE)
+
+    # Rename relations between diseases and phenotypes
+    is_renamed = ~is_empty & ~is_removed & semantic_codes.isin(subject_codes, [constants.DISEASE]) & semantic_codes.isin(object_codes, [constants.PHENOTYPE])
+    assign_relation(relation_columns, is_renamed, constants.PHENOTYPE_ASSOCIATED)
+
+    is_kept = ~is_ignored & ~is_removed
+
+    return relation_columns, is_kept
+
+def select_edges(prev_edges_df: pd.DataFrame, relation_columns: dict, is_kept):
+    """
+        Get columns of kept edges with their restructured relations, see `restructure_relations`.
+        :return: dictionary with arrays of all columns of restructured edges in order of given edges
+    """
+    edge_columns = {column: prev_edges_df[column].to_numpy(dtype=object)[is_kept] for column in ['id', 'subject', 'object']}
+    edge_columns.update({f'relation_{key}': relation_columns[key][is_kept] for key in RELATION_KEYS})
+
+    return edge_columns
+
+def restructure_edges(prev_edges_df: pd.DataFrame, subject_codes, object_codes, semantic_codes: SemanticCodes):
+    """
+        Restructure the relations of given edges and remove edges that are ignored or removed, see `restructure_relations`.
+        :param prev_edges_df: dataframe with edges of previous graph
+        :return: dictionary with arrays of all columns of restructured edges in order of given edges
+    """
+    relation_columns, is_kept = restructure_relations(prev_edges_df, subject_codes, object_codes, semantic_codes)
+    return select_edges(prev_edges_df, relation_columns, is_kept)
+
+def get_incident_mask(node_ids, edge_columns: dict, relation_ids: list):
+    """
+        Test for all given nodes whether they are connected to at least one edge with one of the given relations.
+        :param node_ids: array of node ids
+        :param edge_columns: dictionary with arrays of all columns of edges
+        :return: boolean mask over given nodes
+    """
+    is_relation = pd.Series(edge_columns['relation_id']).isin(relation_ids).to_numpy()
+    incident_node_ids = np.concatenate([edge_columns['subject'][is_relation], edge_columns['object'][is_relation]])
+    return pd.Series(node_ids).isin(incident_node_ids).to_numpy()
+
+def transform_node_semantics(node_ids, node_codes, semantic_codes: SemanticCodes, edge_columns: dict):
+    """
+        Change the semantic group of each node based on its previous semantic group or the relations of the restructured edges
+        connected to it, see `transform_node_semantic` of `RestructuredKnowledgeGraph`.
+        :param node_ids: array of node ids
+        :param node_codes: array with semantic code of each node
+        :param semantic_codes: `SemanticCodes` of all nodes of previous graph
+        :param edge_columns: dictionary with arrays of all columns of restructured edges
+        :return: array with new semantic group of each node
+    """
+    new_semantic_groups = np.array([SEMANTIC_RENAMING.get(semantic_group, semantic_group) for semantic_group in semantic_codes.semantic_groups] + [np.nan], dtype=object)
+    new_semantic = new_semantic_groups[node_codes]
+
+    is_model = semantic_codes.isin(node_codes, [constants.MODEL])
+    is_model_gene = is_model & get_incident_mask(node_ids, edge_columns, constants.MODEL_GENE_RELATION_IDS)
+    is_model_genotype = is_model & ~is_model_gene & get_incident_mask(node_ids, edge_columns, [constants.IS_VARIANT_IN['id']])
+
+    new_semantic[is_model] = constants.BIOLART
+    new_semantic[is_model_gene] = constants.GENE
+    new_semantic[is_model_genotype] = constants.GENOTYPE
+
+    return new_semantic
+
+def get_taxon_nodes(node_columns: dict):
+    """
+        Get nodes of semantic group TAXON of all genes and biological artifacts with a taxon, see `add_concept_taxon` of
+        `RestructuredKnowledgeGraph`.
+        :param node_columns: dictionary with arrays of all columns of transformed nodes including taxon id and label
+        :return: boolean mask over given nodes that have a taxon, dictionary with arrays of all columns of taxon nodes
+    """
+    has_taxon = ~pd.isnull(node_columns['taxon_id']) & np.isin(node_columns['semantic'], [constants.GENE, constants.BIOLART])
+    taxon_ids = node_columns['taxon_id'][has_taxon]
+
+    taxon_node_columns = {
+        'id': taxon_ids,
+        'label': node_columns['taxon_label'][has_taxon],
+        'iri': np.full(len(taxon_ids), np.nan, dtype=object),
+        'semantic': np.full(len(taxon_ids), constants.TAXON, dtype=object)
+    }
+
+    return has_taxon, taxon_node_columns
+
+def get_taxon_edges(node_columns: dict, has_taxon):
+    """
+        Get edges connecting genes and biological artifacts to their taxon, see `add_concept_taxon` of `RestructuredKnowledgeGraph`.
+        :param node_columns: dictionary with arrays of all columns of transformed nodes including taxon id
+        :param has_taxon: boolean mask over given nodes that have a taxon, see `get_taxon_nodes`
+        :return: dictionary with arrays of all columns of taxon edges
+    """
+    is_gene = node_columns['semantic'][has_taxon] == constants.GENE
+    gene_ids = node_columns['id'][has_taxon]
+    taxon_ids = node_columns['taxon_id'][has_taxon]
+    relation_columns = {key: np.where(is_gene, constants.FOUND_IN[key], constants.IS_OF[key]).astype(object) for key in RELATION_KEYS}
+
+    taxon_edge_columns = {
+        'id': to_object_array(common.generate_edge_ids(relation_columns['id'], gene_ids, taxon_ids)),
+        'subject': gene_ids,
+        'object': taxon_ids
+    }
+    taxon_edge_columns.update({f'relation_{key}': relation_columns[key] for key in RELATION_KEYS})
+
+    return taxon_edge_columns
+
+def get_concept_taxa(node_columns: dict):
+    """
+        Get nodes of semantic group TAXON and the edges connecting them to all genes and biological artifacts with a taxon,
+        see `get_taxon_nodes` and `get_taxon_edges`.
+        :return: boolean mask over given nodes that have a taxon, dictionaries with arrays of all columns of taxon nodes and taxon edges
+    """
+    has_taxon, taxon_node_columns = get_taxon_nodes(node_columns)
+    return has_taxon, taxon_node_columns, get_taxon_edges(node_columns, has_taxon)
+
+def concat_unique(all_columns: list, column_names: list, order = None):
+    """
+        Concatenate columns of edges or nodes into one dataframe, keeping the first occurrence of each id.
+        :param all_columns: list of dictionaries with arrays of all columns
+        :param column_names: names of columns of dataframe
+        :param order: array of positions in which concatenated rows are added, by default in order of concatenation
+        :return: dataframe with unique edges or nodes
+    """
+    columns = {column: np.concatenate([columns[column] for columns in all_columns]) for column in column_names}
+
+    if order is not None:
+        columns = {column: values[np.argsort(order, kind='stable')] for column, values in columns.items()}
+
+    is_unique = ~pd.Index(columns['id']).duplicated(keep='first')
+
+    return pd.DataFrame({column: values[is_unique] for column, values in columns.items()}, columns=column_names, dtype=object)
+
+def concat_taxon_nodes(node_columns: dict, has_taxon, taxon_node_columns: dict):
+    """
+        Concatenate transformed nodes and taxon nodes into one dataframe. Each taxon node is added right before the node it is
+        found in and the first added node of each id is kept, as in `restructure_kg` of `RestructuredKnowledgeGraph`.
+        :param node_columns: dictionary with arrays of all columns of transformed nodes in iteration order of previous graph
+        :param has_taxon: boolean mask over given nodes that have a taxon, see `get_taxon_nodes`
+        :param taxon_node_columns: dictionary with arrays of all columns of taxon nodes, see `get_taxon_nodes`
+        :return: dataframe with unique nodes
+    """
+    node_order = np.concatenate([2 * np.flatnonzero(has_taxon), 2 * np.arange(len(node_columns['id'])) + 1])
+    return concat_unique([taxon_node_columns, node_columns], NODE_COLUMNS, node_order)
+
+def transform_nodes(prev_nodes_df: pd.DataFrame, semantic_codes: SemanticCodes, edge_columns: dict):
+    """
+        Remove nodes with anatomical entities and transform the semantic group of the remaining nodes, see `restructure_nodes`.
+        :param prev_nodes_df: dataframe with nodes of previous graph including taxon id and label in iteration order
+        :param semantic_codes: `SemanticCodes` of given nodes
+        :param edge_columns: dictionary with arrays of all columns of restructured edges, of which only the edges with relations
+        of `constants.MODEL_GENE_RELATION_IDS` and `constants.IS_VARIANT_IN` are used
+        :return: dictionary with arrays of all columns of transformed nodes
+    """
+    is_kept = ~semantic_codes.isin(semantic_codes.codes, [constants.ANAT])
+    node_columns = {column: prev_nodes_df[column].to_numpy(dtype=object)[is_kept] for column in prev_nodes_df.columns}
+    node_columns['semantic'] = transform_node_semantics(node_columns['id'], semantic_codes.codes[is_kept], semantic_codes, edge_columns)
+
+    return node_columns
+
+def restructure_nodes(prev_nodes_df: pd.DataFrame, semantic_codes: SemanticCodes, edge_columns: dict):
+    """
+        Remove nodes with anatomical entities, transform the semantic group of the remaining nodes and add taxon nodes,
+        see `restructure_kg` of `RestructuredKnowledgeGraph`.
+        :param prev_nodes_df: dataframe with all nodes of previous graph including taxon id and label in iteration order
+        :param semantic_codes: `SemanticCodes` of all nodes of previous graph
+        :param edge_columns: dictionary with arrays of all columns of all restructured edges
+        :return: dataframe with all restructured nodes and dictionary with arrays of all columns of taxon edges
+    """
+    node_columns = transform_nodes(prev_nodes_df, semantic_codes, edge_columns)
+
+    has_taxon, taxon_node_columns, taxon_edge_columns = get_concept_taxa(node_columns)
+    nodes_df = concat_taxon_nodes(node_columns, has_taxon, taxon_node_columns)
+
+    return nodes_df, taxon_edge_columns
+
+def get_semantic_codes(prev_edges_df: pd.DataFrame, prev_nodes_df: pd.DataFrame):
+    """
+        Get semantic codes of all nodes and look up the semantic code of the subject and object of each edge by position of node.
+        Raises a `ValueError` when the subject or object of an edge is not one of the given nodes.
+        :return: `SemanticCodes` of all nodes, arrays with semantic code of the subject and object of each edge
+    """
+    semantic_codes = SemanticCodes(prev_nodes_df['semantic'])
+    node_index = pd.Index(prev_nodes_df['id'])
+    subject_positions = node_index.get_indexer(prev_edges_df['subject'])
+    object_positions = node_index.get_indexer(prev_edges_df['object'])
+
+    # A position of -1 would look up the code of the last node, so edges with unknown nodes are rejected
+    is_missing = (subject_positions < 0) | (object_positions < 0)
+    if is_missing.any():
+        missing_ids = pd.unique(np.concatenate([prev_edges_df['subject'].to_numpy(dtype=object)[subject_positions < 0], prev_edges_df['object'].to_numpy(dtype=object)[object_positions < 0]]))
+        raise ValueError(f'{is_missing.sum()} edges refer to nodes that are not in the graph, for example {list(missing_ids[:5])}')
+
+    subject_codes = semantic_codes.codes[subject_positions]
+    object_codes = semantic_codes.codes[object_positions]
+
+    return semantic_codes, subject_codes, object_codes
+
+def restructure_dataframes(prev_edges_df: pd.DataFrame, prev_nodes_df: pd.DataFrame):
+    """
+        Restructure the knowledge graph given by dataframes of its edges and nodes, equal to `RestructuredKnowledgeGraph`.
+        Edges and nodes are expected in iteration order of the previous graph, such that nodes with an id that is equal to the id
+        of a taxon are resolved in the same way: the first added node with an id is kept.
+        :param prev_edges_df: dataframe with all edges of previous graph, see `KnowledgeGraph.generate_dataframes`
+        :param prev_nodes_df: dataframe with all nodes of previous graph including taxon id and label
+        :return: dataframe with all restructured edges and dataframe with all restructured nodes
+    """
+    prev_edges_df = prev_edges_df.reindex(columns=EDGE_COLUMNS).astype(object)
+    prev_nodes_df = prev_nodes_df.reindex(columns=NODE_COLUMNS + ['taxon_id', 'taxon_label']).astype(object)
+
+    semantic_codes, subject_codes, object_codes = get_semantic_codes(prev_edges_df, prev_nodes_df)
+    edge_columns = restructure_edges(prev_edges_df, subject_codes, object_codes, semantic_codes)
+
+    nodes_df, taxon_edge_columns = restructure_nodes(prev_nodes_df, semantic_codes, edge_columns)
+    edges_df = concat_unique([edge_columns, taxon_edge_columns], EDGE_COLUMNS)
+
+    return edges_df, nodes_df
+
+def sort_dataframe(df: pd.DataFrame):
+    """
+        Sort given dataframe by id such that dataframes of graphs generated in different order can be compared.
+    """
+    return df.astype(object).sort_values('id', kind='stable').reset_index(drop=True)
+
+def check_restructure_parity(prev_kg):
+    """
+        Restructure given graph with `restructure_dataframes` as well as with `RestructuredKnowledgeGraph` and check whether both
+        result in the same edges and nodes.
+        :param prev_kg: `AssocKnowledgeGraph` instance that needs to be restructured
+        :return: `True` when both restructured graphs are equal, otherwise `False`
+    """
+    prev_edges_df, prev_nodes_df = prev_kg.generate_dataframes()
+
+    start_time = time.perf_counter()
+    edges_df, nodes_df = restructure_dataframes(prev_edges_df, prev_nodes_df)
+    dataframes_s = time.perf_counter() - start_time
+
+    start_time = time.perf_counter()
+    kg_edges_df, kg_nodes_df = RestructuredKnowledgeGraph(prev_kg).generate_dataframes()
+    objects_s = time.perf_counter() - start_time
+
+    equal_edges = sort_dataframe(edges_df).equals(sort_dataframe(kg_edges_df.reindex(columns=EDGE_COLUMNS)))
+    equal_nodes = sort_dataframe(nodes_df).equals(sort_dataframe(kg_nodes_df.reindex(columns=NODE_COLUMNS)))
+
+    register_info(f'Restructured graph with dataframes in {dataframes_s:.2f}s and with objects in {objects_s:.2f}s')
+    if not (equal_edges and equal_nodes):
+        register_error(f'Restructured graphs differ (equal edges: {equal_edges}, equal nodes: {equal_nodes})')
+
+    return equal_edges and equal_nodes
@@ -0,0 +1,222 @@
+"""
+    This module builds and restructures a knowledge graph in parallel worker processes. Associations are partitioned into shards
+    by the hash of their edge id, such that all associations of an edge end up in the same shard. Each shard constructs its partial
+    graph, after which the partial graphs are merged into the same graph as `builder.kg.AssocKnowledgeGraph` would build. A
+    graph is restructured in contiguous shards: once the semantic group of each node is known, the edges of each shard are
+    restructured independently, after which the nodes of each shard are restructured given the merged edges.
+"""
+
+import os
+import time
+
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+import util.constants as constants
+
+from util.associationtable import AssociationTable
+from util.common import register_info, register_error
+from builder.kg import AssocKnowledgeGraph
+from builder.restructure import EDGE_COLUMNS, NODE_COLUMNS, RELATION_KEYS, SemanticCodes, concat_taxon_nodes, concat_unique, get_concept_taxa, get_semantic_codes, restructure_dataframes, restructure_relations, select_edges, sort_dataframe, transform_nodes
+
+WORKERS = os.cpu_count() or 1
+
+def get_shards(edge_ids, num_shards: int):
+    """
+        Get shard of each edge id. Ids are hashed with `pandas.util.hash_array`, which does not depend on the hash seed of the
+        process, such that the shards are equal across runs.
+        :param edge_ids: array of edge ids
+        :return: array with shard of each edge id
+    """
+    return (pd.util.hash_array(np.asarray(edge_ids, dtype=object)) % np.uint64(num_shards)).astype(np.int64)
+
+def get_first_positions(ids, positions):
+    """
+        Get positions of the first occurrence of each id in order of first occurrence.
+        :param ids: array of ids
+        :param positions: array with position of each id
+    """
+    return positions[~pd.Index(ids).duplicated(keep='first')]
+
+def build_shard(associations: AssociationTable, positions):
+    """
+        Construct the partial graph of one shard of associations.
+        :param associations: association table of shard
+        :param positions: array with position of each association of shard in all associations
+        :return: dataframe with all edges and dataframe with all nodes of partial graph, each with the position at which the
+        edge or node is added to the graph of all associations in column `position`
+    """
+    kg = AssocKnowledgeGraph(associations)
+    edges_df, nodes_df = kg.generate_dataframes()
+
+    # Dataframes of the graph are shared, so the positions are added to copies
+    edges_df = edges_df.assign(position=get_first_positions(associations.column('id'), positions))
+
+    # Subject and object of an association are added in this order, so the node positions interleave both
+    node_ids = np.empty(2 * len(associations), dtype=object)
+    node_ids[0::2] = associations.column('subject_id')
+    node_ids[1::2] = associations.column('object_id')
+    nodes_df = nodes_df.assign(position=get_first_positions(node_ids, np.repeat(2 * positions, 2) + np.tile([0, 1], len(positions))))
+
+    return edges_df, nodes_df
+
+def restructure_shard(prev_relations_df: pd.DataFrame, subject_codes, object_codes, semantic_groups):
+    """
+        Restructure the relations of one shard of edges, see `builder.restructure.restructure_relations`.
+        :param prev_relations_df: dataframe with relation id, label and iri of edges of shard of previous graph
+        :param subject_codes: array with semantic code of the subject of each edge of shard
+        :param object_codes: array with semantic code of the object of each edge of shard
+        :param semantic_groups: array with semantic group of each code, see `builder.restructure.SemanticCodes`
+        :return: dictionary with arrays of relation id, label and iri of edges of shard and boolean mask over kept edges
+    """
+    return restructure_relations(prev_relations_df, subject_codes, object_codes, SemanticCodes(semantic_groups))
+
+def merge_shards(shard_dfs: list):
+    """
+        Merge dataframes of partial graphs in order of the position of each edge or node, keeping the first edge or node with an id.
+        :param shard_dfs: list of dataframes with column `position`, see `build_shard`
+        :return: dataframe without column `position`
+    """
+    merged_df = pd.concat(shard_dfs, ignore_index=True).sort_values('position', kind='stable')
+    merged_df = merged_df.drop_duplicates(subset='id', keep='first').drop(columns='position')
+    return merged_df.reset_index(drop=True).astype(object)
+
+def split_positions(length: int, num_shards: int):
+    """
+        Split the positions of `length` rows into contiguous shards of about equal size, keeping at least one shard.
+        :return: list of arrays of positions
+    """
+    return [positions for positions in np.array_split(np.arange(length), num_shards) if len(positions) > 0] or [np.arange(0)]
+
+def concat_columns(all_columns: list):
+    """
+        Concatenate dictionaries with arrays of the same columns in given order.
+    """
+    return {column: np.concatenate([columns[column] for columns in all_columns]) for column in all_columns[0]}
+
+def restructure_node_shard(prev_nodes_df: pd.DataFrame, edge_columns: dict):
+    """
+        Transform the nodes of one shard and get their taxon nodes and taxon edges, see `builder.restructure.restructure_nodes`.
+        :param prev_nodes_df: dataframe with nodes of shard of previous graph including taxon id and label
+        :param edge_columns: dictionary with arrays of subject, object and relation id of the restructured edges of which the
+        relation determines the semantic group of a node, see `builder.restructure.transform_nodes`
+        :return: dictionary with arrays of all columns of transformed nodes, boolean mask over transformed nodes that have a taxon
+        and dictionaries with arrays of all columns of taxon nodes and taxon edges
+    """
+    node_columns = transform_nodes(prev_nodes_df, SemanticCodes(prev_nodes_df['semantic']), edge_columns)
+    has_taxon, taxon_node_columns, taxon_edge_columns = get_concept_taxa(node_columns)
+    return node_columns, has_taxon, taxon_node_columns, taxon_edge_columns
+
+def restructure_sharded(prev_edges_df: pd.DataFrame, prev_nodes_df: pd.DataFrame, num_workers: int = WORKERS, num_shards: int = None):
+    """
+        Restructure the graph given by dataframes of its edges and nodes in worker processes, equal to
+        `builder.restructure.restructure_dataframes`. Edges and nodes are split into contiguous shards, such that restructured
+        shards are merged in iteration order of the previous graph. The semantic codes of the subject and object of each edge are
+        looked up once, such that each edge shard only receives its relations and the codes of the nodes it refers to. Nodes are
+        restructured given the restructured edges that determine their semantic group. With a single worker, the graph is
+        restructured in this process, since sending shards to a worker process only adds to the time of restructuring.
+        :param prev_edges_df: dataframe with all edges of previous graph in iteration order
+        :param prev_nodes_df: dataframe with all nodes of previous graph including taxon id and label in iteration order
+        :param num_workers: number of worker processes
+        :param num_shards: number of shards of edges and of nodes, by default equal to the number of worker processes
+        :return: dataframe with all restructured edges and dataframe with all restructured nodes
+    """
+    if num_workers <= 1:
+        return restructure_dataframes(prev_edges_df, prev_nodes_df)
+
+    prev_edges_df = prev_edges_df.reindex(columns=EDGE_COLUMNS).astype(object)
+    prev_nodes_df = prev_nodes_df.reindex(columns=NODE_COLUMNS + ['taxon_id', 'taxon_label']).astype(object)
+    num_shards = num_shards or num_workers
+
+    start_time = time.perf_counter()
+    semantic_codes, subject_codes, object_codes = get_semantic_codes(prev_edges_df, prev_nodes_df)
+    relations_df = prev_edges_df[[f'relation_{key}' for key in RELATION_KEYS]]
+    edge_shard_positions = split_positions(len(prev_edges_df), num_shards)
+
+    with ProcessPoolExecutor(max_workers=num_workers) as executor:
+        edge_shard_results = list(executor.map(restructure_shard, [relations_df.iloc[positions] for positions in edge_shard_positions],
+                                               [subject_codes[positions] for positions in edge_shard_positions],
+                                               [object_codes[positions] for positions in edge_shard_positions],
+                                               [semantic_codes.semantic_groups] * len(edge_shard_positions)))
+
+        relation_columns = concat_columns([relation_columns for relation_columns, _ in edge_shard_results])
+        is_kept = np.concatenate([is_kept for _, is_kept in edge_shard_results])
+        edge_columns = select_edges(prev_edges_df, relation_columns, is_kept)
+
+        # Only the nodes and relations of edges of which the relation determines the semantic group of a node are sent to the node shards
+        is_semantic_relation = pd.Series(edge_columns['relation_id'], dtype=object).isin(constants.MODEL_GENE_RELATION_IDS + [constants.IS_VARIANT_IN['id']]).to_numpy()
+        semantic_edge_columns = {column: edge_columns[column][is_semantic_relation] for column in ['subject', 'object', 'relation_id']}
+
+        node_shards = [prev_nodes_df.iloc[positions] for positions in split_positions(len(prev_nodes_df), num_shards)]
+        node_shard_results = list(executor.map(restructure_node_shard, node_shards, [semantic_edge_columns] * len(node_shards)))
+
+    node_columns = concat_columns([node_columns for node_columns, _, _, _ in node_shard_results])
+    has_taxon = np.concatenate([has_taxon for _, has_taxon, _, _ in node_shard_results])
+    taxon_node_columns = concat_columns([taxon_node_columns for _, _, taxon_node_columns, _ in node_shard_results])
+    taxon_edge_columns = concat_columns([taxon_edge_columns for _, _, _, taxon_edge_columns in node_shard_results])
+
+    nodes_df = concat_taxon_nodes(node_columns, has_taxon, taxon_node_columns)
+    edges_df = concat_unique([edge_columns, taxon_edge_columns], EDGE_COLUMNS)
+    register_info(f'Restructured graph of {len(prev_edges_df)} edges and {len(prev_nodes_df)} nodes in {len(edge_shard_positions)} and {len(node_shards)} shards in {time.perf_counter() - start_time:.2f}s')
+
+    return edges_df, nodes_df
+
+def build_sharded_kg(all_associations: list | AssociationTable, num_workers: int = WORKERS, num_shards: int = None):
+    """
+        Build the knowledge graph of given associations and restructure it in worker processes. The resulting dataframes are equal
+        to those of `AssocKnowledgeGraph` and `RestructuredKnowledgeGraph` built from the same associations.
+        :param all_associations: list of tuples or association table complying with `constants.assoc_tuple_values`
+        :param num_workers: number of worker processes
+        :param num_shards: number of shards, by default equal to the number of worker processes
+        :return: tuple of dataframes with all edges and all nodes of the previous graph and tuple of dataframes with all edges and
+        all nodes of the restructured graph
+    """
+    if not isinstance(all_associations, AssociationTable):
+        all_associations = AssociationTable.from_tuples(all_associations)
+    num_shards = num_shards or num_workers
+
+    shards = get_shards(all_associations.column('id'), num_shards)
+    shard_positions = [np.flatnonzero(shards == shard) for shard in range(num_shards)]
+    shard_positions = [positions for positions in shard_positions if len(positions) > 0] or shard_positions[:1]
+
+    start_time = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=num_workers) as executor:
+        shard_associations = [all_associations.filter(positions).compact() for positions in shard_positions]
+        shard_dfs = list(executor.map(build_shard, shard_associations, shard_positions))
+
+    prev_edges_df = merge_shards([edges_df for edges_df, _ in shard_dfs])
+    prev_nodes_df = merge_shards([nodes_df for _, nodes_df in shard_dfs])
+    register_info(f'Built graph of {len(all_associations)} associations in {len(shard_positions)} shards in {time.perf_counter() - start_time:.2f}s')
+
+    prev_nodes_df = prev_nodes_df.reindex(columns=NODE_COLUMNS + ['taxon_id', 'taxon_label'])
+    edges_df, nodes_df = restructure_sharded(prev_edges_df, prev_nodes_df, num_workers, num_shards)
+
+    return (prev_edges_df, prev_nodes_df), (edges_df, nodes_df)
+
+def check_sharded_parity(all_associations: list | AssociationTable, num_workers: int = WORKERS):
+    """
+        Build and restructure the graph of given associations with `build_sharded_kg` as well as in a single process and check
+        whether both result in the same edges and nodes. The time of both is logged, such that it shows whether sharding is
+        faster than restructuring in a single process for a given number of workers.
+        :return: `True` when both graphs are equal, otherwise `False`
+    """
+    start_time = time.perf_counter()
+    (prev_edges_df, prev_nodes_df), (edges_df, nodes_df) = build_sharded_kg(all_associations, num_workers)
+    sharded_s = time.perf_counter() - start_time
+
+    start_time = time.perf_counter()
+    kg_prev_edges_df, kg_prev_nodes_df = AssocKnowledgeGraph(all_associations).generate_dataframes()
+    kg_edges_df, kg_nodes_df = restructure_dataframes(kg_prev_edges_df, kg_prev_nodes_df)
+    single_s = time.perf_counter() - start_time
+
+    # The previous graph is compared in iteration order, since restructuring keeps the first node with an id
+    equal_prev = prev_edges_df.equals(kg_prev_edges_df.astype(object)) and prev_nodes_df.equals(kg_prev_nodes_df.reindex(columns=prev_nodes_df.columns).astype(object))
+    equal_restructured = sort_dataframe(edges_df).equals(sort_dataframe(kg_edges_df)) and sort_dataframe(nodes_df).equals(sort_dataframe(kg_nodes_df))
+
+    register_info(f'Built and restructured graph with {num_workers} workers in {sharded_s:.2f}s and in a single process in {single_s:.2f}s')
+    if not (equal_prev and equal_restructured):
+        register_error(f'Sharded graphs differ (equal previous graph: {equal_prev}, equal restructured graph: {equal_restructured})')
+
+    return equal_prev and equal_restructured
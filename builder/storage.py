@@ -0,0 +1,204 @@
+"""
+    This module stores the nodes and edges of a knowledge graph as columns. Identifiers and other repeating values are mapped to
+    dense integer codes, such that columns are compact typed arrays. Dataframes of all nodes and edges are generated once and
+    extended with the rows of added records when the graph changes.
+"""
+
+from array import array
+from collections import defaultdict
+
+import numpy as np
+import pandas as pd
+
+CODE_TYPE = 'q'     # type code of arrays holding integer codes, see `array.array`
+
+def to_object_array(values: list):
+    """
+        Convert given list of values into a numpy array of objects without interpreting nested values.
+    """
+    object_array = np.empty(len(values), dtype=object)
+    object_array[:] = values
+    return object_array
+
+def select_rows(column, rows):
+    """
+        Select rows of a stored column of values or codes.
+        :param column: list of values or array of codes
+        :param rows: slice of rows or array of positions of rows
+        :return: list of values or numpy array of codes, which does not refer to the memory of the stored column
+    """
+    if isinstance(column, array):
+        if isinstance(rows, slice) or len(column) == 0:
+            return np.array(column[rows] if isinstance(rows, slice) else [], dtype=np.int64)
+        return np.frombuffer(column, dtype=np.int64)[rows]    # indexing with positions copies the selected codes
+
+    if isinstance(rows, slice):
+        return column[rows]
+    return [column[position] for position in rows]
+
+class ValueIndex:
+    """
+        Initialize an index that maps each distinct value to a dense integer code in order of first occurrence.
+        Values are expected to be hashable, missing values to be the `np.nan` singleton or `None`.
+    """
+    def __init__(self):
+        self.codes = dict()     # value -> code
+        self.values = list()    # code -> value
+        self.values_array = to_object_array([])
+
+    def __len__(self):
+        return len(self.values)
+
+    def encode(self, value):
+        """
+            Get code of given value, adding the value to the index when it does not exist yet.
+        """
+        code = self.codes.get(value)
+        if code is None:
+            code = self.codes[value] = len(self.values)
+            self.values.append(value)
+        return code
+
+    def get_values(self):
+        """
+            Get array of all values, in which the value of each code is found at the position of the code.
+        """
+        if len(self.values_array) != len(self.values):
+            self.values_array = to_object_array(self.values)
+        return self.values_array
+
+    def decode(self, codes):
+        """
+            Get values of given array of codes.
+        """
+        return self.get_values()[codes]
+
+class RecordStore:
+    """
+        Initialize a store of records with unique ids, in which each record is stored as one row of columns holding its fields.
+        Only the first added record with an id is kept. The position of a record is its dense integer id.
+        :param record_class: class of stored records, see `builder.kg.ImmutableRecord`
+        :param encoded_fields: dictionary with names of fields that are stored as integer codes as keys and `ValueIndex` instances as values
+        :param indexed_fields: names of encoded fields for which the positions of the records with each value are indexed
+    """
+    def __init__(self, record_class, encoded_fields: dict, indexed_fields: list = []):
+        self.record_class = record_class
+        self.fields = record_class.get_fields()
+        self.encoded_fields = encoded_fields
+        self.positions = dict()     # id -> position of record
+        self.columns = {field: array(CODE_TYPE) if field in encoded_fields else list() for field in self.fields}
+        self.column_writers = [(field, self.columns[field].append, encoded_fields[field].encode if field in encoded_fields else None) for field in self.fields]
+        self.indexes = {field: defaultdict(list) for field in indexed_fields}     # field -> code -> positions of records
+        self.dataframe = None       # dataframe of the records that were stored when it was generated
+
+    def __len__(self):
+        return len(self.positions)
+
+    def __contains__(self, record):
+        return record.id in self.positions
+
+    def __iter__(self):
+        for position in range(len(self)):
+            yield self.get_record(position)
+
+    def add(self, record):
+        """
+            Add given record when no record with the same id is stored yet.
+            :return: `True` when record is added, otherwise `False`
+        """
+        if record.id in self.positions:
+            return False
+
+        position = len(self.positions)
+        self.positions[record.id] = position
+
+        for field, append, encode in self.column_writers:
+            value = getattr(record, field)
+            if encode:
+                value = encode(value)
+                if field in self.indexes:
+                    self.indexes[field][value].append(position)
+            append(value)
+
+        return True
+
+    def get_positions(self, field: str, values: list):
+        """
+            Get positions of all records of which the value of given indexed field is one of the given values.
+            :return: array of positions in order in which records have been added
+        """
+        value_index = self.encoded_fields[field]
+        codes = [value_index.codes[value] for value in values if value in value_index.codes]
+        positions = [position for code in codes for position in self.indexes[field].get(code, [])]
+        return np.sort(np.array(positions, dtype=np.int64))
+
+    def get_record(self, position: int):
+        """
+            Get record stored at given position.
+        """
+        values = dict()
+        for field in self.fields:
+            value = self.columns[field][position]
+            values[field] = self.encoded_fields[field].values[value] if field in self.encoded_fields else value
+        return self.record_class.from_values(**values)
+
+    def get_codes(self, field: str, rows = slice(None)):
+        """
+            Get array of integer codes of given encoded field of given rows. The codes are copied, since a stored array cannot grow
+            while a numpy array refers to its memory.
+            :param rows: slice of rows or array of positions of rows, by default all rows
+        """
+        return select_rows(self.columns[field], rows)
+
+    def get_column(self, field: str, rows = slice(None)):
+        """
+            Get array of values of given field of given rows.
+            :param rows: slice of rows or array of positions of rows, by default all rows
+        """
+        if field in self.encoded_fields:
+            return self.encoded_fields[field].decode(self.get_codes(field, rows))
+        return to_object_array(select_rows(self.columns[field], rows))
+
+    def generate_dataframe(self, rows = slice(None)):
+        """
+            Generate dataframe with a column for each field of given rows, see `get_dataframe`.
+            :param rows: slice of rows or array of positions of rows, by default all rows
+        """
+        return pd.DataFrame({field: self.get_column(field, rows) for field in self.fields}, dtype=object)
+
+    def get_dataframe(self):
+        """
+            Get dataframe of all records. Since records are only appended, the dataframe is kept as long as no records are added
+            and only the rows of records that have been added since the last call are generated otherwise.
+            :return: stored dataframe, which is shared by all callers and must not be changed in place, copy it before changing it
+        """
+        if self.dataframe is None:
+            self.dataframe = self.generate_dataframe()
+        elif len(self.dataframe) < len(self):
+            added_dataframe = self.generate_dataframe(slice(len(self.dataframe), None))
+            self.dataframe = pd.concat([self.dataframe, added_dataframe], ignore_index=True)
+        return self.dataframe
+
+class NodeStore(RecordStore):
+    """
+        Initialize a store of nodes, see `RecordStore`. The semantic groups of the nodes are stored in the column `semantic`.
+    """
+    def generate_dataframe(self, rows = slice(None)):
+        columns = {field: self.get_column(field, rows) for field in self.fields}
+        columns['semantic'] = columns.pop('semantic_groups')
+        return pd.DataFrame(columns, columns=[column for column in ['id', 'label', 'iri', 'semantic', 'taxon_id', 'taxon_label'] if column in columns], dtype=object)
+
+class EdgeStore(RecordStore):
+    """
+        Initialize a store of edges, see `RecordStore`. The field `relation` is expected to be encoded, such that the id, label
+        and iri of all distinct relations are looked up once.
+    """
+    def generate_dataframe(self, rows = slice(None)):
+        columns = {field: self.get_column(field, rows) for field in ['id', 'subject', 'object']}
+
+        relation_codes = self.get_codes('relation', rows)
+        relations = self.encoded_fields['relation'].values
+        for key in ['id', 'label', 'iri']:
+            columns[f'relation_{key}'] = to_object_array([relation[key] for relation in relations])[relation_codes]
+
+        return pd.DataFrame(columns, dtype=object)
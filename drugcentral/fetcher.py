@@ -1,5 +1,7 @@
 
 
+import itertools
+import os
 import re
 import pandas as pd
 import numpy as np
@@ -8,39 +10,62 @@ import util.constants as constants
 import util.common as common
 import drugcentral.matcher as matcher
 
+DRUG_DISEASE_FILE = 'data/P1-05-Drug_disease.txt'
+HEADER_LINES = 22
+PARSER_VERSION = 1      # increase when the parsed entries change, such that cached entries of an earlier parser are not used
+DRUG_DISEASE_COLUMNS = ['DRUG_ID', 'DRUG_NAME', 'DISEASE_NAME', 'PHASE']
+
 ID_LINE = 'TTDDRUID'
 NAME_LINE = 'DRUGNAME'
 DISEASE_PHASE_LINE = 'INDICATI'
 EMPTY_LINE = '\n'
+
+NON_ALPHANUMERIC_PATTERN = re.compile('[^0-9a-zA-Z]+')
+
+def iter_drug_disease_entries(file_path: str = DRUG_DISEASE_FILE):
+    """
+        Parse drug-disease entries from the TTD file line by line. An indication line has the form `INDICATI\t<disease> [<ICD>] <phase>`,
+        of which the disease name ends at the last `[` and the phase starts after the first `]`.
+        :return: generator of tuples with the values of `DRUG_DISEASE_COLUMNS` of each indication
+    """
+    drug_id = drug_name = None
+    
+    with open(file_path) as f:
+        for line in itertools.islice(f, HEADER_LINES, None):
+            if line.startswith(ID_LINE):
+                drug_id = line.rstrip('\n').split('\t', 1)[1]
+            elif line.startswith(NAME_LINE):
+                drug_name = line.rstrip('\n').split('\t', 1)[1].lower()
+            elif line.startswith(DISEASE_PHASE_LINE):
+                line = line.rstrip('\n')
+                disease_name = line[line.index('\t') + 1:line.rindex('[')]
+                phase = line[line.index(']') + 1:]
+                
+                yield drug_id, drug_name, NON_ALPHANUMERIC_PATTERN.sub(' ', disease_name).lower().strip(), phase
+            elif line.startswith(EMPTY_LINE):
+                drug_id = drug_name = None
+
+def load_drug_disease_entries(file_path: str = DRUG_DISEASE_FILE, cache_folder: str = constants.OUTPUT_FOLDER):
+    """
+        Load drug-disease entries from the TTD file. Parsed entries are cached as typed columns in a file named after the parser version
+        and the hash of the TTD file, such that the file is only parsed again when its content or the parser changes.
+        :param cache_folder: folder of parsed entries, parsed entries are not cached when `None`
+        :return: Dataframe with columns `DRUG_DISEASE_COLUMNS`
+    """
+    cache_file = None
+    if cache_folder:
+        cache_file = os.path.join(cache_folder, f'drug_disease_entries_v{PARSER_VERSION}_{common.get_file_hash(file_path)[:16]}.npz')
+    
+    if cache_file and os.path.exists(cache_file):
+        with np.load(cache_file, allow_pickle=False) as columns:
+            drug_disease_df = pd.DataFrame({column: columns[column].astype(object) for column in DRUG_DISEASE_COLUMNS})
+        common.register_info(f'Loaded parsed drug-disease pairs from {cache_file}')
+    else:
+        drug_disease_df = pd.DataFrame(list(iter_drug_disease_entries(file_path)), columns=DRUG_DISEASE_COLUMNS)
         
-def load_drug_disease_entries():
-    with open('././data/P1-05-Drug_disease.txt') as f:
-        entry_lines = f.readlines()[22:]
-        
-    drug_disease_pairs = list()
-    current_drug_disease_pair = dict()
-    
-    for line in entry_lines:
-        if line.startswith(ID_LINE):
-            found_str = re.search('\t(.*)\n', line)
-            current_drug_disease_pair['DRUG_ID'] = found_str.group(1)
-        elif line.startswith(NAME_LINE): 
-            found_str = re.search('\t(.*)\n', line)
-            current_drug_disease_pair['DRUG_NAME'] = found_str.group(1).lower()
-        elif line.startswith(DISEASE_PHASE_LINE): 
-            found_str1 = re.search('\t(.*)\[', line)
-            found_str2 = re.search('\](.*)', line)
-            
-            str1 = found_str1.group(1)
-            
-            current_drug_disease_pair['DISEASE_NAME'] = re.sub("[^0-9a-zA-Z]+", " ", str1).lower().strip()
-            current_drug_disease_pair['PHASE'] = found_str2.group(1) 
-            
-            drug_disease_pairs.append(current_drug_disease_pair.copy())
-        elif line.startswith(EMPTY_LINE): 
-            current_drug_disease_pair = dict()
-    
-    drug_disease_df = pd.DataFrame.from_dict(drug_disease_pairs, orient='columns')
+        if cache_file:
+            np.savez(cache_file, **{column: drug_disease_df[column].to_numpy(dtype=str) for column in DRUG_DISEASE_COLUMNS})
+    
     common.register_info(f'Loaded {drug_disease_df.shape[0]} drug-disease pairs:\n{drug_disease_df.head(3)}')
     return drug_disease_df
 
@@ -54,37 +79,45 @@ def format_drugdisease_associations(drug_disease_pairs_prev: pd.DataFrame, drug_
     drug_disease_pairs = drug_disease_pairs_prev.drop_duplicates(inplace=False).copy()
     common.register_info(f'Total of {drug_disease_pairs_prev.shape[0]} drug-disease associations changed to {drug_disease_pairs.shape[0]} by dropping duplicates.')
     
-    for i, row in drug_disease_pairs.iterrows():
-        drug_id = drug_nodes.loc[drug_nodes['label'] == row['DRUG_NAME']]['id'].values[0]
-        subject_id = str(drug_id)
-        object_id = row['DISEASE_ID']
-        relation_id = constants.TREATS['id']
-        
-        drug_disease_pairs.loc[i,'id'] = common.generate_edge_id(relation_id, subject_id, object_id)
-        
-        drug_disease_pairs.loc[i,'subject_id'] = subject_id
-        drug_disease_pairs.loc[i,'subject_label'] = row['DRUG_NAME']
-        drug_disease_pairs.loc[i,'subject_iri'] = np.nan
-        drug_disease_pairs.loc[i,'subject_category'] = constants.DRUG
-        drug_disease_pairs.loc[i,'subject_taxon_id'] = np.nan
-        drug_disease_pairs.loc[i,'subject_taxon_label'] = np.nan
-        
-        drug_disease_pairs.loc[i,'object_id'] = object_id
-        drug_disease_pairs.loc[i,'object_label'] = np.nan
-        drug_disease_pairs.loc[i,'object_iri'] = np.nan
-        drug_disease_pairs.loc[i,'object_category'] = np.nan
-        drug_disease_pairs.loc[i,'object_taxon_id'] = np.nan
-        drug_disease_pairs.loc[i,'object_taxon_label'] = np.nan
-        
-        drug_disease_pairs.loc[i,'relation_id'] = relation_id
-        drug_disease_pairs.loc[i,'relation_label'] = constants.TREATS['label']
-        drug_disease_pairs.loc[i,'relation_iri'] = constants.TREATS['iri']
+    # Id of first drug node with the name of each drug
+    drug_ids = drug_nodes.drop_duplicates(subset='label').set_index('label')['id']
+    subject_ids = drug_disease_pairs['DRUG_NAME'].map(drug_ids)
+    
+    is_unmatched = subject_ids.isna()
+    if is_unmatched.any():
+        common.register_error(f'Dropped {is_unmatched.sum()} drug-disease associations of drug names without drug node: {drug_disease_pairs.loc[is_unmatched, "DRUG_NAME"].unique()[:10].tolist()}')
+        drug_disease_pairs = drug_disease_pairs[~is_unmatched].copy()
+        subject_ids = subject_ids[~is_unmatched]
+    
+    subject_ids = subject_ids.astype(str)
+    object_ids = drug_disease_pairs['DISEASE_ID']
+    relation_id = constants.TREATS['id']
+    
+    drug_disease_pairs['id'] = common.generate_edge_ids([relation_id] * len(drug_disease_pairs), subject_ids, object_ids)
+    
+    drug_disease_pairs['subject_id'] = subject_ids
+    drug_disease_pairs['subject_label'] = drug_disease_pairs['DRUG_NAME']
+    drug_disease_pairs['subject_iri'] = np.nan
+    drug_disease_pairs['subject_category'] = constants.DRUG
+    drug_disease_pairs['subject_taxon_id'] = np.nan
+    drug_disease_pairs['subject_taxon_label'] = np.nan
+    
+    drug_disease_pairs['object_id'] = object_ids
+    drug_disease_pairs['object_label'] = np.nan
+    drug_disease_pairs['object_iri'] = np.nan
+    drug_disease_pairs['object_category'] = np.nan
+    drug_disease_pairs['object_taxon_id'] = np.nan
+    drug_disease_pairs['object_taxon_label'] = np.nan
+    
+    drug_disease_pairs['relation_id'] = relation_id
+    drug_disease_pairs['relation_label'] = constants.TREATS['label']
+    drug_disease_pairs['relation_iri'] = constants.TREATS['iri']
         
     drugdisease_associations_df = drug_disease_pairs[list(constants.assoc_tuple_values)]
     drugdisease_associations_df.to_csv(f'{constants.OUTPUT_FOLDER}/drugcentral_associations.csv', index=None)
     common.register_info('All DrugCentral associations are saved into drugcentral_associations.csv')
     
-    return common.dataframe2tuplelist(drugdisease_associations_df) 
+    return common.dataframe2table(drugdisease_associations_df)
     
 def get_drugdisease_associations(drug_nodes: pd.DataFrame, diso_pheno_nodes: pd.DataFrame):
     """
@@ -1,18 +1,28 @@
+import os
+
 import util.constants as constants
 
+from util.common import register_info
 from util.loaders import load_associations_from_csv
-from builder.kg import AssocKnowledgeGraph, RestructuredKnowledgeGraph
+from builder.kg import AssocKnowledgeGraph, RestructuredKnowledgeGraph, save_dataframes
+from builder.restructure import restructure_dataframes
 
 import analyzer.graphstructure as graphstructure
 import monarch.fetcher as monarch_fetcher
 import ttd.fetcher as ttd_fetcher
 import drugcentral.fetcher as drugcentral_fetcher
 import builder.cypherqueries as cypher_querybuilder
+import builder.delta as kg_delta
+import builder.sharding as kg_sharding
 import ols.fetcher as ols_fetcher
 
 def analyze_data_from_kg(kg: AssocKnowledgeGraph | RestructuredKnowledgeGraph, concepts_filename, triplets_filename, ontologies: bool = False):
     edges, nodes = kg.generate_dataframes()
     
+    kg.analyze_graph()
+    analyze_data_from_dataframes(edges, nodes, concepts_filename, triplets_filename, ontologies)
+    
+def analyze_data_from_dataframes(edges, nodes, concepts_filename, triplets_filename, ontologies: bool = False):
     edge_colmapping = {
         'relations': 'relation_label',
         'relationids': 'relation_id',
@@ -25,7 +35,6 @@ def analyze_data_from_kg(kg: AssocKnowledgeGraph | RestructuredKnowledgeGraph, c
         'semantics': 'semantic'
     }
     
-    kg.analyze_graph()
     graphstructure.getConcepts(nodes, node_colmapping)
     relations_df = graphstructure.getRelations(edges, edge_colmapping)
     graphstructure.getConnectionSummary(edges, nodes, 
@@ -49,7 +58,7 @@ def build_prev_kg():
     kg.save_graph('prev_kg')
     
 
-def build_kg(load_csv: bool = False):
+def build_kg(load_csv: bool = False, delta: bool = False, num_workers: int = 1):
     # --- Add associations from Monarch Initiative ---
     
     if load_csv:
@@ -78,20 +87,31 @@ def build_kg(load_csv: bool = False):
     
     kg.add_edges_and_nodes(drugcentral_associations)
     
+    # Only apply changes since the last saved knowledge graph, the full restructured graph is saved as well to match the snapshot
+    if delta and os.path.exists(kg_delta.SNAPSHOT_FILE):
+        new_kg_edges, new_kg_nodes, _ = kg_delta.update_kg(kg, 'new_kg')
+        save_dataframes(new_kg_edges, new_kg_nodes, 'new_kg')
+        return
+    
     # Initial knowledge graph
     analyze_data_from_kg(kg, 'concepts.png', 'triplets.csv')
     
     kg_edges, kg_nodes = kg.generate_dataframes()
     cypher_querybuilder.build_queries(kg_nodes, kg_edges, True)
     
-    # Restructured knowledge graph
-    new_kg = RestructuredKnowledgeGraph(kg)
-    analyze_data_from_kg(new_kg, 'new_concepts.png', 'new_triplets.csv')
+    # Restructured knowledge graph, in shards across worker processes only when more than one worker is given
+    if num_workers > 1:
+        new_kg_edges, new_kg_nodes = kg_sharding.restructure_sharded(kg_edges, kg_nodes, num_workers)
+    else:
+        new_kg_edges, new_kg_nodes = restructure_dataframes(kg_edges, kg_nodes)
+    
+    register_info(f'For the restructured graph, a total of {len(new_kg_edges)} edges and {len(new_kg_nodes)} nodes have been generated.')
+    analyze_data_from_dataframes(new_kg_edges, new_kg_nodes, 'new_concepts.png', 'new_triplets.csv')
     
-    new_kg_edges, new_kg_nodes = new_kg.generate_dataframes()
     cypher_querybuilder.build_queries(new_kg_nodes, new_kg_edges, True)
     
-    new_kg.save_graph('new_kg')
+    save_dataframes(new_kg_edges, new_kg_nodes, 'new_kg')
+    kg_delta.write_snapshot((kg_edges, kg_nodes), (new_kg_edges, new_kg_nodes))
 
 if __name__ == "__main__":
     kg_mode = input('Enter which KG needs to be built (choose 1 for original, choose 2 for restructured):')
@@ -110,4 +130,12 @@ if __name__ == "__main__":
         else:
             load_csv = False
         
-        build_kg(load_csv=load_csv)
+        only_delta = input('Only apply changes since the last saved knowledge graph? (choose yes or no):')
+        
+        assert only_delta == 'yes' or only_delta == 'no'
+        
+        num_workers = input('Number of worker processes used to restructure the knowledge graph (choose 1 for a single process, more only when builder.sharding.check_sharded_parity shows sharding is faster):')
+        
+        assert num_workers.isdigit() and int(num_workers) > 0
+        
+        build_kg(load_csv=load_csv, delta=only_delta == 'yes', num_workers=int(num_workers))
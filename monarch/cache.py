@@ -0,0 +1,154 @@
+"""
+    This module stores responses of the BioLink API on disk such that repeated runs only request nodes that are new or expired.
+"""
+
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+import zlib
+
+from util.common import register_info
+
+DEFAULT_TTL_S = 30 * 24 * 60 * 60       # responses older than 30 days are fetched again
+DEFAULT_MAX_SIZE = 2 * 1024 ** 3        # at most 2 GB of compressed responses
+
+class ResponseCache:
+    """
+        Initialize a persistent cache of API responses backed by a SQLite database. Each response is compressed and stored under
+        a key that is the hash of the request (url, params and rows). Entries expire after the given time to live and
+        when the total size exceeds the given maximum, the least recently used entries are evicted.
+        :param file_path: path of the SQLite database file
+        :param ttl: number of seconds after which a stored response expires
+        :param max_size: maximum number of bytes of compressed responses kept in the cache
+    """
+    def __init__(self, file_path: str, ttl: int = DEFAULT_TTL_S, max_size: int = DEFAULT_MAX_SIZE):
+        self.file_path = file_path
+        self.ttl = ttl
+        self.max_size = max_size
+        self.hits = 0
+        self.misses = 0
+
+        self.lock = threading.Lock()    # connection is shared by concurrent requests
+        self.connection = sqlite3.connect(file_path, check_same_thread=False)
+        self.connection.execute('PRAGMA journal_mode=WAL')
+        self.connection.execute("""
+            CREATE TABLE IF NOT EXISTS responses (
+                key TEXT PRIMARY KEY,
+                value BLOB NOT NULL,
+                size INTEGER NOT NULL,
+                created_at REAL NOT NULL,
+                accessed_at REAL NOT NULL
+            )
+        """)
+        self.connection.execute('CREATE INDEX IF NOT EXISTS responses_accessed_at ON responses (accessed_at)')
+        self.connection.commit()
+
+        self.remove_expired()
+        self.total_size = self.connection.execute('SELECT COALESCE(SUM(size), 0) FROM responses').fetchone()[0]
+        register_info(f'Response cache {file_path} contains {self.count()} responses ({self.total_size} bytes)')
+
+    @staticmethod
+    def generate_key(url: str, params: dict, rows: int = None):
+        """
+            Generate the key of a request. The url includes the base url of the API, such that responses of different sources
+            of the same node are not mixed up.
+            :param url: url to which the request is made, including direction and node
+            :param params: parameters of request
+            :param rows: maximum number of rows requested
+            :return: hexadecimal hash of request
+        """
+        request = json.dumps([url, params, rows], sort_keys=True, default=str)
+        return hashlib.sha256(request.encode()).hexdigest()
+
+    def count(self):
+        """
+            Get number of responses stored in cache.
+        """
+        with self.lock:
+            return self.connection.execute('SELECT COUNT(*) FROM responses').fetchone()[0]
+
+    def get(self, key: str):
+        """
+            Get stored response of given key.
+            :param key: key of request
+            :return: response values or `None` when response is not stored or has expired
+        """
+        now = time.time()
+
+        with self.lock:
+            row = self.connection.execute('SELECT value, size, created_at FROM responses WHERE key = ?', (key,)).fetchone()
+
+            if row is None:
+                self.misses += 1
+                return None
+
+            value, size, created_at = row
+
+            if now - created_at > self.ttl:
+                self.connection.execute('DELETE FROM responses WHERE key = ?', (key,))
+                self.connection.commit()
+                self.total_size -= size
+                self.misses += 1
+                return None
+
+            self.connection.execute('UPDATE responses SET accessed_at = ? WHERE key = ?', (now, key))
+            self.connection.commit()
+            self.hits += 1
+
+        return json.loads(zlib.decompress(value))
+
+    def put(self, key: str, response_values: dict):
+        """
+            Store response of given key and evict least recently used responses when cache exceeds its maximum size.
+            :param key: key of request
+            :param response_values: response values that need to be stored
+        """
+        value = zlib.compress(json.dumps(response_values).encode())
+        now = time.time()
+
+        with self.lock:
+            previous = self.connection.execute('SELECT size FROM responses WHERE key = ?', (key,)).fetchone()
+            if previous:
+                self.total_size -= previous[0]
+
+            self.connection.execute('REPLACE INTO responses (key, value, size, created_at, accessed_at) VALUES (?, ?, ?, ?, ?)',
+                                    (key, value, len(value), now, now))
+            self.total_size += len(value)
+
+            if self.total_size > self.max_size:
+                self.evict()
+
+            self.connection.commit()
+
+    def evict(self):
+        """
+            Remove least recently used responses until the total size of the cache is within its maximum size.
+        """
+        rows = self.connection.execute('SELECT key, size FROM responses ORDER BY accessed_at ASC')
+
+        evicted_keys = list()
+        for key, size in rows:
+            if self.total_size <= self.max_size:
+                break
+            evicted_keys.append((key,))
+            self.total_size -= size
+
+        self.connection.executemany('DELETE FROM responses WHERE key = ?', evicted_keys)
+
+    def remove_expired(self):
+        """
+            Remove all responses of which the time to live has passed.
+        """
+        with self.lock:
+            self.connection.execute('DELETE FROM responses WHERE created_at < ?', (time.time() - self.ttl,))
+            self.connection.commit()
+
+    def close(self):
+        """
+            Close connection to database file.
+        """
+        register_info(f'Response cache had {self.hits} hits and {self.misses} misses')
+        with self.lock:
+            self.connection.close()
@@ -0,0 +1,107 @@
+"""
+    This module keeps track of the progress of a crawl over the BioLink API such that a restarted crawl resumes from the last completed batch of seeds.
+"""
+
+import os
+import pickle
+
+from util.common import register_info
+
+class CrawlCheckpoint:
+    """
+        Initialize a checkpoint of a crawl stored in an append-only file. Every completed batch of seeds and every completed depth
+        is appended as a record, so that the state of the crawl can be restored by replaying all records of the file.
+        The first record describes the crawl, such that a file belonging to another crawl is not resumed.
+        :param file_path: path of checkpoint file
+        :param crawl_info: dictionary describing the crawl such as its seeds, depth and rows
+    """
+    def __init__(self, file_path: str, crawl_info: dict):
+        self.file_path = file_path
+        self.crawl_info = crawl_info
+
+        self.completed_depths = list()  # dictionaries of ids found at each completed depth
+        self.phases = dict()            # per phase name of current depth, the visited seeds and found associations
+
+        if os.path.exists(file_path) and self.load():
+            register_info(f'Resuming crawl from checkpoint {file_path} after {len(self.completed_depths)} completed depths')
+        else:
+            self.completed_depths = list()
+            self.phases = dict()
+            with open(file_path, 'wb') as f:
+                pickle.dump({'type': 'crawl', 'info': crawl_info}, f)
+
+    def load(self):
+        """
+            Restore state of crawl by replaying all records of checkpoint file.
+            :return: `True` when checkpoint belongs to the same crawl, otherwise `False`
+        """
+        with open(self.file_path, 'rb+') as f:
+            try:
+                header = pickle.load(f)
+            except (EOFError, pickle.UnpicklingError):
+                return False
+
+            if header.get('info') != self.crawl_info:
+                register_info(f'Checkpoint {self.file_path} belongs to another crawl and is discarded')
+                return False
+
+            while True:
+                end_of_records = f.tell()
+                try:
+                    record = pickle.load(f)
+                except (EOFError, pickle.UnpicklingError):
+                    # Last record can be incomplete when crawl was interrupted while writing, drop it before appending new records
+                    f.truncate(end_of_records)
+                    break
+
+                if record['type'] == 'batch':
+                    phase = self.get_phase(record['phase'])
+                    phase['visited'].update(record['seeds'])
+                    phase['associations'].update(record['associations'])
+                elif record['type'] == 'depth':
+                    self.completed_depths.append(record['found_ids'])
+                    self.phases = dict()
+
+        return True
+
+    def append(self, record: dict):
+        """
+            Append record to checkpoint file and make sure it is written to disk.
+        """
+        with open(self.file_path, 'ab') as f:
+            pickle.dump(record, f)
+            f.flush()
+            os.fsync(f.fileno())
+
+    def get_phase(self, phase_name: str):
+        """
+            Get visited seeds and found associations of given phase of the current depth.
+            :param phase_name: name of phase
+            :return: dictionary with set of visited seeds `visited` and set of found associations `associations`
+        """
+        if phase_name not in self.phases:
+            self.phases[phase_name] = {'visited': set(), 'associations': set()}
+        return self.phases[phase_name]
+
+    def complete_batch(self, phase_name: str, seeds: list, associations: list):
+        """
+            Record that all associations of given batch of seeds have been found.
+            :param phase_name: name of phase of current depth
+            :param seeds: list of seed ids of batch
+            :param associations: list of associations found for batch
+        """
+        phase = self.get_phase(phase_name)
+        phase['visited'].update(seeds)
+        phase['associations'].update(associations)
+
+        self.append({'type': 'batch', 'phase': phase_name, 'seeds': list(seeds), 'associations': list(associations)})
+
+    def complete_depth(self, found_ids: dict):
+        """
+            Record that current depth has been completed and free associations found during this depth.
+            :param found_ids: dictionary of sets of ids found during this depth
+        """
+        self.completed_depths.append(found_ids)
+        self.phases = dict()
+
+        self.append({'type': 'depth', 'found_ids': found_ids})
@@ -0,0 +1,85 @@
+"""
+    This module crawls the BioLink API such that the associations of each node are requested at most once.
+"""
+
+import asyncio
+
+import util.constants as constants
+import monarch.requester as requester
+import monarch.unpacker as unpacker
+import monarch.filterer as filterer
+
+from util.common import register_info, register_error
+
+class AssociationCrawler:
+    """
+        Initialize a crawler that keeps an index of all visited nodes and their associations. The associations of a node
+        are fetched once with the maximum number of rows, smaller numbers of rows are derived from the index.
+        :param max_rows: maximum number of rows with which the out and in associations of a node are fetched, all associations are fetched when `None`
+        :param concurrency: maximum number of requests to the BioLink API in flight at the same time
+    """
+    def __init__(self, max_rows: int = None, concurrency: int = requester.CONCURRENCY):
+        self.max_rows = max_rows
+        self.concurrency = concurrency
+        self.node_associations = dict()     # node id -> lists of out and in associations in order of response
+
+    async def fetch_nodes(self, node_ids: set):
+        """
+            Fetch associations of all given nodes and add them to the index. Nodes of which a request failed are left out of the
+            index, such that they are fetched again when they are visited again.
+        """
+        failed_node_ids = set()
+        
+        async for node_id, direction, associations in unpacker.iter_node_associations(node_ids, self.max_rows, [], None, self.concurrency):
+            if associations is None:
+                failed_node_ids.add(node_id)
+                continue
+            assoc_out, assoc_in = self.node_associations.setdefault(node_id, (list(), list()))
+            (assoc_out if direction == 'from' else assoc_in).extend(associations)
+        
+        for node_id in failed_node_ids:
+            self.node_associations.pop(node_id, None)
+        
+        if len(failed_node_ids) > 0:
+            register_error(f'Associations of {len(failed_node_ids)} nodes could not be fetched, they are fetched again when visited again')
+
+    def visit(self, id_list: list):
+        """
+            Fetch associations of all given nodes that have not been visited yet.
+            :param id_list: list of entities represented by their identifiers
+        """
+        new_node_ids = set(id_list).difference(self.node_associations)
+        register_info(f'{len(set(id_list)) - len(new_node_ids)} of given nodes already visited, fetching associations of {len(new_node_ids)} new nodes')
+
+        if len(new_node_ids) > 0:
+            asyncio.run(self.fetch_nodes(new_node_ids))
+
+    def get_neighbour_associations(self, id_list: list, rows: int = None, exclude_new_ids: bool = False):
+        """
+            Return the first layer of neighbours from a list of node identifiers. Only nodes that have not been visited before are
+            requested, all phases of a crawl fetch associations through this method.
+            :param id_list: list of entities represented by their identifiers
+            :param rows: number of out and in associations per node, at most `max_rows` (all fetched rows when `None`)
+            :param exclude_new_ids: exclude all associations that introduce nodes not existing in given list
+            :return: list of direct neighbours (list of tuples)
+        """
+        if rows is None:
+            rows = self.max_rows
+        assert self.max_rows is None or (rows is not None and rows <= self.max_rows), f'Cannot derive {rows} rows from associations fetched with {self.max_rows} rows'
+
+        all_seed_nodes = set(id_list)
+        self.visit(all_seed_nodes)
+
+        subject_index = constants.assoc_tuple_values.index('subject_id')
+        object_index = constants.assoc_tuple_values.index('object_id')
+
+        all_associations = set()
+
+        for seed_node in all_seed_nodes:
+            assoc_out, assoc_in = self.node_associations.get(seed_node, (list(), list()))    # nodes of which a request failed have no associations
+
+            for association in assoc_out[:rows] + assoc_in[:rows]:
+                if not exclude_new_ids or (association[subject_index] in all_seed_nodes and association[object_index] in all_seed_nodes):
+                    all_associations.add(association)
+
+        return filterer.get_associations_on_entities(all_associations, ['publication'], include=False)
@@ -1,33 +1,51 @@
 """
     Module that fetches relevant data from the Monarch Initiative data and analytic platform (https://monarchinitiative.org/about/monarch).
 """
+import os
+
 import util.constants as constants
 from util.common import tuplelist2dataframe, register_info
+from util.associationtable import AssociationTable
+from util.httpclient import client
 
 import monarch.unpacker as unpacker
 import monarch.filterer as filterer
+import monarch.requester as requester
+
+from monarch.checkpoint import CrawlCheckpoint
+from monarch.crawler import AssociationCrawler
 
-def get_seed_first_order_associations(seed_id_list: list, rows: int, exclude_new_ids: bool = False):
+CHECKPOINT_BATCH_SIZE = 500
+
+def get_seed_first_order_associations(seed_id_list: list, rows: int, exclude_new_ids: bool = False, crawler: AssociationCrawler = None):
     """
         Get list of tuples storing each association found with given seed ids.
         :param seed_id_list: list of entities represented by their identifiers
+        :param crawler: crawler with index of already visited nodes, a new crawler is used when not given
         :return: list of tuples storing associations
     """
+    if not crawler:
+        crawler = AssociationCrawler(max_rows=rows)
+    
     register_info('Associations of seeds retrieval has started...')
-    direct_neighbours_associations = unpacker.get_neighbour_associations(id_list=seed_id_list, rows=rows, exclude_new_ids=exclude_new_ids)
+    direct_neighbours_associations = crawler.get_neighbour_associations(id_list=seed_id_list, rows=rows, exclude_new_ids=exclude_new_ids)
     register_info(f'A total of {len(direct_neighbours_associations)} associations have been found between seeds and their neighbours.')
     
     return direct_neighbours_associations
 
-def get_seed_neighbour_node_ids(seed_id_list: list, rows: int):
+def get_seed_neighbour_node_ids(seed_id_list: list, rows: int, crawler: AssociationCrawler = None):
     """
         Get a list of all node ids of all first order neighbours of given seeds.
         :param seed_id_list: list of entities represented by their identifiers
+        :param crawler: crawler with index of already visited nodes, a new crawler is used when not given
         :return: list of neighbour node ids
     """
+    if not crawler:
+        crawler = AssociationCrawler(max_rows=rows)
+    
     register_info('Neighbours of seeds retrieval has started...')
     
-    direct_neighbours_associations = unpacker.get_neighbour_associations(id_list=seed_id_list, rows=rows)
+    direct_neighbours_associations = crawler.get_neighbour_associations(id_list=seed_id_list, rows=rows)
     register_info(f'A total of {len(direct_neighbours_associations)} associations have been found between seeds and their neighbours.')
     
     neighbour_ids = unpacker.get_neighbour_ids(seed_list=seed_id_list, associations=direct_neighbours_associations)
@@ -35,14 +53,53 @@ def get_seed_neighbour_node_ids(seed_id_list: list, rows: int):
     
     return neighbour_ids
         
-def get_orthopheno_node_ids(first_seed_id_list: list, depth: int, rows: int):
+def get_batched_neighbour_associations(crawler: AssociationCrawler, checkpoint: CrawlCheckpoint, phase_name: str, id_list: list, rows: int, batch_size: int):
+    """
+        Get the first layer of neighbours from a list of node identifiers in batches of seeds. After each batch, the found associations
+        are recorded in the checkpoint and seeds that have already been visited according to the checkpoint are skipped.
+        :param crawler: crawler with index of already visited nodes
+        :param checkpoint: checkpoint of crawl, when `None` all seeds are fetched at once without recording progress
+        :param phase_name: name of phase of current depth in checkpoint
+        :param id_list: list of entities represented by their identifiers
+        :param batch_size: number of seeds after which progress is recorded
+        :return: list of direct neighbours (list of tuples)
+    """
+    if not checkpoint:
+        return crawler.get_neighbour_associations(id_list=id_list, rows=rows)
+    
+    phase = checkpoint.get_phase(phase_name)
+    remaining_id_list = sorted(set(id_list) - phase['visited'])
+    register_info(f'{len(phase["visited"])} seeds already visited in checkpoint, {len(remaining_id_list)} seeds remaining')
+    
+    for i in range(0, len(remaining_id_list), batch_size):
+        batch_id_list = remaining_id_list[i:i+batch_size]
+        batch_associations = crawler.get_neighbour_associations(id_list=batch_id_list, rows=rows)
+        checkpoint.complete_batch(phase_name, batch_id_list, batch_associations)
+    
+    return list(phase['associations'])
+        
+def get_orthopheno_node_ids(first_seed_id_list: list, depth: int, rows: int, crawler: AssociationCrawler = None, checkpoint_file: str = None, batch_size: int = CHECKPOINT_BATCH_SIZE):
     """
         Get list of all nodes ids yielded from associations between an ortholog gene and phenotype. In the first iteration, orthologs are found for given seed list.
         :param first_seed_id_list: list of entities that are the seeds of first iteration
         :param depth: number of iterations
+        :param crawler: crawler with index of already visited nodes, a new crawler is used when not given
+        :param checkpoint_file: path of file in which progress is recorded, a crawl with the same seeds, depth and rows resumes from this file
+        :param batch_size: number of seeds after which progress is recorded in checkpoint file
     """
+    if not crawler:
+        crawler = AssociationCrawler(max_rows=rows)
+    
     register_info('Orthologs/phenotypes retrieval has started...')
     
+    if checkpoint_file:
+        crawl_info = {'seeds': sorted(set(first_seed_id_list)), 'depth': depth, 'rows': rows}
+        checkpoint = CrawlCheckpoint(checkpoint_file, crawl_info)
+        completed_depths = checkpoint.completed_depths
+    else:
+        checkpoint = None
+        completed_depths = list()
+    
     all_sets = list()
     
     # Initial iteration seed list
@@ -51,32 +108,42 @@ def get_orthopheno_node_ids(first_seed_id_list: list, depth: int, rows: int):
     for d in range(depth):   
         if (d+1 > 1):
             print(f'At depth {d+1}, replace previous list of seeds with all their first order neighbours.')
-        register_info(f'For depth {d+1} seed list contains {len(seed_list)} ids')
         
-        # Get associations between seeds and their first order neighbours
-        direct_neighbours_associations = unpacker.get_neighbour_associations(id_list=seed_list, rows=rows)
-        # Get all ids of found neighbour nodes
-        neighbour_id_list = unpacker.get_neighbour_ids(seed_list=seed_list, associations=direct_neighbours_associations)
-        register_info(f'{len(neighbour_id_list)} neighbours of given seeds')
-        
-        # Filter to only include associations related to orthology
-        associations_with_orthologs = filterer.get_associations_on_relations(direct_neighbours_associations, 'orthologous')
-        
-        # Free memory as this list is not used anymore in this iteration
-        direct_neighbours_associations = []
-        
-        # Get all orthologs of genes included in given list of ids
-        ortholog_id_list = unpacker.get_neighbour_ids(seed_list=seed_list, associations=associations_with_orthologs, include_semantic_groups=['gene'])
-        register_info(f'{len(ortholog_id_list)} orthologous genes of given seeds')
-        
-        # Get the first layer of neighbours of orthologs
-        ortholog_associations = unpacker.get_neighbour_associations(id_list=ortholog_id_list, rows=rows);
-        # Filter to only include associations related to phenotype
-        phenotype_id_list = unpacker.get_neighbour_ids(seed_list=ortholog_id_list, associations=ortholog_associations, include_semantic_groups=['phenotype'])
-        register_info(f'{len(phenotype_id_list)} phenotypes of orthologous genes')
-        
-        # Free memory as this list is not used anymore in this iteration
-        ortholog_associations = []
+        if d < len(completed_depths):
+            register_info(f'Depth {d+1} has already been completed according to checkpoint')
+            ortholog_id_list = completed_depths[d]['orthologs']
+            phenotype_id_list = completed_depths[d]['phenotypes']
+            neighbour_id_list = completed_depths[d]['neighbours']
+        else:
+            register_info(f'For depth {d+1} seed list contains {len(seed_list)} ids')
+            
+            # Get associations between seeds and their first order neighbours
+            direct_neighbours_associations = get_batched_neighbour_associations(crawler, checkpoint, 'neighbours', seed_list, rows, batch_size)
+            # Get all ids of found neighbour nodes
+            neighbour_id_list = unpacker.get_neighbour_ids(seed_list=seed_list, associations=direct_neighbours_associations)
+            register_info(f'{len(neighbour_id_list)} neighbours of given seeds')
+            
+            # Filter to only include associations related to orthology
+            associations_with_orthologs = filterer.get_associations_on_relations(direct_neighbours_associations, 'orthologous')
+            
+            # Free memory as this list is not used anymore in this iteration
+            direct_neighbours_associations = []
+            
+            # Get all orthologs of genes included in given list of ids
+            ortholog_id_list = unpacker.get_neighbour_ids(seed_list=seed_list, associations=associations_with_orthologs, include_semantic_groups=['gene'])
+            register_info(f'{len(ortholog_id_list)} orthologous genes of given seeds')
+            
+            # Get the first layer of neighbours of orthologs
+            ortholog_associations = get_batched_neighbour_associations(crawler, checkpoint, 'orthologs', ortholog_id_list, rows, batch_size)
+            # Filter to only include associations related to phenotype
+            phenotype_id_list = unpacker.get_neighbour_ids(seed_list=ortholog_id_list, associations=ortholog_associations, include_semantic_groups=['phenotype'])
+            register_info(f'{len(phenotype_id_list)} phenotypes of orthologous genes')
+            
+            # Free memory as this list is not used anymore in this iteration
+            ortholog_associations = []
+            
+            if checkpoint:
+                checkpoint.complete_depth({'orthologs': ortholog_id_list, 'phenotypes': phenotype_id_list, 'neighbours': neighbour_id_list})
         
         # Add set of ortholog nodes of seeds
         all_sets.append(ortholog_id_list)
@@ -92,20 +159,44 @@ def get_orthopheno_node_ids(first_seed_id_list: list, depth: int, rows: int):
     
     return all_ortho_pheno_node_ids
     
-def get_monarch_associations(nodes_list):
+def get_monarch_associations(nodes_list, concurrency: int = requester.CONCURRENCY, cache_file: str = f'{constants.OUTPUT_FOLDER}/monarch_responses.sqlite', 
+                             checkpoint_file: str = f'{constants.OUTPUT_FOLDER}/orthopheno_checkpoint.pkl', max_rows: int = None):
+    """
+        Get all associations of given seeds, their first order neighbours and the orthologs/phenotypes found around them.
+        :param nodes_list: list of seed ids
+        :param concurrency: maximum number of requests to the BioLink API in flight at the same time
+        :param cache_file: path of persistent response cache such that only new or expired responses are requested, no cache is used when `None`
+        :param checkpoint_file: path of file recording progress of orthologs/phenotypes retrieval, removed once all associations are saved
+        :param max_rows: maximum number of out and in associations retrieved per node, all associations are retrieved page by page when `None`
+        :return: association table storing associations
+    """
+    if cache_file:
+        requester.enable_cache(cache_file)
     
-    seed_neighbours_id_list = get_seed_neighbour_node_ids(seed_id_list=nodes_list, rows=2000)
-    orthopheno_id_list = get_orthopheno_node_ids(first_seed_id_list=nodes_list, depth=2, rows=2000)
+    try:
+        # All phases share one index of visited nodes, such that associations of each node are fetched once
+        crawler = AssociationCrawler(max_rows=max_rows, concurrency=concurrency)
+        
+        seed_neighbours_id_list = get_seed_neighbour_node_ids(seed_id_list=nodes_list, rows=max_rows, crawler=crawler)
+        orthopheno_id_list = get_orthopheno_node_ids(first_seed_id_list=nodes_list, depth=2, rows=max_rows, crawler=crawler, checkpoint_file=checkpoint_file)
+        
+        register_info(f'A total of {len(seed_neighbours_id_list)} first order neighbours of given seeds have been found')
+        register_info(f'A total of {len(orthopheno_id_list)} orthologs/phenotypes have been found.')
+        
+        all_nodes_id_list = seed_neighbours_id_list.union(orthopheno_id_list)
+        all_nodes_id_list.update(nodes_list)
+        register_info(f'A total of {len(all_nodes_id_list)} nodes have been found for which from and to associations will be retrieved.')
+        
+        all_associations = get_seed_first_order_associations(seed_id_list=all_nodes_id_list, rows=max_rows, exclude_new_ids=True, crawler=crawler)
+        all_associations = AssociationTable.from_tuples(all_associations)
+        tuplelist2dataframe(all_associations).to_csv(f'{constants.OUTPUT_FOLDER}/monarch_associations.csv', index=False)
+        register_info('All MONARCH associations are saved into monarch_associations.csv')
+    finally:
+        requester.disable_cache()
     
-    register_info(f'A total of {len(seed_neighbours_id_list)} first order neighbours of given seeds have been found')
-    register_info(f'A total of {len(orthopheno_id_list)} orthologs/phenotypes have been found.')
+    client.report_statistics()
     
-    all_nodes_id_list = seed_neighbours_id_list.union(orthopheno_id_list)
-    all_nodes_id_list.update(nodes_list)
-    register_info(f'A total of {len(all_nodes_id_list)} nodes have been found for which from and to associations will be retrieved.')
-        
-    all_associations = get_seed_first_order_associations(seed_id_list=all_nodes_id_list, rows=1000, exclude_new_ids=True)
-    tuplelist2dataframe(all_associations).to_csv(f'{constants.OUTPUT_FOLDER}/monarch_associations.csv', index=False)
-    register_info('All MONARCH associations are saved into monarch_associations.csv')
+    if checkpoint_file and os.path.exists(checkpoint_file):
+        os.remove(checkpoint_file)
     
     return all_associations
\ No newline at end of file
@@ -1,38 +1,83 @@
-import util.constants as constants
+import itertools
+
+import numpy as np
+
+from util.associationtable import AssociationColumns, AssociationTable
 
 relation_ids_filters = {'orthologous': ['RO:HOM0000017', 'RO:HOM0000020']}
 
-def get_associations_on_entities(all_associations: list, semantic_groups_filter: list, include: bool = True):
+def get_isin_mask(associations: AssociationColumns | AssociationTable, column_name: str, values: list):
+    """
+        Test for all associations at once whether the value of given column is one of the given values.
+        :param associations: columnar view of list of tuples or association table
+        :param column_name: name of value in `constants.assoc_tuple_values`
+        :param values: list of values
+        :return: boolean mask over all associations
+    """
+    return associations.isin(column_name, values)
+
+def semantic_groups_predicate(semantic_groups_filter: list, include: bool = True):
+    """
+        Create predicate that holds for associations that include at least one entity belonging to one of the given semantic groups
+        (`include` is `True`) or that include no entity belonging to one of them (`include` is `False`).
+        :param semantic_groups_filter: list of semantic groups that needs to be included or excluded
+        :return: function returning a boolean mask over given associations
+    """
+    def predicate(associations):
+        mask = get_isin_mask(associations, 'subject_category', semantic_groups_filter) | get_isin_mask(associations, 'object_category', semantic_groups_filter)
+        return mask if include else ~mask
+
+    return predicate
+
+def relations_predicate(include_relation_ids_group: str):
+    """
+        Create predicate that holds for associations that include one of the relations of given group.
+        :param include_relation_ids_group: name of group of relation ids, see `relation_ids_filters` for available names
+        :return: function returning a boolean mask over given associations
+    """
+    def predicate(associations):
+        return get_isin_mask(associations, 'relation_id', relation_ids_filters[include_relation_ids_group])
+
+    return predicate
+
+def apply_filters(all_associations: list | AssociationTable, predicates: list):
+    """
+        Get filtered associations for which all given predicates hold, evaluating each predicate once over all associations.
+        :param all_associations: list, set or association table of associations that need to be filtered
+        :param predicates: list of predicates, see for example `semantic_groups_predicate` and `relations_predicate`
+        :return: association table when an association table is given, otherwise list of filtered associations
+    """
+    if isinstance(all_associations, AssociationTable):
+        associations = all_associations
+    else:
+        all_associations = list(all_associations)
+        associations = AssociationColumns(all_associations)    # columns are extracted once for all predicates
+
+    mask = np.ones(len(associations), dtype=bool)
+    for predicate in predicates:
+        mask &= predicate(associations)
+
+    if isinstance(all_associations, AssociationTable):
+        return all_associations.filter(mask)
+
+    return list(itertools.compress(all_associations, mask))
+
+def get_associations_on_entities(all_associations: list | AssociationTable, semantic_groups_filter: list, include: bool = True):
     """
         Get a filtered list of associations in which each association includes at least one entity that belongs to
         one of the given semantic groups.
-        :param all_associations: list of tuples storing associations that need to be filtered
+        :param all_associations: list of tuples or association table storing associations that need to be filtered
         :param semantic_groups_filter: list of semantic groups that needs to be included or excluded
         :param include: indicates whether given semantic groups need to be included (`True`) or excluded (`False`)
-        :return: list of filtered associations
+        :return: list of filtered associations (association table when an association table is given)
     """
-    filtered_associations = list()
+    return apply_filters(all_associations, [semantic_groups_predicate(semantic_groups_filter, include)])
 
-    for association in all_associations:
-        all_semantic_groups = [association[constants.assoc_tuple_values.index('subject_category')], association[constants.assoc_tuple_values.index('object_category')]]
-        intersection = [semantic_group for semantic_group in all_semantic_groups if semantic_group in semantic_groups_filter]
-        
-        if (include and len(intersection) > 0) or (not include and len(intersection) == 0):
-            filtered_associations.append(association)
-            
-    return filtered_associations
-    
-def get_associations_on_relations(all_associations: list, include_relation_ids_group: str):
+def get_associations_on_relations(all_associations: list | AssociationTable, include_relation_ids_group: str):
     """
         Get a filtered list of associations in which each association includes one of the given relations.
-        :param all_associations: list of tuples storing associations that need to be filtered
+        :param all_associations: list of tuples or association table storing associations that need to be filtered
         :param include_relation_ids_group: name of group of relation ids that needs to be included, see `relation_ids_filters` for available names
-        :return: list of filtered associations
-    """
-    filtered_associations = list()
-    
-    for association in all_associations:
-        if (association[constants.assoc_tuple_values.index('relation_id')] in relation_ids_filters[include_relation_ids_group]):
-            filtered_associations.append(association)
-            
-    return filtered_associations
\ No newline at end of file
+        :return: list of filtered associations (association table when an association table is given)
+    """
+    return apply_filters(all_associations, [relations_predicate(include_relation_ids_group)])
@@ -1,37 +1,89 @@
-from util.common import register_error
+import os
 
-import requests
-import time
+from util.common import register_error, register_info
+from util.httpclient import client
+from monarch.cache import ResponseCache
 
-BASE_URL = 'https://api.monarchinitiative.org/api'
-RETRIES = 2
+BASE_URL = os.environ.get('MONARCH_BASE_URL', 'https://api.monarchinitiative.org/api')
+CONCURRENCY = 8
+PAGE_ROWS = 2000     # number of associations requested per page
 
-def get_associations(direction: str, node: str, params: dict):
+cache = None    # persistent response cache, see `enable_cache`
+
+def enable_cache(file_path: str, **cache_kwargs):
     """
+        Store all responses of the BioLink API in a persistent cache such that they are only requested again when expired.
+        :param file_path: path of the cache database file
+        :param cache_kwargs: arguments `ttl` and `max_size` of `ResponseCache`
     """
-    for i in range(RETRIES):
-        try:
-            response = requests.get(f'{BASE_URL}/association/{direction}/{node}', params=params)
-            return response.json()
-        except Exception as e:
-            if (i < RETRIES - 1):
-                time.sleep(3)
-                print('Retry', i)
-                continue
-            else:
-                register_error(f'Response values could not get acquired at node {node} for {direction} associations (params: {params}) resulting in response {response} due to {e}')
-                return {}
+    global cache
+    disable_cache()
+    cache = ResponseCache(file_path, **cache_kwargs)
 
-def get_in_out_associations(node: str, params: dict, max_rows: int = 2000):
+def disable_cache():
     """
-        Get all out and in edges of given node. 
+        Stop using the persistent response cache.
+    """
+    global cache
+    if cache:
+        cache.close()
+    cache = None
+
+def get_associations(direction: str, node: str, params: dict):
+    """
+        Get associations of given node in given direction.
+        :param direction: `from` for out associations and `to` for in associations
         :param node: identifier of node
-        :param max_rows: maximum number of rows to get
-        :return: responses of getting out and in associations, respectively (return empty objects when request fails and record error in log file)
+        :param params: parameters of request
+        :return: response values served from the response cache when enabled, `None` when the request fails (error is recorded in log file)
     """
-    params['rows'] = max_rows
+    url = f'{BASE_URL}/association/{direction}/{node}'
+    
+    if cache:
+        cache_key = ResponseCache.generate_key(client.get_request_url(url), params, params.get('rows'))
+        response_values = cache.get(cache_key)
+        if response_values is not None:
+            return response_values
     
-    response_out = get_associations('from', node, params)
-    response_in = get_associations('to', node, params)
+    try:
+        response = client.get(url, params=params)
+        response_values = response.json()
+    except Exception as e:
+        register_error(f'Response values could not get acquired at node {node} for {direction} associations (params: {params}) due to {e}')
+        return None
+    
+    if cache:
+        cache.put(cache_key, response_values)
+    
+    return response_values
+
+def iter_association_pages(direction: str, node: str, params: dict, max_rows: int = 2000):
+    """
+        Get associations of given node in given direction page by page, using `start` and `rows` offsets. 
+        :param direction: `from` for out associations and `to` for in associations
+        :param node: identifier of node
+        :param params: parameters of request
+        :param max_rows: maximum number of rows to get over all pages, all associations are requested when `None`
+        :return: generator of response values of each page, ending with `None` when the request of a page fails
+    """
+    start = 0
+    number_found = None
     
-    return response_out, response_in
\ No newline at end of file
+    while max_rows is None or start < max_rows:
+        page_rows = PAGE_ROWS if max_rows is None else min(PAGE_ROWS, max_rows - start)
+        response_values = get_associations(direction, node, dict(params, start=start, rows=page_rows))
+        
+        yield response_values
+        
+        if response_values is None:
+            break
+        
+        page_associations = response_values.get('associations', [])
+        number_found = response_values.get('numFound')
+        start += len(page_associations)
+        
+        if len(page_associations) < page_rows or (number_found is not None and start >= number_found):
+            break
+    else:
+        if number_found is not None and number_found > max_rows:
+            register_info(f'Only {max_rows} of {number_found} {direction} associations are retrieved at node {node}')
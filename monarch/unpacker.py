@@ -2,11 +2,45 @@
     This module unpacks responses of the BioLink API to relevant data structures.
 """
 
+import asyncio
+import threading
+
+from concurrent.futures import ThreadPoolExecutor
 from tqdm import tqdm
 
 import util.constants as constants
 import monarch.requester as requester
-import monarch.filterer as filterer
+
+def compile_tuple_extractor(tuple_values: tuple = constants.assoc_tuple_values):
+    """
+        Compile a function that loads the relevant dictionary values of an association into a tuple. The key paths are derived once from the
+        tuple value names, where `_` indicates dictionary key level separation, and turned into a single generated expression.
+        :param tuple_values: names of tuple values
+        :return: function that gets an association dictionary and returns the tuple of association information values
+    """
+    value_expressions = list()
+    for tuple_value in tuple_values:
+        value_expression = 'association_info'
+        for dict_level in tuple_value.split('_'):
+            value_expression += f'[{dict_level!r}]'
+            if dict_level == 'category':
+                value_expression += '[0]'   # only allow one category, first category of list of categories chosen
+        value_expressions.append(value_expression)
+    
+    source = 'def extract_tuple(association_info):\n    return (' + ', '.join(value_expressions) + ',)\n'
+    namespace = dict()
+    exec(compile(source, '<assoc_tuple_extractor>', 'exec'), namespace)
+    
+    return namespace['extract_tuple']
+
+# Associations are only unpacked into tuples, since the crawler reuses them in every phase and unpacking into columns for
+# `AssociationTable.from_columns` is not faster than `AssociationTable.from_tuples`: encoding the values dominates both
+extract_tuple = compile_tuple_extractor()
+
+SUBJECT_ID_INDEX = constants.assoc_tuple_values.index('subject_id')
+OBJECT_ID_INDEX = constants.assoc_tuple_values.index('object_id')
+SUBJECT_CATEGORY_INDEX = constants.assoc_tuple_values.index('subject_category')
+OBJECT_CATEGORY_INDEX = constants.assoc_tuple_values.index('object_category')
 
 def load_into_tuple(association_info):
     """
@@ -14,20 +48,7 @@ def load_into_tuple(association_info):
         :param association_info: dictionary of information about association
         :return: tuple of association information values
     """
-    info_list = list()
-    for assoc_tuple_value in constants.assoc_tuple_values:
-        dict_levels = assoc_tuple_value.split('_')
-        
-        value = association_info
-        for dict_level in dict_levels:
-            if dict_level == 'category':
-                value = value[dict_level][0]    # only allow one category, first category of list of categories chosen
-            else:
-                value = value[dict_level]
-        
-        info_list.append(value)
-        
-    return tuple(info_list)
+    return extract_tuple(association_info)
 
 def unpack_response(response_values, seed_id_list = None):
     """
@@ -36,24 +57,40 @@ def unpack_response(response_values, seed_id_list = None):
         :param seed_id_list: when list of seeds is given, exclude all associations that introduce nodes not existing in seeds list
         :return: list of association dictionaries
     """
-    unpacked_associations = list()
+    associations = response_values.get('associations', [])
     
-    if ('associations' in response_values.keys()):   
-        for association in response_values['associations']:
-            # Tuple contains the following info: id, subject_id, 
-            association_info = load_into_tuple(association)
-            
-            if seed_id_list:
-                subject_id = association_info[constants.assoc_tuple_values.index('subject_id')]
-                object_id = association_info[constants.assoc_tuple_values.index('object_id')]
-                
-                if {subject_id, object_id} <= seed_id_list:
-                    unpacked_associations.append(association_info)
-            else:
+    if seed_id_list:
+        unpacked_associations = list()
+        
+        for association in associations:
+            association_info = extract_tuple(association)
+            if association_info[SUBJECT_ID_INDEX] in seed_id_list and association_info[OBJECT_ID_INDEX] in seed_id_list:
                 unpacked_associations.append(association_info)
-            
-    return unpacked_associations
+        
+        return unpacked_associations
+    
+    return list(map(extract_tuple, associations))
     
+def put_unpacked_pages(queue: asyncio.Queue, loop, stopped: threading.Event, direction: str, node: str, params: dict, max_rows: int, seed_id_list = None):
+    """
+        Fetch all associations of given node in given direction page by page and put the unpacked associations of each page into
+        given queue as soon as the page has been received. Blocks while the queue is full, such that pages are not fetched faster
+        than they are consumed.
+        :param queue: queue of the event loop to which tuples of node, direction and list of association tuples are added, in
+        which the list is `None` when the request of the page failed
+        :param loop: running event loop of the queue
+        :param stopped: event that is set when pages are no longer consumed, after which no further pages are fetched
+        :param direction: `from` for out associations and `to` for in associations
+        :param node: identifier of node
+        :param max_rows: maximum number of rows to get, all associations are retrieved when `None`
+        :param seed_id_list: when list of seeds is given, exclude all associations that introduce nodes not existing in seeds list
+    """
+    for response_values in requester.iter_association_pages(direction, node, params, max_rows):
+        if stopped.is_set():
+            return
+        page = (node, direction, unpack_response(response_values, seed_id_list) if response_values is not None else None)
+        asyncio.run_coroutine_threadsafe(queue.put(page), loop).result()
+
 def get_neighbour_ids(seed_list: list, associations: list, include_semantic_groups: list = []):
     """
         Get all ids of list of associations that are not the seed ids. If given, only include ids when entity belongs to at least
@@ -63,56 +100,70 @@ def get_neighbour_ids(seed_list: list, associations: list, include_semantic_grou
         :param include_semantic_groups: list of semantic groups to which all neighbour ids need to belong
         :return: set of (filtered) neighbour ids 
     """
+    seed_ids = set(seed_list)
+    include_semantic_groups = set(include_semantic_groups)
     neighbour_ids = set()
     
     for association in associations:
-        subject_node_id = association[constants.assoc_tuple_values.index('subject_id')] 
-        object_node_id = association[constants.assoc_tuple_values.index('object_id')] 
+        subject_node_id = association[SUBJECT_ID_INDEX]
+        object_node_id = association[OBJECT_ID_INDEX]
         
-        if not(subject_node_id in seed_list) and (len(include_semantic_groups) == 0 or association[constants.assoc_tuple_values.index('subject_category')] in include_semantic_groups):
+        if not(subject_node_id in seed_ids) and (len(include_semantic_groups) == 0 or association[SUBJECT_CATEGORY_INDEX] in include_semantic_groups):
             neighbour_ids.add(subject_node_id)
         
-        if not(object_node_id in seed_list) and (len(include_semantic_groups) == 0 or association[constants.assoc_tuple_values.index('object_category')] in include_semantic_groups):
+        if not(object_node_id in seed_ids) and (len(include_semantic_groups) == 0 or association[OBJECT_CATEGORY_INDEX] in include_semantic_groups):
             neighbour_ids.add(object_node_id)
         
     return neighbour_ids
         
-def get_neighbour_associations(id_list: list, rows: int = 2000, relations: list = [], exclude_new_ids: bool = False):
-    """ 
-        Return the first layer of neighbours from a list of node identifiers.
-        :param id_list: list of entities represented by their identifiers
-        :param relations: when parsing a non-empty list, these elements are the relation ids such that only associations are retrieved including these relations
-        :return: list of direct neighbours (list of tuples)
+async def iter_node_associations(seed_nodes: set, rows: int, relations: list, included_id_list: set, concurrency: int):
+    """
+        Fetch the out and in associations of all given seed nodes concurrently. Response pages are unpacked as soon as they
+        arrive and handed to the consumer one page at a time, so that unpacking and consuming overlap with requests that are
+        still in flight and at most a few pages are held at once.
+        :param seed_nodes: set of entities represented by their identifiers
+        :param rows: maximum number of rows to get per node and direction, all associations are retrieved when `None`
+        :param relations: when parsing a non-empty list, only associations including these relations are retrieved
+        :param included_id_list: when given, exclude all associations that introduce nodes not existing in this set
+        :param concurrency: maximum number of requests in flight at the same time
+        :return: generator of seed node id, direction (`from` or `to`) and list of associations (tuples) of one page, in order of
+        arrival; pages of the same node and direction arrive in order and the list is `None` when the request of the page failed
     """
-    all_associations = set()
-    all_seed_nodes = set(id_list)   # make sure there are no duplicate seed ids
+    loop = asyncio.get_running_loop()
+    loop.set_default_executor(ThreadPoolExecutor(max_workers=concurrency))
+    semaphore = asyncio.Semaphore(concurrency)
+    queue = asyncio.Queue(maxsize=concurrency)
+    stopped = threading.Event()
     
-    if exclude_new_ids:
-        included_id_list = all_seed_nodes
+    if (len(relations) > 0):
+        all_params = [{'relation': relation_id} for relation_id in relations]
     else:
-        included_id_list = None
+        all_params = [{}]
     
-    for seed_node in tqdm(all_seed_nodes):
-        params = {}
-        
-        if (len(relations) > 0):
-            for relation_id in relations:
-                params['relation'] = relation_id
-                
-                response_assoc_out, response_assoc_in = requester.get_in_out_associations(seed_node, params, rows)
-                
-                assoc_out = unpack_response(response_assoc_out, included_id_list)
-                assoc_in = unpack_response(response_assoc_in, included_id_list)
-                
-                all_associations.update(assoc_out)
-                all_associations.update(assoc_in)
-        else:
-            response_assoc_out, response_assoc_in = requester.get_in_out_associations(seed_node, params, rows)
-            
-            assoc_out = unpack_response(response_assoc_out, included_id_list)
-            assoc_in = unpack_response(response_assoc_in, included_id_list)
-            
-            all_associations.update(assoc_out)
-            all_associations.update(assoc_in)
-        
-    return filterer.get_associations_on_entities(all_associations, ['publication'], include=False)
\ No newline at end of file
+    fetches = [(direction, seed_node, params) for seed_node in seed_nodes for params in all_params for direction in ['from', 'to']]
+    progress = tqdm(total=len(fetches))
+    
+    async def fetch_direction(direction, seed_node, params):
+        async with semaphore:
+            await asyncio.to_thread(put_unpacked_pages, queue, loop, stopped, direction, seed_node, params, rows, included_id_list)
+        progress.update(1)
+    
+    async def fetch_all():
+        try:
+            await asyncio.gather(*[fetch_direction(*fetch) for fetch in fetches])
+        finally:
+            await queue.put(None)   # end of pages
+    
+    fetch_task = asyncio.create_task(fetch_all())
+    
+    try:
+        while (page := await queue.get()) is not None:
+            yield page
+        await fetch_task
+    finally:
+        # Release fetches that wait for room in the queue when pages are no longer consumed, each fetch puts at most one more page
+        stopped.set()
+        fetch_task.cancel()
+        while not queue.empty():
+            queue.get_nowait()
+        progress.close()
@@ -1,10 +1,9 @@
-from util.common import register_error
+import os
 
-import requests
-import time
+from util.common import register_error
+from util.httpclient import client
 
-BASE_URL = 'http://www.ebi.ac.uk/ols/api'
-RETRIES = 2
+BASE_URL = os.environ.get('OLS_BASE_URL', 'http://www.ebi.ac.uk/ols/api')
 
 def get_values(url):
     """
@@ -12,18 +11,12 @@ def get_values(url):
         :param url: Link of information source calling on API
         :return Response values of API call
     """
-    for i in range(RETRIES):
-        try:
-            response = requests.get(url, headers={'accept': 'application/json'})
-            return response.json()
-        except Exception as e:
-            if (i < RETRIES - 1):
-                time.sleep(3)
-                print('Retry', i)
-                continue
-            else:
-                register_error(f'Response values could not get data from API url {url} in response {response} due to {e}')
-                return {}
+    try:
+        response = client.get(url, headers={'accept': 'application/json'})
+        return response.json()
+    except Exception as e:
+        register_error(f'Response values could not get data from API url {url} due to {e}')
+        return {}
 
 def get_term(ontology, iri):
     """
@@ -32,18 +25,12 @@ def get_term(ontology, iri):
         :param iri: ID of relation in IRI format
         :return Response values of API call https://www.ebi.ac.uk/ols/docs/api#:~:text=Properties%20and%20individuals 
     """
-    for i in range(RETRIES):
-        try:
-            response = requests.get(f'http://www.ebi.ac.uk/ols/api/ontologies/{ontology}/properties?iri={iri}', headers={'accept': 'application/json'})
-            return response.json()
-        except Exception as e:
-            if (i < RETRIES - 1):
-                time.sleep(3)
-                print('Retry', i)
-                continue
-            else:
-                register_error(f'Response values could not get acquired for relation with iri {iri} of ontology {ontology} resulting in response {response} due to {e}')
-                return {}
+    try:
+        response = client.get(f'{BASE_URL}/ontologies/{ontology}/properties?iri={iri}', headers={'accept': 'application/json'})
+        return response.json()
+    except Exception as e:
+        register_error(f'Response values could not get acquired for relation with iri {iri} of ontology {ontology} due to {e}')
+        return {}
 
 def get_iri(ontology, uri):
     """
@@ -57,15 +44,9 @@ def get_iri(ontology, uri):
         'ontology': ontology
     }
     
-    for i in range(RETRIES):
-        try:
-            response = requests.get(f'http://www.ebi.ac.uk/ols/api/select?q={uri}', headers={'accept': 'application/json'}, params=params)
-            return response.json()
-        except Exception as e:
-            if (i < RETRIES - 1):
-                time.sleep(3)
-                print('Retry', i)
-                continue
-            else:
-                register_error(f'Response values could not get acquired for relation with uri {uri} of ontology {ontology} resulting in response {response} due to {e}')
-                return {}
\ No newline at end of file
+    try:
+        response = client.get(f'{BASE_URL}/select?q={uri}', headers={'accept': 'application/json'}, params=params)
+        return response.json()
+    except Exception as e:
+        register_error(f'Response values could not get acquired for relation with uri {uri} of ontology {ontology} due to {e}')
+        return {}
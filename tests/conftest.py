@@ -0,0 +1,31 @@
+import itertools
+
+import numpy as np
+import pytest
+
+import util.constants as constants
+
+CATEGORIES = [constants.GENE, constants.PHENOTYPE, constants.DISEASE, constants.MODEL, constants.ANAT, constants.CHEMICAL,
+              constants.VAR, constants.GENOTYPE, constants.PATHWAY, constants.BIOLPRO]
+RELATIONS = [('RO:HOM0000017', 'in orthology relationship with'), ('RO:0002200', 'has phenotype'), ('RO:0002434', 'interacts with'),
+             ('RO:0002327', 'enables'), ('RO:0003304', 'contributes to condition'), (None, None)]
+
+def make_associations(num_nodes: int = 60):
+    """
+        Generate associations between all pairs of nodes of a synthetic graph with every semantic group, relations without id
+        and nodes with and without a taxon.
+    """
+    def get_node(i):
+        taxon = (f'NCBITaxon:{i % 3}', f'taxon {i % 3}') if i % 5 else (np.nan, np.nan)
+        return (f'X:{i}', f'label {i}', f'http://x/{i}', CATEGORIES[i % len(CATEGORIES)]) + taxon
+
+    associations = list()
+    for k, (i, j) in enumerate(itertools.combinations(range(num_nodes), 2)):
+        relation_id, relation_label = RELATIONS[k % len(RELATIONS)]
+        associations.append((f'E:{k}',) + get_node(i) + get_node(j) + (relation_id, relation_label, relation_id and f'http://r/{relation_id}'))
+
+    return associations
+
+@pytest.fixture
+def associations():
+    return make_associations()
@@ -0,0 +1,79 @@
+import json
+import zlib
+
+import monarch.cache as cache_module
+
+from monarch.cache import ResponseCache
+from util.httpclient import HttpClient
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def time(self):
+        return self.now
+
+def get_size(response_values: dict):
+    return len(zlib.compress(json.dumps(response_values).encode()))
+
+def test_expired_response_is_removed(tmp_path, monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(cache_module, 'time', clock)
+    cache = ResponseCache(str(tmp_path / 'cache.sqlite'), ttl=60)
+
+    cache.put('a', {'associations': [1]})
+    clock.now += 60
+    assert cache.get('a') == {'associations': [1]}
+
+    clock.now += 1
+    assert cache.get('a') is None
+    assert cache.count() == 0 and cache.total_size == 0
+    cache.close()
+
+def test_expired_responses_are_removed_when_opened(tmp_path, monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(cache_module, 'time', clock)
+    file_path = str(tmp_path / 'cache.sqlite')
+
+    cache = ResponseCache(file_path, ttl=60)
+    cache.put('a', {'associations': [1]})
+    clock.now += 30
+    cache.put('b', {'associations': [2]})
+    cache.close()
+
+    clock.now += 31
+    cache = ResponseCache(file_path, ttl=60)
+    assert cache.count() == 1 and cache.total_size == get_size({'associations': [2]})
+    assert cache.get('b') == {'associations': [2]}
+    cache.close()
+
+def test_least_recently_used_response_is_evicted(tmp_path, monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(cache_module, 'time', clock)
+    responses = {key: {'associations': [key * 100]} for key in 'abc'}
+    cache = ResponseCache(str(tmp_path / 'cache.sqlite'), max_size=2 * get_size(responses['a']))
+
+    for key in 'ab':
+        cache.put(key, responses[key])
+        clock.now += 1
+
+    # Reading `a` makes `b` the least recently used response
+    assert cache.get('a') == responses['a']
+    clock.now += 1
+    cache.put('c', responses['c'])
+
+    assert cache.get('b') is None
+    assert cache.get('a') == responses['a'] and cache.get('c') == responses['c']
+    assert cache.total_size == 2 * get_size(responses['a'])
+    cache.close()
+
+def test_key_depends_on_request_url():
+    params = {'start': 0, 'rows': 2000}
+    key = ResponseCache.generate_key('https://api.monarchinitiative.org/api/association/from/HGNC:1', params, 2000)
+
+    assert key == ResponseCache.generate_key('https://api.monarchinitiative.org/api/association/from/HGNC:1', dict(reversed(params.items())), 2000)
+    assert key != ResponseCache.generate_key('http://localhost:8080/api/association/from/HGNC:1', params, 2000)
+
+    replay_client = HttpClient(replay_url='http://127.0.0.1:8765', record_dir=None)
+    replay_url = replay_client.get_request_url('https://api.monarchinitiative.org/api/association/from/HGNC:1')
+    assert key != ResponseCache.generate_key(replay_url, params, 2000)
@@ -0,0 +1,50 @@
+import os
+
+from monarch.checkpoint import CrawlCheckpoint
+
+CRAWL_INFO = {'seeds': ['HGNC:1'], 'depth': 2, 'rows': 2000}
+
+def test_resume_restores_batches_and_depths(tmp_path):
+    file_path = str(tmp_path / 'checkpoint.pkl')
+
+    checkpoint = CrawlCheckpoint(file_path, CRAWL_INFO)
+    checkpoint.complete_batch('neighbours', ['HGNC:1'], [('E:1', 'HGNC:1', 'HP:1')])
+    checkpoint.complete_depth({'orthologs': {'HGNC:2'}, 'phenotypes': {'HP:1'}, 'neighbours': {'HP:1'}})
+    checkpoint.complete_batch('neighbours', ['HP:1'], [('E:2', 'HP:1', 'HGNC:3')])
+
+    checkpoint = CrawlCheckpoint(file_path, CRAWL_INFO)
+    assert checkpoint.completed_depths == [{'orthologs': {'HGNC:2'}, 'phenotypes': {'HP:1'}, 'neighbours': {'HP:1'}}]
+    assert checkpoint.get_phase('neighbours') == {'visited': {'HP:1'}, 'associations': {('E:2', 'HP:1', 'HGNC:3')}}
+
+def test_partial_last_record_is_truncated(tmp_path):
+    file_path = str(tmp_path / 'checkpoint.pkl')
+
+    checkpoint = CrawlCheckpoint(file_path, CRAWL_INFO)
+    checkpoint.complete_batch('neighbours', ['HGNC:1'], [('E:1', 'HGNC:1', 'HP:1')])
+    complete_size = os.path.getsize(file_path)
+    checkpoint.complete_batch('neighbours', ['HGNC:2'], [('E:2', 'HGNC:2', 'HP:2')])
+
+    # Interrupt the crawl while the last record is written
+    with open(file_path, 'r+b') as f:
+        f.truncate(complete_size + (os.path.getsize(file_path) - complete_size) // 2)
+
+    checkpoint = CrawlCheckpoint(file_path, CRAWL_INFO)
+    assert checkpoint.get_phase('neighbours')['visited'] == {'HGNC:1'}
+    assert os.path.getsize(file_path) == complete_size
+
+    # Records appended after the truncated record are restored as well
+    checkpoint.complete_batch('neighbours', ['HGNC:2'], [('E:2', 'HGNC:2', 'HP:2')])
+    checkpoint = CrawlCheckpoint(file_path, CRAWL_INFO)
+    assert checkpoint.get_phase('neighbours')['visited'] == {'HGNC:1', 'HGNC:2'}
+
+def test_checkpoint_of_other_crawl_is_discarded(tmp_path):
+    file_path = str(tmp_path / 'checkpoint.pkl')
+
+    checkpoint = CrawlCheckpoint(file_path, CRAWL_INFO)
+    checkpoint.complete_batch('neighbours', ['HGNC:1'], [('E:1', 'HGNC:1', 'HP:1')])
+
+    checkpoint = CrawlCheckpoint(file_path, dict(CRAWL_INFO, depth=3))
+    assert checkpoint.completed_depths == [] and checkpoint.phases == {}
+
+    checkpoint = CrawlCheckpoint(file_path, CRAWL_INFO)
+    assert checkpoint.phases == {}
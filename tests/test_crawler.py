@@ -0,0 +1,37 @@
+import monarch.requester as requester
+
+from monarch.crawler import AssociationCrawler
+
+def make_entity(entity_id: str):
+    return {'id': entity_id, 'label': entity_id, 'iri': None, 'category': ['gene'], 'taxon': {'id': None, 'label': None}}
+
+def make_response(direction: str, node: str):
+    neighbour = f'{node}:{direction}'
+    subject, object = (node, neighbour) if direction == 'from' else (neighbour, node)
+    association = {'id': f'{subject}-{object}', 'subject': make_entity(subject), 'object': make_entity(object),
+                   'relation': {'id': 'RO:0002434', 'label': 'interacts with', 'iri': None}}
+    return {'numFound': 1, 'associations': [association]}
+
+def test_failed_node_is_fetched_again(monkeypatch):
+    requests = list()
+    failures = {('to', 'HGNC:2')}
+
+    def get_associations(direction, node, params):
+        requests.append((direction, node))
+        if (direction, node) in failures:
+            failures.remove((direction, node))
+            return None
+        return make_response(direction, node)
+
+    monkeypatch.setattr(requester, 'get_associations', get_associations)
+    crawler = AssociationCrawler(max_rows=10, concurrency=2)
+
+    associations = crawler.get_neighbour_associations(['HGNC:1', 'HGNC:2'])
+    assert set(crawler.node_associations) == {'HGNC:1'}
+    assert {association[0] for association in associations} == {'HGNC:1-HGNC:1:from', 'HGNC:1:to-HGNC:1'}
+
+    requests.clear()
+    associations = crawler.get_neighbour_associations(['HGNC:1', 'HGNC:2'])
+    assert sorted(requests) == [('from', 'HGNC:2'), ('to', 'HGNC:2')]
+    assert set(crawler.node_associations) == {'HGNC:1', 'HGNC:2'}
+    assert len(associations) == 4
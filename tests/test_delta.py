@@ -0,0 +1,37 @@
+import json
+
+import util.constants as constants
+
+from builder.kg import AssocKnowledgeGraph
+from builder.restructure import restructure_dataframes
+from builder import delta
+
+def change_relation(association: tuple, relation_id: str, relation_label: str):
+    return association[:13] + (relation_id, relation_label, relation_id and f'http://r/{relation_id}')
+
+def test_update_equals_full_restructure(associations, tmp_path, monkeypatch):
+    monkeypatch.setattr(constants, 'OUTPUT_FOLDER', str(tmp_path))
+    snapshot_file = tmp_path / 'kg_snapshot.pkl'
+
+    old_kg = AssocKnowledgeGraph(associations[:1200] + associations[1300:1500])
+    old_prev_dfs = old_kg.generate_dataframes()
+    delta.write_snapshot(old_prev_dfs, restructure_dataframes(*old_prev_dfs), snapshot_file)
+
+    # Remove and add associations and change the relation of associations that are kept
+    new_associations = associations[100:1400]
+    new_associations[:50] = [change_relation(association, 'RO:0002200', 'has phenotype') for association in new_associations[:50]]
+    new_associations[50:60] = [change_relation(association, None, None) for association in new_associations[50:60]]
+    new_kg = AssocKnowledgeGraph(new_associations)
+
+    edges_df, nodes_df, changeset = delta.update_kg(new_kg, 'new_kg', snapshot_file)
+    full_edges_df, full_nodes_df = restructure_dataframes(*new_kg.generate_dataframes())
+
+    assert edges_df.equals(full_edges_df)
+    assert nodes_df.equals(full_nodes_df)
+    assert all(changeset['edges'][change] for change in ['added', 'changed', 'removed'])
+    with open(tmp_path / 'new_kg_changeset.json') as f:
+        assert json.load(f) == changeset
+
+    snapshot = delta.load_snapshot(snapshot_file)
+    assert snapshot['edges'].equals(full_edges_df)
+    assert snapshot['nodes'].equals(full_nodes_df)
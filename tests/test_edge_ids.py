@@ -0,0 +1,31 @@
+import hashlib
+
+import pytest
+
+from util import common
+
+RELATION_IDS = ['RO:0002200', 'RO:0002200', 'RO:HOM0000017']
+SUBJECT_IDS = ['HGNC:1', 'HGNC:2', 'HGNC:1']
+OBJECT_IDS = ['HP:1', 'HP:1', 'MGI:1']
+
+def test_md5_edge_ids_are_unchanged():
+    edge_ids = common.generate_edge_ids(RELATION_IDS, SUBJECT_IDS, OBJECT_IDS)
+    assert edge_ids == [hashlib.md5((relation_id + subject_id + object_id).encode()).hexdigest() for relation_id, subject_id, object_id in zip(RELATION_IDS, SUBJECT_IDS, OBJECT_IDS)]
+    assert common.generate_edge_id(RELATION_IDS[0], SUBJECT_IDS[0], OBJECT_IDS[0]) == edge_ids[0]
+
+@pytest.mark.parametrize('digest_size', [8, 16])
+def test_siphash_edge_ids_hash_whole_columns(digest_size):
+    edge_ids = common.generate_edge_ids(RELATION_IDS, SUBJECT_IDS, OBJECT_IDS, 'siphash', digest_size)
+    assert [len(edge_id) for edge_id in edge_ids] == [2 * digest_size] * len(RELATION_IDS)
+    assert len(set(edge_ids)) == len(RELATION_IDS)
+    assert [common.generate_edge_id(relation_id, subject_id, object_id, 'siphash', digest_size) for relation_id, subject_id, object_id in zip(RELATION_IDS, SUBJECT_IDS, OBJECT_IDS)] == edge_ids
+
+    # Swapping subject and object gives another edge
+    assert common.generate_edge_ids(RELATION_IDS, OBJECT_IDS, SUBJECT_IDS, 'siphash', digest_size) != edge_ids
+    assert common.generate_edge_ids([], [], [], 'siphash', digest_size) == []
+
+def test_unknown_edge_id_hash_is_rejected():
+    with pytest.raises(ValueError):
+        common.generate_edge_id('RO:0002200', 'HGNC:1', 'HP:1', 'sha1')
+    with pytest.raises(ValueError):
+        common.generate_edge_ids(RELATION_IDS, SUBJECT_IDS, OBJECT_IDS, 'siphash', 4)
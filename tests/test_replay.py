@@ -0,0 +1,93 @@
+import json
+import os
+import threading
+
+import pytest
+import requests
+
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from urllib.parse import urlsplit
+
+from util.httpclient import HttpClient
+from util.replay import ReplayServer, generate_fixture_key, rewrite_replay_url
+
+STREAM_LINES = ['From\tTo'] + [f'P{i}\tG{i}' for i in range(25)]
+
+class OriginRequestHandler(BaseHTTPRequestHandler):
+    def log_message(self, format, *args):
+        pass
+
+    def do_GET(self):
+        if self.path.startswith('/status/'):
+            self.send_response(303)
+            self.send_header('Location', '/results/1')
+            self.send_header('Content-Length', '0')
+            self.end_headers()
+            return
+
+        if self.path.startswith('/stream/'):
+            content = '\n'.join(STREAM_LINES).encode()
+        else:
+            content = json.dumps({'path': self.path}).encode()
+
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/plain')
+        self.send_header('Content-Length', str(len(content)))
+        self.end_headers()
+        self.wfile.write(content)
+
+@pytest.fixture
+def origin_url():
+    server = ThreadingHTTPServer(('127.0.0.1', 0), OriginRequestHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield f'http://127.0.0.1:{server.server_port}'
+    server.shutdown()
+
+@pytest.fixture
+def replay_server(tmp_path):
+    server = ReplayServer(str(tmp_path))
+    server.start()
+    yield server
+    server.shutdown()
+
+def get_fixture_path(fixtures_dir, url: str):
+    split_url = urlsplit(url)
+    return os.path.join(fixtures_dir, f'{generate_fixture_key("GET", split_url.netloc, split_url.path, split_url.query)}.json')
+
+def test_fixture_key_ignores_parameter_order():
+    assert generate_fixture_key('GET', 'host', '/path', 'a=1&b=2') == generate_fixture_key('get', 'host', '/path', 'b=2&a=1')
+    assert generate_fixture_key('POST', 'host', '/path', '', b'ids=1&from=A') == generate_fixture_key('POST', 'host', '/path', '', 'from=A&ids=1')
+    assert generate_fixture_key('GET', 'host', '/path', 'a=1') != generate_fixture_key('GET', 'other', '/path', 'a=1')
+
+def test_redirected_response_is_recorded_under_original_request(tmp_path, origin_url, replay_server):
+    recording_client = HttpClient(record_dir=str(tmp_path), replay_url=None)
+    recorded_values = recording_client.get(f'{origin_url}/status/1').json()
+
+    assert recorded_values == {'path': '/results/1'}
+    assert os.path.exists(get_fixture_path(tmp_path, f'{origin_url}/status/1'))
+    assert not os.path.exists(get_fixture_path(tmp_path, f'{origin_url}/results/1'))
+
+    replay_client = HttpClient(replay_url=replay_server.url, record_dir=None)
+    assert replay_client.get(f'{origin_url}/status/1').json() == recorded_values
+
+def test_streamed_response_is_recorded_once_consumed(tmp_path, origin_url, replay_server):
+    recording_client = HttpClient(record_dir=str(tmp_path), replay_url=None)
+    fixture_path = get_fixture_path(tmp_path, f'{origin_url}/stream/1?format=tsv')
+
+    response = recording_client.get(f'{origin_url}/stream/1', params={'format': 'tsv'}, stream=True)
+    assert not os.path.exists(fixture_path)
+    assert list(response.iter_lines(decode_unicode=True)) == STREAM_LINES
+    assert os.path.exists(fixture_path)
+
+    replay_client = HttpClient(replay_url=replay_server.url, record_dir=None)
+    response = replay_client.get(f'{origin_url}/stream/1', params={'format': 'tsv'}, stream=True)
+    assert list(response.iter_lines(decode_unicode=True)) == STREAM_LINES
+
+def test_replay_answers_missing_fixtures_and_injected_errors(tmp_path, replay_server):
+    replay_url = rewrite_replay_url(replay_server.url, 'https://api.example.org/missing?a=1')
+    assert requests.get(replay_url).status_code == 404
+
+    replay_server.error_rate = 1.0
+    response = requests.get(replay_url)
+    assert response.status_code == 503 and response.headers['Retry-After'] == '0'
+    assert replay_server.statistics == {'requests': 2, 'errors': 1, 'missing': 1}
@@ -0,0 +1,17 @@
+import pandas as pd
+import pytest
+
+import util.constants as constants
+
+from builder.kg import AssocKnowledgeGraph
+from builder.restructure import check_restructure_parity, get_semantic_codes
+
+def test_restructure_parity(associations):
+    assert check_restructure_parity(AssocKnowledgeGraph(associations))
+
+def test_missing_node_raises():
+    prev_nodes_df = pd.DataFrame({'id': ['X:0', 'X:1'], 'semantic': [constants.GENE, constants.DISEASE]}, dtype=object)
+    prev_edges_df = pd.DataFrame({'subject': ['X:0', 'X:2'], 'object': ['X:1', 'X:1']}, dtype=object)
+
+    with pytest.raises(ValueError):
+        get_semantic_codes(prev_edges_df, prev_nodes_df)
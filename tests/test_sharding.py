@@ -0,0 +1,7 @@
+from builder.sharding import check_sharded_parity
+
+def test_sharded_parity(associations):
+    assert check_sharded_parity(associations, num_workers=2)
+
+def test_sharded_parity_without_associations():
+    assert check_sharded_parity([], num_workers=2)
@@ -0,0 +1,120 @@
+"""
+    This module stores the results of the UniProt ID mapping service on disk such that repeated runs only map accessions that
+    have not been mapped before.
+"""
+
+import sqlite3
+import time
+
+from util.common import register_info
+
+DEFAULT_TTL_S = 90 * 24 * 60 * 60      # mappings older than 90 days are requested again
+
+class MappingCache:
+    """
+        Initialize a persistent cache of ID mappings backed by a SQLite database. For each accession and database to which it is
+        mapped, all targets are stored. Accessions for which the service found no target are stored as well, such that they are
+        not submitted again. Mappings expire after the given time to live.
+        :param file_path: path of the SQLite database file
+        :param ttl: number of seconds after which a stored mapping expires
+    """
+    def __init__(self, file_path: str, ttl: int = DEFAULT_TTL_S):
+        self.file_path = file_path
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+
+        self.connection = sqlite3.connect(file_path)
+        self.connection.execute('PRAGMA journal_mode=WAL')
+        self.connection.execute("""
+            CREATE TABLE IF NOT EXISTS mappings (
+                accession TEXT NOT NULL,
+                to_db TEXT NOT NULL,
+                target TEXT NOT NULL,
+                created_at REAL NOT NULL,
+                PRIMARY KEY (accession, to_db, target)
+            )
+        """)
+        self.connection.execute("""
+            CREATE TABLE IF NOT EXISTS unmapped (
+                accession TEXT NOT NULL,
+                to_db TEXT NOT NULL,
+                created_at REAL NOT NULL,
+                PRIMARY KEY (accession, to_db)
+            )
+        """)
+        self.connection.commit()
+
+        self.remove_expired()
+        mapped_count = self.connection.execute('SELECT COUNT(*) FROM mappings').fetchone()[0]
+        unmapped_count = self.connection.execute('SELECT COUNT(*) FROM unmapped').fetchone()[0]
+        register_info(f'Mapping cache {file_path} contains {mapped_count} mappings and {unmapped_count} unmapped accessions')
+
+    def get_mappings(self, accessions: list, to_db: str):
+        """
+            Get stored mappings of given accessions to given database.
+            :return: list of dictionaries with keys `from` and `to` of all stored mappings and list of accessions that are not stored
+        """
+        self.connection.execute('CREATE TEMP TABLE IF NOT EXISTS requested (accession TEXT PRIMARY KEY)')
+        self.connection.execute('DELETE FROM requested')
+        self.connection.executemany('INSERT OR IGNORE INTO requested (accession) VALUES (?)', [(accession,) for accession in accessions])
+
+        rows = self.connection.execute("""
+            SELECT m.accession, m.target FROM mappings m JOIN requested r ON m.accession = r.accession WHERE m.to_db = ?
+        """, (to_db,)).fetchall()
+        unmapped_rows = self.connection.execute("""
+            SELECT u.accession FROM unmapped u JOIN requested r ON u.accession = r.accession WHERE u.to_db = ?
+        """, (to_db,)).fetchall()
+
+        stored_accessions = {accession for accession, _ in rows} | {accession for accession, in unmapped_rows}
+        missing_accessions = [accession for accession in dict.fromkeys(accessions) if accession not in stored_accessions]
+
+        self.hits += len(stored_accessions)
+        self.misses += len(missing_accessions)
+
+        return [{'from': accession, 'to': target} for accession, target in rows], missing_accessions
+
+    def add_mappings(self, to_db: str, mappings: list):
+        """
+            Add mappings to given database, which are stored when `commit` is called.
+            :param mappings: list of dictionaries with keys `from` and `to` returned by the mapping service
+        """
+        now = time.time()
+        self.connection.executemany('REPLACE INTO mappings (accession, to_db, target, created_at) VALUES (?, ?, ?, ?)',
+                                    [(mapping['from'], to_db, mapping['to'], now) for mapping in mappings])
+
+    def add_unmapped(self, to_db: str, accessions: list):
+        """
+            Add accessions for which the mapping service found no target in given database, which are stored when `commit` is called.
+        """
+        now = time.time()
+        self.connection.executemany('REPLACE INTO unmapped (accession, to_db, created_at) VALUES (?, ?, ?)',
+                                    [(accession, to_db, now) for accession in accessions])
+
+    def commit(self):
+        """
+            Store all added mappings.
+        """
+        self.connection.commit()
+
+    def rollback(self):
+        """
+            Discard all mappings that have been added since the last commit, such that a partially received job is not stored.
+        """
+        self.connection.rollback()
+
+    def remove_expired(self):
+        """
+            Remove all mappings of which the time to live has passed.
+        """
+        expired_at = time.time() - self.ttl
+        self.connection.execute('DELETE FROM mappings WHERE created_at < ?', (expired_at,))
+        self.connection.execute('DELETE FROM unmapped WHERE created_at < ?', (expired_at,))
+        self.connection.commit()
+
+    def close(self):
+        """
+            Close connection to database file.
+        """
+        register_info(f'Mapping cache had {self.hits} hits and {self.misses} misses')
+        self.connection.close()
@@ -5,13 +5,13 @@
 
 import pandas as pd
 import numpy as np
-from tqdm import tqdm
 
 import util.constants as constants
 import util.common as common
 
-from util.common import extract_colvalues, register_info, dataframe2tuplelist
-from ttd.idmapper import db_mapper, IdMapper, DEFAULT_TO_DB
+from util.common import extract_colvalues, register_info, dataframe2table
+from ttd.cache import MappingCache
+from ttd.idmapper import db_mapper, map_all_ids, split_into_chunks, CONCURRENCY, DEFAULT_TO_DB
 
 def load_drug_targets():
     """
@@ -42,56 +42,106 @@ def get_single_id(id):
     else:
         return id
     
-def add_new_ids(df, mapped_ids):
+def get_mapping_entries(df):
+    """
+        Prepare entries of given dataframe to be joined with mappings, see `join_mappings`. Entries with multiple accessions split
+        by `|` are mapped by their first accession, see `get_accessions`.
+        :param df: Dataframe containing column name `ACCESSION`
+        :return: Dataframe with the accession by which each entry is mapped in column `MAPPED_ACCESSION` and the position of each
+        entry in column `POSITION`
+    """
+    entries = df.drop(columns='NEW_ID', errors='ignore')    # new IDs are added by the join
+    entries['MAPPED_ACCESSION'] = entries['ACCESSION'].str.split('|').str[0]
+    entries['POSITION'] = np.arange(len(entries))
+    return entries
+
+def join_mappings(entries, mapped_ids):
     """
-        Add new IDs of entries in given dataframe based on their mappings.
-        :param df: Dataframe containing column names `ACCESSION` and `NEW_ID`
-        :param mapped_ids: Mappings of IDs containing list of dictionaries with keys `from` and `to`
+        Join mappings with prepared entries on their accession at once. An entry of which the accession is mapped to multiple IDs
+        results in one entry per ID.
+        :param entries: Dataframe of entries, see `get_mapping_entries`
+        :param mapped_ids: Mappings of IDs as dataframe with columns `from` and `to` or list of dictionaries with keys `from` and `to`
+        :return: Dataframe with an entry for each new ID of each entry that is mapped in column `NEW_ID`
     """
-    for mapped_id in tqdm(mapped_ids):
-        accession_id = mapped_id['from']
-        new_id = mapped_id['to']
-        df.loc[df['ACCESSION'] == accession_id, 'NEW_ID'] = new_id
-        
-    return df[df['NEW_ID'].notna()]
+    mappings = pd.DataFrame(mapped_ids, columns=['from', 'to']).drop_duplicates()
+    mappings = mappings.rename({'from': 'MAPPED_ACCESSION', 'to': 'NEW_ID'}, axis=1)
+    
+    return entries.merge(mappings, on='MAPPED_ACCESSION', how='inner', sort=False)
 
-def fetch_id_mappings(entries: pd.DataFrame, map_to_db):
+def get_accessions(entries: pd.DataFrame):
     """
-        Get ID mappings of IDs present in given dataframe. Mappings are based on given database to which the IDs need to be mapped.
+        Get unique accessions of given entries, in which entries with multiple accessions split by `|` are represented by their first accession.
         :param entries: Dataframe containing column name `ACCESSION`
-        :param map_to_db: Name of database to which the given IDs need to be mapped
     """
-    if (entries.shape[0] > 0):
-        id_entries_to_map = entries.copy()
-        id_entries_to_map['ACCESSION'] = entries.apply(lambda row: get_single_id(row['ACCESSION']), axis=1)
-        
-        mapper = IdMapper(ids_to_map=id_entries_to_map['ACCESSION'].to_list(), to_db=map_to_db)
-        if hasattr(mapper, 'results'):
-            return mapper.results
-        else:
-            return []
-    else:
-        return []
+    return list(dict.fromkeys(get_single_id(accession) for accession in entries['ACCESSION']))
 
-def get_mapped_ids(drug_targets):
+def map_drug_targets(drug_targets, cache_file: str = f'{constants.OUTPUT_FOLDER}/uniprot_mappings.sqlite', concurrency: int = CONCURRENCY):
     """
-        Get mapped IDs for all included databases.
+        Add mapped IDs of all included databases to the drug targets. Accessions that are not found in the mapping cache are split into
+        chunks that are mapped concurrently across all databases, after which their mappings are stored in the cache. Each batch of
+        mappings is joined with the drug targets as soon as it is received, such that all mappings are never held at once.
         :param drug_targets: Dataframe that contains column name `ORGANISM` and `ACCESSION`
+        :param cache_file: path of the mapping cache database file, see `ttd.cache.MappingCache`
+        :param concurrency: maximum number of mapping jobs running at the same time
+        :return: Dataframe with an entry for each new ID of each drug target that is mapped, see `join_mappings`
     """
-    all_mapped_id_results = []
     all_taxon_names = list(db_mapper.keys())
     
-    for taxon in all_taxon_names:
-        relevant_entries = drug_targets[drug_targets['ORGANISM'].str.contains(taxon)]
-        id_mappings = fetch_id_mappings(relevant_entries, db_mapper[taxon])
-        all_mapped_id_results = all_mapped_id_results + id_mappings
-
+    all_accessions = [(get_accessions(drug_targets[drug_targets['ORGANISM'].str.contains(taxon)]), db_mapper[taxon]) for taxon in all_taxon_names]
+    
     # Map entity ids of leftover organisms to default database
-    other_relevant_entries = drug_targets[~drug_targets['ORGANISM'].isin(all_taxon_names)]
-    other_id_mappings = fetch_id_mappings(other_relevant_entries, DEFAULT_TO_DB)
-    all_mapped_id_results = all_mapped_id_results + other_id_mappings
+    all_accessions.append((get_accessions(drug_targets[~drug_targets['ORGANISM'].isin(all_taxon_names)]), DEFAULT_TO_DB))
+    
+    entries = get_mapping_entries(drug_targets)
+    cache = MappingCache(cache_file)
+    try:
+        all_mapped_entries = []
+        jobs = []
+        
+        for accessions, to_db in all_accessions:
+            cached_mappings, missing_accessions = cache.get_mappings(accessions, to_db)
+            all_mapped_entries.append(join_mappings(entries, cached_mappings))
+            jobs.extend((chunk, to_db) for chunk in split_into_chunks(missing_accessions))
+        
+        register_info(f'Submitting {len(jobs)} ID mapping jobs for accessions that are not cached')
+        for (chunk, to_db), mapper in zip(jobs, map_all_ids(jobs, concurrency)):
+            if mapper is None:
+                continue
+            
+            # Results are stored batch by batch, but only committed and kept when all results of the job are received
+            try:
+                job_mapped_entries = []
+                mapped_accessions = set()
+                for mappings in mapper.iter_results():
+                    cache.add_mappings(to_db, mappings)
+                    mapped_accessions.update(mapping['from'] for mapping in mappings)
+                    job_mapped_entries.append(join_mappings(entries, mappings))
                 
-    return all_mapped_id_results
+                cache.add_unmapped(to_db, [accession for accession in chunk if accession not in mapped_accessions])
+                cache.commit()
+                all_mapped_entries.extend(job_mapped_entries)
+            except Exception as e:
+                cache.rollback()
+                print(f'Failed to get results of mapping job {mapper.job_id} due to {e}')
+    finally:
+        cache.close()
+    
+    # Order entries as if all mappings were joined at once, keeping each new ID of an entry once
+    mapped_entries = pd.concat(all_mapped_entries, ignore_index=True).sort_values('POSITION', kind='stable')
+    mapped_entries = mapped_entries.drop_duplicates(subset=['POSITION', 'NEW_ID'])
+    return mapped_entries.drop(columns=['MAPPED_ACCESSION', 'POSITION']).reset_index(drop=True)
+
+def interleave_values(n: int, first_values, second_values):
+    """
+        Interleave values of two edges of each of `n` entries, such that the first edge of each entry is followed by its second edge.
+        :param first_values: list of values of first edges or single value of all first edges
+        :param second_values: list of values of second edges or single value of all second edges
+        :return: array of `2n` values
+    """
+    values = np.empty(2 * n, dtype=object)
+    values[0::2] = first_values
+    values[1::2] = second_values
+    return values
 
 def format_drugtarget_associations(drug_targets_prev: pd.DataFrame):
     """
@@ -102,55 +152,51 @@ def format_drugtarget_associations(drug_targets_prev: pd.DataFrame):
     drug_targets = drug_targets_prev.drop_duplicates(inplace=False).copy()
     common.register_info(f'Total of {drug_targets_prev.shape[0]} drug-target associations changed to {drug_targets.shape[0]} by dropping duplicates.')
     
-    new_assocs = pd.DataFrame()
+    prod_gene_relation = constants.IS_PRODUCT_OF
+    drug_prod_relation = constants.TARGETS
     
-    for i, row in drug_targets.iterrows():
-        drug_id = str(row['STRUCT_ID'])
-        drug_label = row['DRUG_NAME']
-        
-        prod_id = row['PROD_ID']
-        prod_label = row['PROD_NAME']
-        
-        gene_id = row['GENE_ID']
-        
-        prod_gene_relation = constants.IS_PRODUCT_OF
-        drug_prod_relation = constants.TARGETS
-        
-        prod_gene_edge_id = common.generate_edge_id(prod_gene_relation['id'], prod_id, gene_id)
-        drug_prod_edge_id = common.generate_edge_id(drug_prod_relation['id'], drug_id, prod_id)
-        
-        new_edges = {
-            'id': [prod_gene_edge_id, drug_prod_edge_id],
-            'subject_id': [prod_id, drug_id],
-            'subject_label': [prod_label, drug_label],
-            'subject_iri': [np.nan, np.nan],
-            'subject_category': [constants.GENE_PRODUCT, constants.DRUG],
-            'subject_taxon_id': [np.nan, np.nan],
-            'subject_taxon_label': [np.nan, np.nan],
-            'object_id': [gene_id, prod_id],
-            'object_label': [np.nan, prod_label],
-            'object_iri': [np.nan, np.nan],
-            'object_category': [np.nan, constants.GENE_PRODUCT],
-            'object_taxon_id': [np.nan, np.nan],
-            'object_taxon_label': [np.nan, np.nan],
-            'relation_id': [prod_gene_relation['id'], drug_prod_relation['id']],
-            'relation_label': [prod_gene_relation['label'], drug_prod_relation['label']],
-            'relation_iri': [prod_gene_relation['iri'], drug_prod_relation['iri']]
-        }
-        
-        new_assocs = new_assocs.append(pd.DataFrame(new_edges))
-
-    drugtarget_associations_df = new_assocs[list(constants.assoc_tuple_values)]
+    drug_ids = drug_targets['STRUCT_ID'].astype(str).to_numpy(dtype=object)
+    drug_labels = drug_targets['DRUG_NAME'].to_numpy(dtype=object)
+    prod_ids = drug_targets['PROD_ID'].to_numpy(dtype=object)
+    prod_labels = drug_targets['PROD_NAME'].to_numpy(dtype=object)
+    gene_ids = drug_targets['GENE_ID'].to_numpy(dtype=object)
+    
+    # Generate ids of all edges at once
+    prod_gene_edge_ids = common.generate_edge_ids([prod_gene_relation['id']] * len(drug_targets), prod_ids, gene_ids)
+    drug_prod_edge_ids = common.generate_edge_ids([drug_prod_relation['id']] * len(drug_targets), drug_ids, prod_ids)
+    
+    # Values of the product-gene edge and the drug-product edge of all interactions
+    new_edges = {
+        'id': (prod_gene_edge_ids, drug_prod_edge_ids),
+        'subject_id': (prod_ids, drug_ids),
+        'subject_label': (prod_labels, drug_labels),
+        'subject_iri': (np.nan, np.nan),
+        'subject_category': (constants.GENE_PRODUCT, constants.DRUG),
+        'subject_taxon_id': (np.nan, np.nan),
+        'subject_taxon_label': (np.nan, np.nan),
+        'object_id': (gene_ids, prod_ids),
+        'object_label': (np.nan, prod_labels),
+        'object_iri': (np.nan, np.nan),
+        'object_category': (np.nan, constants.GENE_PRODUCT),
+        'object_taxon_id': (np.nan, np.nan),
+        'object_taxon_label': (np.nan, np.nan),
+        'relation_id': (prod_gene_relation['id'], drug_prod_relation['id']),
+        'relation_label': (prod_gene_relation['label'], drug_prod_relation['label']),
+        'relation_iri': (prod_gene_relation['iri'], drug_prod_relation['iri'])
+    }
+    
+    # Both edges of an interaction are kept next to each other
+    drugtarget_associations_df = pd.DataFrame({column: interleave_values(len(drug_targets), *new_edges[column]) for column in constants.assoc_tuple_values}, columns=list(constants.assoc_tuple_values))
     drugtarget_associations_df.to_csv(f'{constants.OUTPUT_FOLDER}/ttd_associations.csv', index=None)
     register_info('All TTD associations are saved into ttd_associations.csv')
     
-    return dataframe2tuplelist(new_assocs) 
+    return dataframe2table(drugtarget_associations_df)
 
 def get_drugtarget_associations(gene_nodes: pd.DataFrame):
     """
         Get all drug target interaction associations
         :param gene_nodes: Dataframe containing existing nodes
-        :return List of tuples complying with `constants.assoc_tuple_values`
+        :return Association table complying with `constants.assoc_tuple_values`
     """
     # Nodes fetched from Monarch Initiative
     gene_ids = extract_colvalues(gene_nodes, 'id')
@@ -161,12 +207,7 @@ def get_drugtarget_associations(gene_nodes: pd.DataFrame):
     
     # Collect correct target IDs
     print('The IDs in the drug-target interaction database need to be mapped to the previously extracted gene IDs:')
-    all_mapped_ids = get_mapped_ids(drug_targets)
-    
-    # Create dataframe to hold new IDs
-    mapped_drug_targets = drug_targets.copy()
-    mapped_drug_targets['NEW_ID'] = np.nan
-    mapped_drug_targets = add_new_ids(mapped_drug_targets, all_mapped_ids)
+    mapped_drug_targets = map_drug_targets(drug_targets)
     register_info(f'For a total of {mapped_drug_targets.shape[0]} drug-target interactions, new mapped IDs are found.')
     
     matched_drug_targets = mapped_drug_targets[mapped_drug_targets['NEW_ID'].isin(gene_ids)]
@@ -4,11 +4,19 @@
     @author: Rosa Zwart
 """
 
-import requests
+import asyncio
+import os
 import time
 
-RETRIES = 3
+from concurrent.futures import ThreadPoolExecutor
+
+from util.httpclient import client
+
+BASE_URL = os.environ.get('UNIPROT_BASE_URL', 'https://rest.uniprot.org')
 POLLING_S_INTERVAL = 5
+CHUNK_SIZE = 5000       # maximum number of ids submitted in one job
+CONCURRENCY = 4         # maximum number of jobs running at the same time
+RESULTS_BATCH_SIZE = 10000
 
 FROM_DB = 'UniProtKB_AC-ID'
 DEFAULT_TO_DB = 'Ensembl'
@@ -28,11 +36,16 @@ db_mapper = {
 }
 
 class IdMapper:
-    def __init__(self, ids_to_map: list, to_db = DEFAULT_TO_DB, from_db = FROM_DB):
-        self.url = 'https://rest.uniprot.org'
+    """
+        Initialize a job of the UniProt ID mapping service.
+        :param ids_to_map: list of ids that need to be mapped
+        :param wait: whether to wait until the job is finished and get its results, otherwise the job is only submitted
+    """
+    def __init__(self, ids_to_map: list, to_db = DEFAULT_TO_DB, from_db = FROM_DB, wait: bool = True):
+        self.url = BASE_URL
         self.job_id = self.submit_id_mapping(ids_to_map, to_db, from_db)
 
-        if self.check_job_ready():
+        if wait and self.check_job_ready():
             self.results = self.get_results()
         
     def submit_id_mapping(self, id_list, to_db, from_db):
@@ -44,57 +57,126 @@ class IdMapper:
             'ids': ','.join(id_list)
         }
         
-        for i in range(RETRIES):
-            try:  
-                response = requests.post(f'{self.url}/idmapping/run', data=data_params)
-                response.raise_for_status()
-                return response.json()['jobId']
-            except Exception as e:
-                if (i < RETRIES - 1):
-                    print(f'Retrying in {POLLING_S_INTERVAL}s')
-                    time.sleep(POLLING_S_INTERVAL)
-                    continue
-                else:
-                    print(f'After all attempts, request could not be submitted due to {e}')
-                    return None
+        try:  
+            response = client.post(f'{self.url}/idmapping/run', data=data_params)
+            return response.json()['jobId']
+        except Exception as e:
+            print(f'After all attempts, request could not be submitted due to {e}')
+            return None
                 
+    def get_job_status(self):
+        """
+            Check status of job once.
+            :return: `True` when job is finished, `None` when job is still running and `False` otherwise
+        """
+        try:
+            response = client.get(f'{self.url}/idmapping/status/{self.job_id}')
+            response_values = response.json()
+        except Exception as e:
+            print(f'Failed to check whether job is finished due to {e}, stopped checking if job is ready.')
+            return False
+        
+        if 'jobStatus' in response_values:
+            if response_values['jobStatus'] in ['NEW', 'RUNNING']:
+                return None
+            
+            elif response_values['jobStatus'] == 'FINISHED':
+                print('Job is finished')
+                return True
+            
+            else:
+                print(f'Job {self.job_id} had status {response_values["jobStatus"]}, stopped checking if job is ready.')
+                return False
+        elif 'results' in response_values:
+            return True
+        else:
+            return False
+    
     def check_job_ready(self):
         while self.job_id:
-            try:
-                response = requests.get(f'{self.url}/idmapping/status/{self.job_id}')
-                response.raise_for_status()
-                response_values = response.json()
-                if 'jobStatus' in response_values:
-                    if response_values['jobStatus'] == 'RUNNING':
-                        print(f'Check again after {POLLING_S_INTERVAL}s')
-                        time.sleep(POLLING_S_INTERVAL)
-                    
-                    elif response_values['jobStatus'] == 'FINISHED':
-                        print('Job is finished')
-                        return True
-                    
-                    else:
-                        print(f'Job {self.job_id} had status {response_values["jobStatus"]}, stopped checking if job is ready.')
-                        return False
-                elif 'results' in response_values:
-                        return True
-                else:
-                    return False
-            except Exception as e:
-                print(f'Failed to check whether job is finished due to {e}, try again after {POLLING_S_INTERVAL}s...')
+            job_ready = self.get_job_status()
+            
+            if job_ready is None:
+                print(f'Check again after {POLLING_S_INTERVAL}s')
                 time.sleep(POLLING_S_INTERVAL)
+            else:
+                return job_ready
                 
+    def iter_results(self, batch_size: int = RESULTS_BATCH_SIZE):
+        """
+            Stream the results of the finished job in TSV format, such that results are parsed while they are downloaded and
+            never held in memory at once.
+            :return: generator of lists of at most `batch_size` dictionaries with keys `from` and `to`
+        """
+        with client.get(f'{self.url}/idmapping/stream/{self.job_id}', params={'format': 'tsv'}, stream=True) as response:
+            response.encoding = response.encoding or 'utf-8'
+            lines = response.iter_lines(decode_unicode=True)
+            next(lines, None)   # header with column names
+            
+            batch = []
+            for line in lines:
+                if line:
+                    accession, target = line.split('\t')[:2]
+                    batch.append({'from': accession, 'to': target})
+                    
+                if len(batch) == batch_size:
+                    yield batch
+                    batch = []
+            
+            if len(batch) > 0:
+                yield batch
+        
     def get_results(self):
-        for i in range(RETRIES):
-            try:  
-                response = requests.get(f'{self.url}/idmapping/stream/{self.job_id}')
-                response.raise_for_status()
-                return response.json()['results']
-            except Exception as e:
-                if (i < RETRIES - 1):
-                    print(f'Retrying in {POLLING_S_INTERVAL}s')
-                    time.sleep(POLLING_S_INTERVAL)
-                    continue
-                else:
-                    print(f'After all attempts, request could not be submitted due to {e}')
-                    return None
\ No newline at end of file
+        """
+            Get all results of the finished job at once. Unlike `iter_results`, all results are held in memory, so this is only
+            meant for small jobs.
+            :return: list of dictionaries with keys `from` and `to`, `None` when the results could not be received
+        """
+        try:  
+            return [mapping for batch in self.iter_results() for mapping in batch]
+        except Exception as e:
+            print(f'After all attempts, request could not be submitted due to {e}')
+            return None
+
+def split_into_chunks(ids: list, chunk_size: int = CHUNK_SIZE):
+    """
+        Split given list of ids into lists of at most given size.
+    """
+    return [ids[i:i + chunk_size] for i in range(0, len(ids), chunk_size)]
+
+async def map_ids_async(ids_to_map: list, to_db: str, semaphore: asyncio.Semaphore, from_db = FROM_DB):
+    """
+        Submit a job to map given ids and wait until it is finished without blocking other jobs, see `IdMapper`.
+        :param semaphore: semaphore limiting the number of jobs running at the same time
+        :return: `IdMapper` of finished job of which the results can be streamed, or `None` when the job failed
+    """
+    async with semaphore:
+        mapper = await asyncio.to_thread(IdMapper, ids_to_map, to_db, from_db, False)
+        
+        job_ready = None
+        while mapper.job_id and job_ready is None:
+            await asyncio.sleep(POLLING_S_INTERVAL)
+            job_ready = await asyncio.to_thread(mapper.get_job_status)
+        
+        return mapper if job_ready else None
+
+async def gather_id_mappings(jobs: list, concurrency: int):
+    """
+        Run all given jobs concurrently, see `map_all_ids`.
+    """
+    asyncio.get_running_loop().set_default_executor(ThreadPoolExecutor(max_workers=concurrency))
+    semaphore = asyncio.Semaphore(concurrency)
+    
+    return await asyncio.gather(*[map_ids_async(ids_to_map, to_db, semaphore) for ids_to_map, to_db in jobs])
+
+def map_all_ids(jobs: list, concurrency: int = CONCURRENCY):
+    """
+        Map ids of all given jobs, in which at most `concurrency` jobs are running at the same time and the status of running jobs
+        is checked while other jobs are submitted.
+        :param jobs: list of tuples of list of ids that need to be mapped and database to which they need to be mapped
+        :return: list with `IdMapper` of each job, see `map_ids_async`
+    """
+    if len(jobs) == 0:
+        return []
+    
+    return asyncio.run(gather_id_mappings(jobs, concurrency))
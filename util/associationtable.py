@@ -0,0 +1,204 @@
+"""
+    Module with a columnar representation of associations complying with `constants.assoc_tuple_values`.
+"""
+
+import numpy as np
+import pandas as pd
+
+from util.constants import assoc_tuple_values
+
+def normalize_value(value):
+    """
+        Replace every missing float value by the `np.nan` singleton, such that all missing values are encoded by the same code.
+    """
+    if isinstance(value, float) and value != value:
+        return np.nan
+    return value
+
+def encode_values(values):
+    """
+        Dictionary-encode given values.
+        :param values: sequence of values
+        :return: array of integer codes and array of distinct values such that `dictionary[codes]` equals the given values
+    """
+    lookup = dict()
+    codes = np.fromiter((lookup.setdefault(normalize_value(value), len(lookup)) for value in values), dtype=np.int32, count=len(values))
+
+    dictionary = np.empty(len(lookup), dtype=object)
+    dictionary[:] = list(lookup)
+
+    return codes, dictionary
+
+class AssociationTable:
+    """
+        Initialize a table of associations in which each column of `constants.assoc_tuple_values` is stored as an array of integer codes
+        referring to an array of distinct values of that column. Iterating over a table yields association tuples, so that a table can be
+        used wherever a list of association tuples is expected.
+        :param codes: dictionary with column names as keys and arrays of integer codes as values
+        :param dictionaries: dictionary with column names as keys and arrays of distinct values as values
+    """
+    def __init__(self, codes: dict, dictionaries: dict):
+        self.codes = codes
+        self.dictionaries = dictionaries
+
+    @classmethod
+    def from_columns(cls, columns: dict):
+        """
+            Create table from columns of values.
+            :param columns: dictionary with all names of `constants.assoc_tuple_values` as keys and sequences of values as values
+        """
+        codes = dict()
+        dictionaries = dict()
+
+        for column_name in assoc_tuple_values:
+            codes[column_name], dictionaries[column_name] = encode_values(columns[column_name])
+
+        return cls(codes, dictionaries)
+
+    @classmethod
+    def from_tuples(cls, tuple_list):
+        """
+            Create table from association tuples.
+            :param tuple_list: iterable of tuples complying with `constants.assoc_tuple_values`
+        """
+        tuple_list = list(tuple_list)
+
+        if len(tuple_list) == 0:
+            return cls.from_columns({column_name: [] for column_name in assoc_tuple_values})
+
+        return cls.from_columns(dict(zip(assoc_tuple_values, zip(*tuple_list))))
+
+    @classmethod
+    def from_dataframe(cls, df: pd.DataFrame):
+        """
+            Create table from dataframe containing all columns of `constants.assoc_tuple_values`.
+        """
+        return cls.from_columns({column_name: df[column_name].to_numpy(dtype=object) for column_name in assoc_tuple_values})
+
+    @classmethod
+    def concat(cls, tables: list):
+        """
+            Concatenate given tables into one table, merging the distinct values of each column.
+            :param tables: list of tables
+        """
+        codes = dict()
+        dictionaries = dict()
+
+        for column_name in assoc_tuple_values:
+            lookup = dict()
+            all_codes = list()
+
+            for table in tables:
+                remap = np.fromiter((lookup.setdefault(value, len(lookup)) for value in table.dictionaries[column_name]), dtype=np.int32, count=len(table.dictionaries[column_name]))
+                all_codes.append(remap[table.codes[column_name]])
+
+            codes[column_name] = np.concatenate(all_codes) if len(all_codes) > 0 else np.empty(0, dtype=np.int32)
+            dictionaries[column_name] = np.empty(len(lookup), dtype=object)
+            dictionaries[column_name][:] = list(lookup)
+
+        return cls(codes, dictionaries)
+
+    def __len__(self):
+        return len(self.codes[assoc_tuple_values[0]])
+
+    def __iter__(self):
+        return zip(*[self.column(column_name) for column_name in assoc_tuple_values])
+
+    def __repr__(self):
+        return f'AssociationTable with {len(self)} associations'
+
+    def column(self, column_name: str):
+        """
+            Get decoded values of given column.
+            :return: array of values
+        """
+        return self.dictionaries[column_name][self.codes[column_name]]
+
+    def isin(self, column_name: str, values):
+        """
+            Test for each association whether the value of given column is one of the given values.
+            :return: boolean mask over all associations
+        """
+        values = set(values)
+        dictionary_mask = np.fromiter((value in values for value in self.dictionaries[column_name]), dtype=bool, count=len(self.dictionaries[column_name]))
+        return dictionary_mask[self.codes[column_name]]
+
+    def filter(self, mask):
+        """
+            Get table of associations for which given mask is true.
+            :param mask: boolean mask or array of indices over all associations
+        """
+        return AssociationTable({column_name: codes[mask] for column_name, codes in self.codes.items()}, self.dictionaries)
+
+    def compact(self):
+        """
+            Get table with the same associations in which the dictionaries only contain values that occur in the table, such that
+            a filtered table does not carry the values of all associations it was filtered from.
+        """
+        codes = dict()
+        dictionaries = dict()
+
+        for column_name in assoc_tuple_values:
+            used_codes, codes[column_name] = np.unique(self.codes[column_name], return_inverse=True)
+            codes[column_name] = codes[column_name].astype(np.int32)
+            dictionaries[column_name] = self.dictionaries[column_name][used_codes]
+
+        return AssociationTable(codes, dictionaries)
+
+    def dedupe(self):
+        """
+            Get table without duplicate associations, keeping the first occurrence of each association.
+        """
+        if len(self) == 0:
+            return self
+
+        all_codes = np.stack([self.codes[column_name] for column_name in assoc_tuple_values], axis=1)
+        _, first_indices = np.unique(all_codes, axis=0, return_index=True)
+
+        return self.filter(np.sort(first_indices))
+
+    def to_tuples(self):
+        """
+            Convert table to list of association tuples.
+        """
+        return list(self)
+
+    def to_dataframe(self):
+        """
+            Convert table to dataframe with columns `constants.assoc_tuple_values`.
+        """
+        return pd.DataFrame({column_name: self.column(column_name) for column_name in assoc_tuple_values}, columns=list(assoc_tuple_values))
+
+class AssociationColumns:
+    """
+        Initialize a columnar view of a list of association tuples with the same `column` and `isin` methods as `AssociationTable`.
+        Each column is extracted in one pass on first use and shared by all later uses, whereas encoding all columns of an
+        `AssociationTable` would cost more than a filter over a few columns.
+        :param associations: list of tuples complying with `constants.assoc_tuple_values`
+    """
+    def __init__(self, associations: list):
+        self.associations = associations
+        self.columns = dict()
+
+    def __len__(self):
+        return len(self.associations)
+
+    def column(self, column_name: str):
+        """
+            Get values of given column.
+            :return: array of values
+        """
+        if column_name not in self.columns:
+            column_index = assoc_tuple_values.index(column_name)
+            column = np.empty(len(self.associations), dtype=object)
+            column[:] = [association[column_index] for association in self.associations]
+            self.columns[column_name] = column
+
+        return self.columns[column_name]
+
+    def isin(self, column_name: str, values):
+        """
+            Test for each association whether the value of given column is one of the given values.
+            :return: boolean mask over all associations
+        """
+        return pd.Series(self.column(column_name), dtype=object).isin(list(values)).to_numpy()
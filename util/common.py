@@ -1,10 +1,17 @@
 import logging
 logging.basicConfig(level=logging.INFO, filename='datafetcher.log', filemode="a+", format="%(asctime)-15s %(levelname)-8s %(message)s")
 
+import numpy as np
 import pandas as pd
+import functools
 import hashlib
 
 from util.constants import assoc_tuple_values
+from util.associationtable import AssociationTable
+
+EDGE_ID_HASH = 'md5'    # hash of edge ids, md5 keeps ids equal to all previously generated ids
+EDGE_ID_HASH_NAMES = ('md5', 'blake2b', 'siphash')
+EDGE_ID_SIPHASH_SALTS = (0, 0x9e3779b97f4a7c15)    # salts of the first and second 8 bytes of siphash edge ids
 
 def register_info(message):
     """
@@ -23,11 +30,14 @@ def register_error(message):
     print(message)
     logging.error(message)
     
-def tuplelist2dataframe(tuple_list: list):
+def tuplelist2dataframe(tuple_list: list | AssociationTable):
     """
 
     """
-    df = pd.DataFrame.from_records(tuple_list, columns=list(assoc_tuple_values))
+    if isinstance(tuple_list, AssociationTable):
+        df = tuple_list.to_dataframe()
+    else:
+        df = pd.DataFrame.from_records(tuple_list, columns=list(assoc_tuple_values))
     register_info(f'Created a dataframe with {df.shape[0]} entries and column values {df.columns.values}')
     return df
 
@@ -39,6 +49,14 @@ def dataframe2tuplelist(df: pd.DataFrame):
     register_info(f'Created a list of tuples with {len(tuple_list)} entries')
     return tuple_list
 
+def dataframe2table(df: pd.DataFrame):
+    """
+        Convert dataframe with columns `constants.assoc_tuple_values` into an association table.
+    """
+    table = AssociationTable.from_dataframe(df)
+    register_info(f'Created an association table with {len(table)} entries')
+    return table
+
 def extract_colvalues(df: pd.DataFrame, extract_colname: str):
     """
         Extract values from column with given name.
@@ -49,9 +67,82 @@ def extract_colvalues(df: pd.DataFrame, extract_colname: str):
     colvalues = df[extract_colname].to_list()
     return colvalues
 
-def generate_edge_id(relation_id, subject_id, object_id):
-    strings_tuple = (relation_id, subject_id, object_id)
-    hasher = hashlib.md5()
-    for string_value in strings_tuple:
-        hasher.update(string_value.encode())
-    return hasher.hexdigest()
\ No newline at end of file
+def get_edge_id_hasher(hash_name: str = EDGE_ID_HASH, digest_size: int = 16):
+    """
+        Get constructor of hash objects with which edge ids are generated one edge at a time.
+        :param hash_name: `md5` (ids compatible with all previously generated ids) or `blake2b`
+        :param digest_size: number of bytes of digest for `blake2b` (1 to 64), `md5` always has 16 bytes
+        :return: function taking bytes and returning a hash object
+    """
+    if hash_name == 'md5':
+        return hashlib.md5
+    
+    if hash_name == 'blake2b':
+        return functools.partial(hashlib.blake2b, digest_size=digest_size)
+    
+    raise ValueError(f'Unknown hash {hash_name} for edge ids, choose one of {EDGE_ID_HASH_NAMES}')
+
+def hash_edge_columns(relation_ids, subject_ids, object_ids, digest_size: int = 16):
+    """
+        Generate ids of edges by hashing the relation, subject and object columns as a whole with the siphash of pandas.
+        :param relation_ids: sequence of relation ids
+        :param subject_ids: sequence of subject ids
+        :param object_ids: sequence of object ids
+        :param digest_size: number of bytes of digest, 8 or 16
+        :return: list of edge ids in order of given sequences
+    """
+    if digest_size not in (8, 16):
+        raise ValueError(f'Digest size of siphash is 8 or 16 bytes, not {digest_size}')
+    
+    # Relations are few, so they are hashed once per distinct relation
+    column_hashes = [pd.util.hash_array(np.asarray(relation_ids, dtype=object), categorize=True)]
+    column_hashes += [pd.util.hash_array(np.asarray(ids, dtype=object), categorize=False) for ids in (subject_ids, object_ids)]
+    digests = []
+    for salt in EDGE_ID_SIPHASH_SALTS[:digest_size // 8]:
+        # Mixing the running hash with each column in turn makes the digest depend on the order of relation, subject and object
+        edge_hashes = np.full(len(column_hashes[0]), salt, dtype=np.uint64)
+        for column_hash in column_hashes:
+            edge_hashes = pd.util.hash_array(edge_hashes ^ column_hash)
+        digests.append(edge_hashes)
+    
+    # Big-endian bytes keep the hex digits of one edge contiguous
+    hex_digests = np.column_stack(digests).astype('>u8').tobytes().hex().encode()
+    return np.frombuffer(hex_digests, dtype=f'S{2 * digest_size}').astype(str).tolist()
+
+def generate_edge_ids(relation_ids, subject_ids, object_ids, hash_name: str = EDGE_ID_HASH, digest_size: int = 16):
+    """
+        Generate ids of edges from the relation, subject and object of each edge.
+        :param relation_ids: sequence of relation ids
+        :param subject_ids: sequence of subject ids
+        :param object_ids: sequence of object ids
+        :param hash_name: `siphash` to hash whole columns at once, see `hash_edge_columns`, otherwise name of hash of each edge, see `get_edge_id_hasher`
+        :param digest_size: number of bytes of digest
+        :return: list of edge ids in order of given sequences
+    """
+    if hash_name == 'siphash':
+        return hash_edge_columns(relation_ids, subject_ids, object_ids, digest_size)
+    
+    hasher = get_edge_id_hasher(hash_name, digest_size)
+    # Hashing the concatenated ids equals hashing the ids one after the other
+    return [hasher((relation_id + subject_id + object_id).encode()).hexdigest() for relation_id, subject_id, object_id in zip(relation_ids, subject_ids, object_ids)]
+
+def generate_edge_id(relation_id, subject_id, object_id, hash_name: str = EDGE_ID_HASH, digest_size: int = 16):
+    """
+        Generate id of one edge, see `generate_edge_ids`.
+    """
+    if hash_name == 'siphash':
+        return hash_edge_columns([relation_id], [subject_id], [object_id], digest_size)[0]
+    
+    hasher = get_edge_id_hasher(hash_name, digest_size)
+    return hasher((relation_id + subject_id + object_id).encode()).hexdigest()
+
+def get_file_hash(file_path: str, chunk_size: int = 1024 ** 2):
+    """
+        Get hash of the content of given file, reading the file in chunks.
+        :return: hexadecimal sha256 hash
+    """
+    file_hash = hashlib.sha256()
+    with open(file_path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            file_hash.update(chunk)
+    return file_hash.hexdigest()
\ No newline at end of file
@@ -76,6 +76,9 @@ INTERACTS_WITH = {
     'iri': 'http://purl.obolibrary.org/obo/RO_0002434'
 }
 
+# Relations that indicate that a node of semantic group MODEL represents a gene
+MODEL_GENE_RELATION_IDS = ['RO:0002327', 'BFO:0000050', 'RO:0002434', 'RO:0002325', 'RO:HOM0000017']
+
 REL_GROUPING = {
     'RO:HOM0000020': {
         'id': 'RO:HOM0000017',
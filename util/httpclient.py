@@ -0,0 +1,296 @@
+"""
+    Module with the HTTP client shared by all modules requesting external APIs. The client limits the request rate per host,
+    retries failed requests with exponential backoff and keeps statistics of all requests.
+"""
+
+import email.utils
+import os
+import random
+import threading
+import time
+
+from collections import defaultdict, deque
+from urllib.parse import urlparse
+
+import numpy as np
+import requests
+
+from requests.adapters import HTTPAdapter
+
+from util.common import register_info
+from util.replay import FixtureRecorder, rewrite_replay_url
+
+RETRIES = 3
+TIMEOUT_S = (10.0, 120.0)    # seconds to connect and seconds between received bytes, such that a stalled connection is retried
+BACKOFF_BASE_S = 1.0
+BACKOFF_MAX_S = 60.0
+POOL_SIZE = 32
+RETRY_STATUS_CODES = {429, 500, 502, 503, 504}
+THROTTLE_STATUS_CODES = {429, 503}
+
+# Maximum number of requests per second allowed for each host, hosts that are not included are not limited
+RATE_LIMITS = {
+    'api.monarchinitiative.org': 20.0,
+    'www.ebi.ac.uk': 10.0,
+    'rest.uniprot.org': 5.0
+}
+
+class TokenBucket:
+    """
+        Initialize a token bucket that limits the rate of requests. The rate adapts to the responses of the host: it is halved
+        each time the host throttles requests and slowly recovers towards the maximum rate after successful requests.
+        :param max_rate: maximum number of requests per second
+        :param burst: maximum number of requests that can be made at once after a period of inactivity
+    """
+    def __init__(self, max_rate: float, burst: int = 1):
+        self.max_rate = max_rate
+        self.min_rate = max_rate / 64
+        self.rate = max_rate
+        self.burst = burst
+        self.tokens = burst
+        self.updated_at = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self):
+        """
+            Block until a request is allowed to be made.
+        """
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(self.burst, self.tokens + (now - self.updated_at) * self.rate)
+                self.updated_at = now
+
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+
+                wait_s = (1 - self.tokens) / self.rate
+
+            time.sleep(wait_s)
+
+    def throttle(self):
+        """
+            Halve the rate after the host indicated that too many requests are made.
+        """
+        with self.lock:
+            self.rate = max(self.min_rate, self.rate / 2)
+
+    def recover(self):
+        """
+            Increase the rate after a successful request until the maximum rate is reached.
+        """
+        with self.lock:
+            self.rate = min(self.max_rate, self.rate + self.max_rate / 100)
+
+class HostStatistics:
+    """
+        Initialize counters of requests, retries and failures as well as the latencies of the most recent requests to a host.
+        :param max_latencies: number of most recent latencies that are kept
+    """
+    def __init__(self, max_latencies: int = 10000):
+        self.requests = 0
+        self.retries = 0
+        self.failures = 0
+        self.latencies = deque(maxlen=max_latencies)
+        self.lock = threading.Lock()
+
+    def count(self, counter: str, latency: float = None):
+        """
+            Increase given counter (`requests`, `retries` or `failures`) and record latency of a request when given.
+        """
+        with self.lock:
+            setattr(self, counter, getattr(self, counter) + 1)
+            if latency is not None:
+                self.latencies.append(latency)
+
+    def to_dict(self):
+        """
+            Convert statistics to a dictionary with counters and latency percentiles in seconds.
+        """
+        statistics = {
+            'requests': self.requests,
+            'retries': self.retries,
+            'failures': self.failures
+        }
+
+        if len(self.latencies) > 0:
+            p50, p90, p99 = np.percentile(list(self.latencies), [50, 90, 99])
+            statistics.update({'latency_p50': float(p50), 'latency_p90': float(p90), 'latency_p99': float(p99)})
+
+        return statistics
+
+class HttpClient:
+    """
+        Initialize a HTTP client with pooled connections that limits the rate of requests per host and retries failed requests
+        with exponential backoff and jitter, respecting the `Retry-After` header of the host.
+        :param retries: maximum number of attempts of a request
+        :param timeout: default timeout of requests, see `timeout` of `requests.Session.request`
+        :param rate_limits: dictionary with maximum number of requests per second for each host
+        :param pool_size: maximum number of connections kept open per host
+        :param replay_url: when given, all requests are made to the replay server at this url (default environment variable `HTTP_REPLAY_URL`)
+        :param record_dir: when given, all responses are recorded as fixtures in this directory (default environment variable `HTTP_RECORD_DIR`)
+    """
+    def __init__(self, retries: int = RETRIES, rate_limits: dict = RATE_LIMITS, pool_size: int = POOL_SIZE,
+                 replay_url: str = os.environ.get('HTTP_REPLAY_URL'), record_dir: str = os.environ.get('HTTP_RECORD_DIR'), timeout = TIMEOUT_S):
+        self.retries = retries
+        self.timeout = timeout
+        self.rate_limits = dict(rate_limits)
+        self.buckets = dict()
+        self.statistics = defaultdict(HostStatistics)
+        self.lock = threading.Lock()
+
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=len(self.rate_limits) + 1, pool_maxsize=pool_size)
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
+
+        self.replay_url = None
+        self.recorder = None
+        if replay_url:
+            self.enable_replay(replay_url)
+        if record_dir:
+            self.enable_recording(record_dir)
+
+    def enable_replay(self, replay_url: str):
+        """
+            Make all requests to the replay server at given url instead of the external APIs, see `util.replay`.
+        """
+        self.replay_url = replay_url
+        register_info(f'Requests are replayed by {replay_url}')
+
+    def enable_recording(self, record_dir: str):
+        """
+            Record all successful responses as fixtures in given directory, see `util.replay`.
+        """
+        self.recorder = FixtureRecorder(record_dir)
+        register_info(f'Responses are recorded into {record_dir}')
+
+    def get_request_url(self, url: str):
+        """
+            Get the url to which a request to given url is made, which is the url at the replay server when replay is enabled.
+        """
+        if self.replay_url:
+            return rewrite_replay_url(self.replay_url, url)
+        return url
+
+    def set_rate_limit(self, host: str, max_rate: float):
+        """
+            Set maximum number of requests per second of given host.
+        """
+        with self.lock:
+            self.rate_limits[host] = max_rate
+            self.buckets.pop(host, None)
+
+    def get_bucket(self, host: str):
+        """
+            Get token bucket of given host or `None` when requests to the host are not limited.
+        """
+        with self.lock:
+            if host not in self.buckets and host in self.rate_limits:
+                self.buckets[host] = TokenBucket(self.rate_limits[host])
+            return self.buckets.get(host)
+
+    def get_backoff(self, attempt: int, response: requests.Response = None):
+        """
+            Get number of seconds to wait before the next attempt. The `Retry-After` header of the response is used when given,
+            otherwise the waiting time grows exponentially with the number of attempts and is randomized to spread retries.
+            A malformed `Retry-After` header is ignored.
+            :param attempt: number of attempts made so far
+            :param response: response of the last attempt if received
+        """
+        if response is not None and 'Retry-After' in response.headers:
+            retry_after = response.headers['Retry-After']
+            try:
+                return min(BACKOFF_MAX_S, max(0.0, float(retry_after)))
+            except ValueError:
+                pass
+
+            # A malformed date falls back to exponential backoff
+            try:
+                retry_date = email.utils.parsedate_to_datetime(retry_after)
+                return min(BACKOFF_MAX_S, max(0.0, retry_date.timestamp() - time.time()))
+            except (TypeError, ValueError, OverflowError):
+                pass
+
+        return random.uniform(0, min(BACKOFF_MAX_S, BACKOFF_BASE_S * 2 ** attempt))
+
+    def request(self, method: str, url: str, **kwargs):
+        """
+            Make a request and retry it when it fails.
+            :param method: HTTP method such as `GET` or `POST`
+            :param url: url of request
+            :param kwargs: arguments passed to `requests.Session.request`, the default timeout of the client is used when no timeout is given
+            :return: response of successful request, raises the error of the last attempt when all attempts fail
+        """
+        kwargs.setdefault('timeout', self.timeout)
+        url = self.get_request_url(url)
+
+        host = urlparse(url).netloc
+        bucket = self.get_bucket(host)
+        statistics = self.statistics[host]
+
+        for attempt in range(self.retries):
+            if bucket:
+                bucket.acquire()
+
+            response = None
+            start_time = time.perf_counter()
+            try:
+                response = self.session.request(method, url, **kwargs)
+                statistics.count('requests', latency=time.perf_counter() - start_time)
+
+                if bucket and response.status_code in THROTTLE_STATUS_CODES:
+                    bucket.throttle()
+
+                response.raise_for_status()
+
+                if self.recorder and kwargs.get('stream'):
+                    self.recorder.record_stream(response)
+                elif self.recorder:
+                    self.recorder.record(response)
+
+                if bucket:
+                    bucket.recover()
+
+                return response
+            except requests.RequestException as e:
+                if response is None:
+                    statistics.count('requests')    # no response received, so no latency is recorded
+
+                retryable = response is None or response.status_code in RETRY_STATUS_CODES
+
+                if retryable and attempt < self.retries - 1:
+                    statistics.count('retries')
+                    backoff_s = self.get_backoff(attempt, response)
+                    print(f'Retry {attempt} of {method} {url} in {backoff_s:.1f}s due to {e}')
+                    time.sleep(backoff_s)
+                else:
+                    statistics.count('failures')
+                    raise
+
+    def get(self, url: str, **kwargs):
+        """
+            Make a GET request, see `request`.
+        """
+        return self.request('GET', url, **kwargs)
+
+    def post(self, url: str, **kwargs):
+        """
+            Make a POST request, see `request`.
+        """
+        return self.request('POST', url, **kwargs)
+
+    def report_statistics(self):
+        """
+            Log statistics of requests made to each host.
+            :return: dictionary of statistics per host
+        """
+        all_statistics = {host: statistics.to_dict() for host, statistics in self.statistics.items()}
+
+        for host, statistics in all_statistics.items():
+            register_info(f'Requests to {host}: {statistics}')
+
+        return all_statistics
+
+client = HttpClient()   # client shared by all modules
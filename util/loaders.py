@@ -2,18 +2,18 @@ import os
 import pandas as pd
 
 from util.constants import INPUT_FOLDER, OUTPUT_FOLDER
-from util.common import register_info, dataframe2tuplelist
+from util.common import register_info, dataframe2table
 
 def get_input_data_path(file_name):
     return os.path.join(INPUT_FOLDER, file_name)
 
 def load_associations_from_csv(file_name):
     """
-        :return List of tuples containing monarch associations from csv file
+        :return Association table containing monarch associations from csv file
     """
     data_path = os.path.join(OUTPUT_FOLDER, file_name)
     associations = pd.read_csv(data_path)
-    associations = dataframe2tuplelist(associations)
+    associations = dataframe2table(associations)
     register_info(f'Loaded {len(associations)} associations')
     
     return associations
\ No newline at end of file
@@ -0,0 +1,249 @@
+"""
+    Module that records responses of external APIs as fixtures and replays them with a local HTTP server, such that the fetch
+    pipeline can be run and benchmarked without network access. Latency and errors can be injected by the replay server.
+
+    Record fixtures:    set `HTTP_RECORD_DIR=fixtures` (or call `client.enable_recording('fixtures')`) while fetching
+    Replay fixtures:    python -m util.replay fixtures --port 8765 --latency 0.05 --error-rate 0.01
+                        and set `HTTP_REPLAY_URL=http://127.0.0.1:8765` (or call `client.enable_replay(...)`) while fetching
+"""
+
+import argparse
+import base64
+import hashlib
+import json
+import os
+import random
+import threading
+import time
+
+import requests
+
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from urllib.parse import urlsplit, parse_qsl, unquote
+
+def generate_fixture_key(method: str, host: str, path: str, query: str, body = None):
+    """
+        Generate the key of a request, independent of the order of its query and form parameters.
+        :param method: HTTP method such as `GET` or `POST`
+        :param host: host to which the request is made
+        :param path: path of request url
+        :param query: query string of request url
+        :param body: form encoded body of request if any
+        :return: hexadecimal hash of request
+    """
+    if isinstance(body, bytes):
+        body = body.decode()
+
+    request = [
+        method.upper(),
+        host,
+        unquote(path),
+        sorted(parse_qsl(query, keep_blank_values=True)),
+        sorted(parse_qsl(body, keep_blank_values=True)) if body else []
+    ]
+    return hashlib.sha1(json.dumps(request).encode()).hexdigest()
+
+class FixtureRecorder:
+    """
+        Initialize a recorder that stores each received response as a fixture file in the given directory.
+        :param fixtures_dir: directory in which fixtures are stored
+    """
+    def __init__(self, fixtures_dir: str):
+        self.fixtures_dir = fixtures_dir
+        os.makedirs(fixtures_dir, exist_ok=True)
+
+    def get_fixture(self, response):
+        """
+            Get key and description of the fixture of given response without its content. A redirected response is stored under
+            the original request, such that the replay server answers the original request with the final response.
+            :param response: `requests.Response` of request that needs to be recorded
+            :return: key of request and dictionary describing the response
+        """
+        request = response.history[0].request if response.history else response.request
+        url = urlsplit(request.url)
+        key = generate_fixture_key(request.method, url.netloc, url.path, url.query, request.body)
+
+        fixture = {
+            'method': request.method,
+            'url': request.url,
+            'status': response.status_code,
+            'content_type': response.headers.get('Content-Type', 'application/json')
+        }
+
+        return key, fixture
+
+    def write_fixture(self, key: str, fixture: dict):
+        """
+            Store fixture of request with given key.
+        """
+        with open(os.path.join(self.fixtures_dir, f'{key}.json'), 'w') as f:
+            json.dump(fixture, f)
+
+    def record(self, response):
+        """
+            Store given response together with the request it belongs to.
+            :param response: `requests.Response` of request that needs to be recorded
+        """
+        key, fixture = self.get_fixture(response)
+        fixture['content'] = base64.b64encode(response.content).decode()
+        self.write_fixture(key, fixture)
+
+    def record_stream(self, response):
+        """
+            Store given streamed response together with the request it belongs to while its content is consumed. The content is
+            written to a separate file chunk by chunk instead of being read at once, and the fixture is only stored when all
+            content has been consumed.
+            :param response: `requests.Response` of request made with `stream=True`, of which `iter_content` is replaced
+        """
+        key, fixture = self.get_fixture(response)
+        fixture['content_file'] = f'{key}.body'
+        content_path = os.path.join(self.fixtures_dir, fixture['content_file'])
+        iter_content = response.iter_content
+
+        def iter_raw_content(chunk_size):
+            with open(f'{content_path}.part', 'wb') as f:
+                for chunk in iter_content(chunk_size):
+                    f.write(chunk)
+                    yield chunk
+
+            os.replace(f'{content_path}.part', content_path)
+            self.write_fixture(key, fixture)
+
+        def iter_recorded_content(chunk_size = 1, decode_unicode = False):
+            chunks = iter_raw_content(chunk_size)
+            return requests.utils.stream_decode_response_unicode(chunks, response) if decode_unicode else chunks
+
+        response.iter_content = iter_recorded_content
+
+def rewrite_replay_url(replay_url: str, url: str):
+    """
+        Rewrite url of an external API such that the request is made to the replay server, keeping the original host as first path segment.
+        :param replay_url: base url of replay server
+        :param url: original url of request
+        :return: url of request to replay server
+    """
+    split_url = urlsplit(url)
+    replay_request_url = f'{replay_url.rstrip("/")}/{split_url.netloc}{split_url.path}'
+
+    if split_url.query:
+        replay_request_url += f'?{split_url.query}'
+
+    return replay_request_url
+
+class ReplayRequestHandler(BaseHTTPRequestHandler):
+    """
+        Handle requests to the replay server by responding with the recorded fixture of the request.
+    """
+    def log_message(self, format, *args):
+        pass
+
+    def do_GET(self):
+        self.replay()
+
+    def do_POST(self):
+        self.replay()
+
+    def replay(self):
+        server = self.server
+
+        content_length = int(self.headers.get('Content-Length', 0))
+        body = self.rfile.read(content_length) if content_length > 0 else None
+
+        url = urlsplit(self.path)
+        host, _, path = url.path.lstrip('/').partition('/')
+        key = generate_fixture_key(self.command, host, f'/{path}', url.query, body)
+
+        if server.latency_s > 0:
+            time.sleep(random.uniform(0, 2 * server.latency_s))
+
+        with server.lock:
+            server.statistics['requests'] += 1
+            inject_error = server.random.random() < server.error_rate
+
+        if inject_error:
+            with server.lock:
+                server.statistics['errors'] += 1
+            self.send_content(server.error_status, 'text/plain', b'Injected error', {'Retry-After': '0'})
+            return
+
+        fixture_path = os.path.join(server.fixtures_dir, f'{key}.json')
+        if not os.path.exists(fixture_path):
+            with server.lock:
+                server.statistics['missing'] += 1
+            self.send_content(404, 'text/plain', f'No fixture recorded for {self.command} {self.path}'.encode())
+            return
+
+        with open(fixture_path) as f:
+            fixture = json.load(f)
+
+        if 'content_file' in fixture:
+            with open(os.path.join(server.fixtures_dir, fixture['content_file']), 'rb') as f:
+                content = f.read()
+        else:
+            content = base64.b64decode(fixture['content'])
+
+        self.send_content(fixture['status'], fixture['content_type'], content)
+
+    def send_content(self, status: int, content_type: str, content: bytes, headers: dict = {}):
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(content)))
+        for header, value in headers.items():
+            self.send_header(header, value)
+        self.end_headers()
+        self.wfile.write(content)
+
+class ReplayServer(ThreadingHTTPServer):
+    """
+        Initialize a local HTTP server that replays recorded fixtures.
+        :param fixtures_dir: directory in which fixtures are stored
+        :param host: host on which the server listens
+        :param port: port on which the server listens, a free port is chosen when `0`
+        :param latency_s: mean number of seconds that is added to each response
+        :param error_rate: fraction of requests that are answered with an error
+        :param error_status: status code of injected errors
+        :param seed: seed of random generator deciding which requests get an error
+    """
+    daemon_threads = True
+
+    def __init__(self, fixtures_dir: str, host: str = '127.0.0.1', port: int = 0, latency_s: float = 0.0,
+                 error_rate: float = 0.0, error_status: int = 503, seed: int = None):
+        ThreadingHTTPServer.__init__(self, (host, port), ReplayRequestHandler)
+        self.fixtures_dir = fixtures_dir
+        self.latency_s = latency_s
+        self.error_rate = error_rate
+        self.error_status = error_status
+        self.random = random.Random(seed)
+        self.lock = threading.Lock()
+        self.statistics = {'requests': 0, 'errors': 0, 'missing': 0}
+
+    @property
+    def url(self):
+        host, port = self.server_address[:2]
+        return f'http://{host}:{port}'
+
+    def start(self):
+        """
+            Start serving in a background thread.
+            :return: url of server
+        """
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+        return self.url
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Replay recorded API responses')
+    parser.add_argument('fixtures_dir')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--latency', type=float, default=0.0, help='mean added latency in seconds')
+    parser.add_argument('--error-rate', type=float, default=0.0, help='fraction of requests answered with an error')
+    parser.add_argument('--error-status', type=int, default=503)
+    parser.add_argument('--seed', type=int, default=None)
+    args = parser.parse_args()
+
+    server = ReplayServer(args.fixtures_dir, args.host, args.port, args.latency, args.error_rate, args.error_status, args.seed)
+    print(f'Replaying fixtures of {args.fixtures_dir} at {server.url}')
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print(f'Replay statistics: {server.statistics}')